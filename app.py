@@ -9,7 +9,9 @@ import sys
 import streamlit as st
 from dotenv import load_dotenv
 
+from game import intent, tracing
 from game.game_engine import GameEngine
+from game.services import STORAGE_BACKEND
 
 # Load environment variables
 load_dotenv()
@@ -81,6 +83,8 @@ st.markdown("""
 
 def initialize_session_state():
     """Initialize session state variables if they don't exist."""
+    # Each browser session gets its own lightweight GameEngine; the MongoDB
+    # client and Gemini model behind it are shared by the whole process
     if 'game_engine' not in st.session_state:
         st.session_state.game_engine = GameEngine()
     
@@ -95,6 +99,10 @@ def initialize_session_state():
         
     if 'command_input' not in st.session_state:
         st.session_state.command_input = ""
+    
+    # Command submitted by a callback, run while the game log renders so its response can stream
+    if 'pending_command' not in st.session_state:
+        st.session_state.pending_command = None
 
 def display_welcome():
     """Display the welcome message."""
@@ -133,11 +141,19 @@ def display_main_menu():
             if st.button("About", key="about_btn", use_container_width=True):
                 st.session_state.current_screen = "about"
         
+        # Character listing
+        col1, col2, col3 = st.columns([1, 2, 1])
+        
+        with col2:
+            if st.button("All Characters", key="character_list_btn", use_container_width=True):
+                st.session_state.current_screen = "character_list"
+        
         # Third row - Exit button centered
         col1, col2, col3 = st.columns([1, 2, 1])
         
         with col2:
             if st.button("Exit", key="exit_btn", use_container_width=True):
+                st.session_state.game_engine.close()
                 st.session_state.current_screen = "exit"
                 st.markdown("Thank you for playing! Close this browser tab to exit completely.")
 
@@ -246,6 +262,53 @@ def delete_game_screen():
     if st.button("Back to Main Menu", key="back_from_delete_game"):
         st.session_state.current_screen = "main_menu"
 
+def character_list_screen():
+    """Browse characters one page at a time."""
+    st.subheader("ALL CHARACTERS")
+    
+    sort_choice = st.radio("Sort by:", ["Last played", "Name"], horizontal=True, key="character_sort")
+    name_prefix = st.text_input("Only names starting with:", key="character_name_prefix")
+    sort = "name" if sort_choice == "Name" else "last_played"
+    
+    # Tokens of the pages seen so far; start over when the sort or filter changes
+    if st.session_state.get("character_query") != (sort, name_prefix):
+        st.session_state.character_query = (sort, name_prefix)
+        st.session_state.character_page_tokens = [None]
+    page_tokens = st.session_state.character_page_tokens
+    
+    players, next_page_token = st.session_state.game_engine.list_characters(
+        sort, page_token=page_tokens[-1], name_prefix=name_prefix
+    )
+    
+    if not players:
+        st.info("No characters found in the database.")
+    else:
+        st.caption(f"Page {len(page_tokens)}")
+        st.table([
+            {
+                "Name": player["name"],
+                "Class": player.get("class", "Unknown"),
+                "Level": player.get("level", 1),
+                "Last Played": player["last_played"].strftime("%Y-%m-%d %H:%M") if player.get("last_played") else "Never"
+            }
+            for player in players
+        ])
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if len(page_tokens) > 1 and st.button("Previous Page", key="previous_character_page"):
+            page_tokens.pop()
+            st.rerun()
+    
+    with col2:
+        if next_page_token and st.button("Next Page", key="next_character_page"):
+            page_tokens.append(next_page_token)
+            st.rerun()
+    
+    if st.button("Back to Main Menu", key="back_from_character_list"):
+        st.session_state.current_screen = "main_menu"
+
 def about_screen():
     """Show information about the game."""
     st.subheader("ABOUT THE GAME")
@@ -332,8 +395,19 @@ def game_screen():
         if st.session_state.game_log:
             for log_entry in st.session_state.game_log:
                 st.markdown(f"<div class='response-area'>{log_entry}</div>", unsafe_allow_html=True)
-        else:
+        elif not st.session_state.pending_command:
             st.info("Your adventure begins here. Type a command below to start playing.")
+        
+        # Stream the response to a submitted command into the log as it arrives
+        if st.session_state.pending_command:
+            command = st.session_state.pending_command
+            st.session_state.pending_command = None
+            placeholder = st.empty()
+            response = ""
+            for chunk in st.session_state.game_engine.process_command_stream(command):
+                response += chunk
+                placeholder.markdown(f"<div class='response-area'>{response}</div>", unsafe_allow_html=True)
+            st.session_state.game_log.append(response)
     
     # Command input
     st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
@@ -347,9 +421,8 @@ def game_screen():
             if command.lower() in ["quit", "exit", "menu"]:
                 st.session_state.current_screen = "confirm_exit"
             else:
-                # Process the command
-                response = st.session_state.game_engine.process_command(command)
-                st.session_state.game_log.append(response)
+                # Processed on the next run, while the game log renders
+                st.session_state.pending_command = command
             
             # Clear the input after processing
             st.session_state.command_input = ""
@@ -363,25 +436,46 @@ def game_screen():
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         if st.button("Look around"):
-            response = st.session_state.game_engine.process_command("look")
-            st.session_state.game_log.append(response)
+            st.session_state.pending_command = "look"
             st.rerun()
     with col2:
         if st.button("Show map"):
-            response = st.session_state.game_engine.process_command("map")
-            st.session_state.game_log.append(response)
+            st.session_state.pending_command = "map"
             st.rerun()
     with col3:
         if st.button("Inventory"):
-            response = st.session_state.game_engine.process_command("inventory")
-            st.session_state.game_log.append(response)
+            st.session_state.pending_command = "inventory"
             st.rerun()
     with col4:
         if st.button("Help"):
-            response = st.session_state.game_engine.process_command("help")
-            st.session_state.game_log.append(response)
+            st.session_state.pending_command = "help"
             st.rerun()
     
+    # Debug panel with the last command's timing breakdown and latency per verb
+    with st.expander("Debug: command timings"):
+        last_trace = st.session_state.game_engine.last_trace
+        if last_trace:
+            st.code(last_trace.format(), language=None)
+        else:
+            st.write("No commands traced yet.")
+        
+        stats = tracing.verb_stats()
+        if stats:
+            st.table([
+                {
+                    "Verb": verb,
+                    "Count": summary["count"],
+                    "p50 (ms)": round(summary["p50"] * 1000, 1),
+                    "p95 (ms)": round(summary["p95"] * 1000, 1),
+                    "p99 (ms)": round(summary["p99"] * 1000, 1),
+                }
+                for verb, summary in sorted(stats.items())
+            ])
+        
+        rate = intent.avoidance_rate()
+        if rate is not None:
+            st.write(f"Commands answered without the AI narrator: {rate:.0%}")
+    
     st.markdown("</div>", unsafe_allow_html=True)
 
 def confirm_exit_screen():
@@ -393,6 +487,7 @@ def confirm_exit_screen():
     
     with col1:
         if st.button("Yes, return to menu"):
+            st.session_state.game_engine.close()
             st.session_state.current_screen = "main_menu"
     
     with col2:
@@ -403,7 +498,7 @@ def check_environment():
     """Check if required environment variables are set."""
     missing_vars = []
     
-    if not os.getenv("MONGODB_URI"):
+    if STORAGE_BACKEND == "mongo" and not os.getenv("MONGODB_URI"):
         missing_vars.append("MONGODB_URI")
     
     if not os.getenv("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY") == "your_gemini_api_key_here":
@@ -441,6 +536,8 @@ def main():
         load_game_screen()
     elif st.session_state.current_screen == "delete_game":
         delete_game_screen()
+    elif st.session_state.current_screen == "character_list":
+        character_list_screen()
     elif st.session_state.current_screen == "about":
         about_screen()
     elif st.session_state.current_screen == "game":
@@ -0,0 +1,191 @@
+"""
+Scale benchmark for the Fantasy RPG text adventure game.
+Loads procedurally generated worlds of increasing size into a scratch
+database and times loading, movement, look, map and quest queries.
+
+Usage:
+    python benchmark.py [--sizes 1000,10000,100000] [--turns 200] [--seed 42]
+                        [--backend mongo|sqlite|memory] [--db-name fantasy_rpg_bench]
+                        [--output bench_output.txt]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from dotenv import load_dotenv
+
+from game.data.generator import WorldGenerator
+from game.database import Database, MONGODB_DB_NAME
+from game.game_engine import GameEngine
+from game.memory_storage import MemoryStorage
+from game.services import get_mongo_client
+from game.sqlite_storage import SQLiteStorage
+from game.world_graph import WorldGraph
+
+# Load environment variables
+load_dotenv()
+
+class StaticNarrator:
+    """Stands in for AIGenerator so timings only cover game and database work."""
+    
+    def generate_location_description(self, location_data, player_data=None):
+        """Return the stored description instead of calling the model."""
+        return location_data["description"]
+    
+    def generate_response_to_action(self, player_data, action, current_location, game_state):
+        """Return a fixed response instead of calling the model."""
+        return "Nothing happens."
+
+class Timings:
+    """Collects latency samples per operation."""
+    
+    def __init__(self):
+        """Initialize empty sample lists."""
+        self.samples = {}
+    
+    def measure(self, name, func, *args):
+        """Call func and record how long it took."""
+        start = time.perf_counter()
+        result = func(*args)
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+    
+    def summary(self):
+        """Get (name, count, mean, p50, p95, max) rows in milliseconds."""
+        rows = []
+        for name, values in self.samples.items():
+            values = sorted(values)
+            count = len(values)
+            rows.append((
+                name,
+                count,
+                sum(values) / count * 1000,
+                values[count // 2] * 1000,
+                values[min(count - 1, int(count * 0.95))] * 1000,
+                values[-1] * 1000
+            ))
+        return rows
+
+def load_content(db, generator, batch_size=5000):
+    """Insert every generated collection in batches. Returns documents written."""
+    written = 0
+    for collection_name, documents in generator.generate().items():
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                written += db.insert_documents(collection_name, batch)
+                batch = []
+        if batch:
+            written += db.insert_documents(collection_name, batch)
+    return written
+
+def create_empty_storage(backend, db_name, scratch_dir):
+    """Create an empty storage backend of the requested kind."""
+    if backend == "mongo":
+        client = get_mongo_client()
+        client.drop_database(db_name)
+        return Database(client, db_name)
+    if backend == "sqlite":
+        path = os.path.join(scratch_dir, f"{db_name}.db")
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return SQLiteStorage(path)
+    return MemoryStorage()
+
+def run_size(backend, db_name, scratch_dir, size, turns, seed, out):
+    """Benchmark one world size."""
+    db = create_empty_storage(backend, db_name, scratch_dir)
+    generator = WorldGenerator(locations=size, seed=seed)
+    timings = Timings()
+    
+    written = timings.measure("load: content", load_content, db, generator)
+    timings.measure("load: indexes", db.ensure_indexes)
+    world = timings.measure("load: world graph", WorldGraph, db)
+    
+    engine = GameEngine(db=db, ai=StaticNarrator(), world=world)
+    success, message = engine.create_new_player(f"bench_{size}", "warrior")
+    if not success:
+        out(f"Could not create benchmark player: {message}")
+        return
+    
+    # Give the player some quests so the quest view has work to do
+    rng = random.Random(seed)
+    player_id = engine.current_player["_id"]
+    for _ in range(10):
+        db.update_player_progress(player_id, f"quest_{rng.randrange(generator.quests)}", "active")
+    db.flush()
+    timings.measure("load: player", engine.load_player, player_id)
+    
+    for _ in range(turns):
+        neighbours = world.neighbour_names(engine.current_location["_id"])
+        if neighbours:
+            timings.measure("turn: go", engine.process_command, f"go {rng.choice(neighbours)}")
+        timings.measure("turn: look", engine.process_command, "look")
+        timings.measure("turn: map", engine.process_command, "map")
+        timings.measure("turn: quests", engine.process_command, "quests")
+        timings.measure(
+            "query: available quests",
+            db.get_available_quests,
+            f"loc_{rng.randrange(1, size)}" if size > 1 else "village_start",
+            rng.randint(1, 10)
+        )
+    
+    out(f"\n=== {size:,} locations ({written:,} documents, {backend} backend) ===")
+    out(f"{'Operation':<26} {'Count':>7} {'Mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'Max ms':>9}")
+    out("-" * 74)
+    for name, count, mean, p50, p95, worst in timings.summary():
+        out(f"{name:<26} {count:>7} {mean:>9.2f} {p50:>9.2f} {p95:>9.2f} {worst:>9.2f}")
+    
+    stats = db.cache_stats()
+    if stats:
+        out("Static cache hits/misses: " + ", ".join(
+            f"{name} {stats[name]['hits']}/{stats[name]['misses']}" for name in ["world", "items", "quests"]
+        ))
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark the game against generated worlds.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated location counts")
+    parser.add_argument("--turns", type=int, default=200, help="Commands of each kind per size")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for content and moves")
+    parser.add_argument("--backend", choices=["mongo", "sqlite", "memory"], default="mongo",
+                        help="Storage backend to benchmark")
+    parser.add_argument("--db-name", default="fantasy_rpg_bench", help="Scratch database (dropped per size)")
+    parser.add_argument("--output", help="Also append results to this file")
+    args = parser.parse_args()
+    
+    if args.backend == "mongo" and not os.getenv("MONGODB_URI"):
+        print("Error: MongoDB connection string not found in .env file.")
+        print("Please set MONGODB_URI in the .env file.")
+        sys.exit(1)
+    
+    if args.db_name == MONGODB_DB_NAME:
+        print(f"Refusing to benchmark against the game database '{MONGODB_DB_NAME}'.")
+        sys.exit(1)
+    
+    output_file = open(args.output, "a") if args.output else None
+    
+    def out(line):
+        print(line)
+        if output_file:
+            output_file.write(line + "\n")
+    
+    scratch_dir = tempfile.mkdtemp(prefix="fantasy_rpg_bench_")
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            run_size(args.backend, args.db_name, scratch_dir, size, args.turns, args.seed, out)
+    finally:
+        if args.backend == "mongo":
+            get_mongo_client().drop_database(args.db_name)
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        if output_file:
+            output_file.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Index report for the Fantasy RPG text adventure game.
+Lists declared indexes that are missing and existing indexes that are unused.
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+
+from game.database import Database
+from game.services import get_mongo_client
+
+# Load environment variables
+load_dotenv()
+
+def print_index_report(db):
+    """Print the index report for every managed collection."""
+    report = db.index_report()
+    problems = 0
+    
+    for collection_name, entry in report.items():
+        print(f"\n{collection_name}:")
+        for label in ["missing", "unused", "undeclared"]:
+            names = entry[label]
+            problems += len(names) if label == "missing" else 0
+            print(f"  {label.capitalize():<11} {', '.join(names) if names else '-'}")
+    
+    return problems
+
+if __name__ == "__main__":
+    if not os.getenv("MONGODB_URI"):
+        print("Error: MongoDB connection string not found in .env file.")
+        print("Please set MONGODB_URI in the .env file.")
+        sys.exit(1)
+    
+    db = Database(get_mongo_client())
+    
+    if "--apply" in sys.argv:
+        print("Creating missing indexes...")
+        db.ensure_indexes()
+    
+    print("=== Index Report ===")
+    missing = print_index_report(db)
+    
+    print("\nUsage counts come from $indexStats and reset when the server restarts.")
+    if missing:
+        print(f"{missing} declared index(es) missing. Run 'python check_indexes.py --apply' to create them.")
+        sys.exit(1)
@@ -0,0 +1,220 @@
+"""
+AI narrative cache for the Fantasy RPG text adventure game.
+Keeps generated narration in a two-tier cache: an in-process LRU in front
+of the storage backend's narratives collection (a MongoDB TTL collection or
+a table in the SQLite file), keyed on a hash of the structured inputs the
+narration was generated from rather than on the prompt text.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import random
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from bson import json_util
+from dotenv import load_dotenv
+
+from game.database import LRUCache
+from game.metrics import REGISTRY
+
+# Load environment variables
+load_dotenv()
+
+# Cache generated narration
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Keys kept in the in-process tier, and seconds entries live in either tier
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1000"))
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "86400"))
+
+# Variants generated per key before cached ones are reused; each hit picks one at random
+AI_CACHE_VARIANTS = int(os.getenv("AI_CACHE_VARIANTS", "1"))
+
+REGISTRY.describe("ai_cache_requests_total", "AI narrative cache lookups by kind and result (memory, store or miss).")
+REGISTRY.describe("ai_singleflight_calls_total", "Generations by kind that led an upstream request (leader) or shared one already in flight (follower).")
+
+def cache_key(kind, inputs):
+    """Hash a narration kind and its structured inputs.
+    
+    Inputs are serialized with sorted keys, so the key doesn't depend on
+    dict order or on how the prompt for them is worded.
+    """
+    canonical = json_util.dumps({"kind": kind, "inputs": inputs}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def location_inputs(location_data, player_data=None):
+    """The inputs a location description depends on."""
+    visited = bool(player_data and player_data.get("visited_locations", {}).get(location_data["_id"]))
+    return {
+        "location": location_data["_id"],
+        "name": location_data.get("name"),
+        "description": location_data.get("description"),
+        "danger_level": location_data.get("danger_level"),
+        "npcs": sorted(location_data.get("npcs", [])),
+        "enemies": sorted(location_data.get("enemies", [])),
+        "connections": sorted(location_data.get("connections", [])),
+        "visited": visited,
+    }
+
+def quest_dialogue_inputs(quest_data, npc_data, stage):
+    """The inputs a quest giver's dialogue depends on."""
+    return {
+        "quest": quest_data.get("_id"),
+        "name": quest_data.get("name"),
+        "description": quest_data.get("description"),
+        "steps": list(quest_data.get("steps", [])),
+        "rewards": quest_data.get("rewards", {}),
+        "npc_name": npc_data.get("name"),
+        "npc_description": npc_data.get("description"),
+        "stage": stage,
+    }
+
+class NarrativeCache:
+    """Two-tier cache of generated narration with up to `variants` texts per key.
+    
+    A key counts as a hit only once it holds `variants` texts; until then
+    callers generate another one and put it. Store errors are reported and
+    treated as misses, so a cache outage never stops the game.
+    """
+    
+    def __init__(self, store=None, size=AI_CACHE_SIZE, ttl=AI_CACHE_TTL, variants=AI_CACHE_VARIANTS):
+        """Initialize the cache over an optional storage backend."""
+        self.store = store
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self.local = LRUCache(size, ttl)
+    
+    def get(self, kind, key):
+        """Get one cached text for a key, or None if it needs another generated."""
+        found, variants = self.local.get(key)
+        tier = "memory"
+        if not found and self.store is not None:
+            variants = self._load(key)
+            tier = "store"
+            if variants:
+                self.local.put(key, variants)
+        
+        if not variants or len(variants) < self.variants:
+            REGISTRY.inc("ai_cache_requests_total", {"kind": kind, "result": "miss"})
+            return None
+        REGISTRY.inc("ai_cache_requests_total", {"kind": kind, "result": tier})
+        return random.choice(variants)
+    
+    def put(self, kind, key, text):
+        """Add a generated text to a key, keeping the newest `variants` texts."""
+        found, variants = self.local.get(key)
+        if not found and self.store is not None:
+            variants = self._load(key)
+        variants = [variant for variant in (variants or []) if variant != text] + [text]
+        variants = variants[-self.variants:]
+        self.local.put(key, variants)
+        
+        if self.store is not None:
+            try:
+                self.store.put_narrative(key, variants, datetime.utcnow() + timedelta(seconds=self.ttl))
+            except Exception as e:
+                print(f"Error saving {kind} narrative to the cache: {e}")
+    
+    def store_variants(self, kind, key, variants):
+        """Store pre-generated texts for a key without expiry, replacing any cached ones.
+        
+        Store errors are raised, so batch jobs don't record work that wasn't saved.
+        """
+        variants = list(variants)
+        self.local.put(key, variants)
+        if self.store is not None:
+            self.store.put_narrative(key, variants)
+    
+    def _load(self, key):
+        """Read a key's variants from the store, or None."""
+        try:
+            return self.store.get_narrative(key)
+        except Exception as e:
+            print(f"Error reading the narrative cache: {e}")
+            return None
+    
+    def stats(self):
+        """Get the in-process tier's counters."""
+        return self.local.stats()
+
+class SingleFlight:
+    """Coalesces concurrent generations of the same key into one upstream request.
+    
+    The first caller for a key (the leader) does the work; callers that
+    arrive while it is in flight (followers) wait for and share its result
+    or exception. Threads and asyncio tasks are coalesced separately.
+    """
+    
+    def __init__(self):
+        """Initialize with nothing in flight."""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+    
+    def begin(self, kind, key):
+        """Join the call in flight for a key, or lead a new one. Returns (future, is_leader).
+        
+        A leader must pass the future to finish() when done, even on failure.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        REGISTRY.inc("ai_singleflight_calls_total", {"kind": kind, "role": "leader" if leader else "follower"})
+        return future, leader
+    
+    def in_flight(self, key):
+        """Whether a thread is leading a call for a key right now."""
+        with self._lock:
+            return key in self._calls
+    
+    def finish(self, key, future, result=None, error=None):
+        """Publish a leader's result, or its exception, to the followers."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def do(self, kind, key, func, timeout=None):
+        """Return func(), sharing one call among threads that ask for the same key at once.
+        
+        Followers wait at most timeout seconds (None waits for the leader).
+        """
+        future, leader = self.begin(kind, key)
+        if not leader:
+            return future.result(timeout)
+        try:
+            result = func()
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+    
+    async def do_async(self, kind, key, coroutine_func):
+        """Await coroutine_func(), sharing one task among coroutines that ask for the same key at once.
+        
+        The shared task is shielded, so a cancelled caller doesn't cancel it
+        for the others.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                task = self._tasks[key] = asyncio.ensure_future(coroutine_func())
+                task.add_done_callback(functools.partial(self._forget_task, key))
+        REGISTRY.inc("ai_singleflight_calls_total", {"kind": kind, "role": "leader" if leader else "follower"})
+        return await asyncio.shield(task)
+    
+    def _forget_task(self, key, task):
+        """Drop a finished shared task, so the next caller for its key leads a new one."""
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
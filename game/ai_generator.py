@@ -3,104 +3,229 @@ AI Generator module for the Fantasy RPG text adventure game.
 Uses Google Gemini to generate responses.
 """
 
+import asyncio
+import contextvars
+import functools
 import os
+import time
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from game import prompts, services, tracing
+from game.ai_cache import SingleFlight, cache_key, location_inputs, quest_dialogue_inputs
+from game.metrics import REGISTRY
+from game.narrator import TemplateNarrator
+from game.resilience import (
+    AI_DEADLINE,
+    AIUnavailableError,
+    CircuitBreaker,
+    call_with_retries,
+    call_with_retries_async
+)
+
 # Load environment variables
 load_dotenv()
 
 # Get Gemini API key from environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Gemini model used for every generated response
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Shown when no response could be generated and there is no template narration; never cached
+FALLBACK_RESPONSE = "I don't understand that command. Type 'help' for a list of available commands."
+
+REGISTRY.describe("ai_fallback_responses_total", "Responses written by the template narrator because Gemini was unavailable.")
+
 # Configure the Gemini API
 genai.configure(api_key=GEMINI_API_KEY)
 
 class AIGenerator:
     """Google Gemini AI response generator."""
     
-    def __init__(self):
-        """Initialize the AI generator."""
+    def __init__(self, model=None, cache=None, breaker=None, narrator=None, scheduler=None):
+        """Initialize the AI generator, optionally on a shared model handle, narrative cache and scheduler."""
         # Set up the model
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # Game context to provide to the AI
-        self.game_context = """
-        You are the narrator for a fantasy RPG text adventure game. The game is set in a 
-        medieval fantasy world with magic, monsters, and quests. The player is on a journey 
-        to become a hero. Your responses should be descriptive, immersive, and help move 
-        the story forward. Keep responses concise (2-3 paragraphs maximum) but vivid.
-        """
-    
-    def generate_location_description(self, location_data, player_data=None):
-        """Generate an enhanced description for a location."""
-        # Get available NPCs, items, and connections for the location
-        available_npcs = location_data.get('npcs', [])
-        available_enemies = location_data.get('enemies', [])
-        available_connections = location_data.get('connections', [])
-        
-        # Format the available objects for the prompt
-        npcs_str = "None" if not available_npcs else ", ".join(available_npcs)
-        enemies_str = "None" if not available_enemies else ", ".join(available_enemies)
-        connections_str = "None" if not available_connections else ", ".join(available_connections)
-        
-        prompt = f"""
-        {self.game_context}
-        
-        Generate a vivid description for this location:
-        Name: {location_data['name']}
-        Basic Description: {location_data['description']}
-        Danger Level: {location_data['danger_level']}
-        
-        IMPORTANT: Only reference game objects that actually exist in this location:
-        - NPCs present: {npcs_str}
-        - Enemies present: {enemies_str}
-        - Connected locations: {connections_str}
-        
-        The player is currently exploring this location. Describe what they see, hear, and feel.
-        Include atmospheric details and hints about what might be found here.
-        
-        RULES:
-        1. ONLY mention NPCs, enemies, and connected locations that are listed above
-        2. DO NOT invent or hallucinate new game elements that aren't in the lists above
-        3. Be descriptive but factual about what exists in this location
-        """
+        self.model = model or genai.GenerativeModel(GEMINI_MODEL, system_instruction=prompts.SYSTEM_INSTRUCTION)
+        self.cache = cache
         
-        if player_data and player_data.get('visited_locations', {}).get(location_data['_id']):
-            prompt += "\nNote: The player has visited this location before."
+        # Stop calling the model while it fails, and narrate from templates instead
+        self.breaker = breaker or CircuitBreaker()
+        self.narrator = narrator or TemplateNarrator()
         
-        return self._generate_response(prompt)
+        # Process-wide rate limit and priority queue for model calls; None calls straight through
+        self.scheduler = scheduler
+        
+        # Concurrent requests for the same cache key share one model call
+        self.inflight = SingleFlight()
     
-    def generate_combat_narrative(self, player_data, enemy_data, combat_result):
-        """Generate a narrative for a combat encounter."""
-        # Get player's equipment and abilities
-        player_inventory = player_data.get('inventory', {})
-        player_stats = player_data.get('stats', {})
+    def generate_location_description(self, location_data, player_data=None):
+        """Generate an enhanced description for a location, or reuse a cached one."""
+        key = self._location_cache_key(location_data, player_data)
+        cached = self.cache.get("location", key) if self.cache else None
+        if cached is not None:
+            return cached
         
-        prompt = f"""
-        {self.game_context}
+        try:
+            return self.inflight.do(
+                "location", key,
+                functools.partial(self._generate_location_description, location_data, player_data, key),
+                AI_DEADLINE
+            )
+        except (AIUnavailableError, TimeoutError) as e:
+            return self._fallback(e, self.narrator.generate_location_description, location_data, player_data)
+    
+    async def generate_location_description_async(self, location_data, player_data=None):
+        """Generate an enhanced description for a location without blocking the event loop."""
+        key = self._location_cache_key(location_data, player_data)
+        cached = await self._run_cache(self.cache.get, "location", key) if self.cache else None
+        if cached is not None:
+            return cached
         
-        Generate a combat narrative for this encounter:
-        Player: {player_data['name']}, a level {player_data['level']} {player_data['class']}
-        Player Stats: Health {player_stats.get('health', 'unknown')}, Strength {player_stats.get('strength', 'unknown')}, Defense {player_stats.get('defense', 'unknown')}
-        Player Equipment: {', '.join(player_inventory.keys()) or 'Basic equipment'}
+        try:
+            return await self.inflight.do_async(
+                "location", key,
+                functools.partial(self._generate_location_description_async, location_data, player_data, key)
+            )
+        except AIUnavailableError as e:
+            return self._fallback(e, self.narrator.generate_location_description, location_data, player_data)
+    
+    def generate_location_description_stream(self, location_data, player_data=None):
+        """Generate a location description, yielding text as it arrives.
         
-        Enemy: {enemy_data['name']} - {enemy_data['description']}
+        A cached description, or one another session is already generating,
+        comes as one chunk.
+        """
+        key = self._location_cache_key(location_data, player_data)
+        cached = self.cache.get("location", key) if self.cache else None
+        if cached is not None:
+            yield cached
+            return
+        
+        future, leader = self.inflight.begin("location", key)
+        if not leader:
+            try:
+                yield future.result(AI_DEADLINE)
+            except (AIUnavailableError, TimeoutError) as e:
+                yield self._fallback(e, self.narrator.generate_location_description, location_data, player_data)
+            return
+        
+        description = None
+        try:
+            description = yield from self._generate_response_stream(
+                self._location_description_prompt(location_data, player_data),
+                functools.partial(self.narrator.generate_location_description, location_data, player_data)
+            )
+            if self.cache and description:
+                self.cache.put("location", key, description)
+        finally:
+            if description:
+                self.inflight.finish(key, future, description)
+            else:
+                self.inflight.finish(key, future, error=AIUnavailableError("the shared request for this description failed"))
+    
+    def prefetch_location_description(self, location_data, player_data=None):
+        """Generate and cache a location description before it is needed.
         
-        Combat Result: {combat_result}
+        Returns True if the model was called, False if the description was
+        already cached or being generated (or there is no cache to fill),
+        and None if the model couldn't be used.
         
-        RULES:
-        1. ONLY reference equipment and abilities that the player actually has
-        2. DO NOT invent or hallucinate new weapons, spells, or abilities
-        3. Describe the battle in an exciting way while staying true to the game mechanics
-        4. Include details about attacks, defenses, and the outcome
-        5. Keep the narrative consistent with the player's class and equipment
+        Prefetches never lead a shared call: a player's `look` joining one
+        would wait behind the prefetch's place in the scheduler queue. A
+        `look` arriving while a prefetch runs makes its own call instead.
         """
+        if not self.cache:
+            return False
+        key = self._location_cache_key(location_data, player_data)
+        if self.inflight.in_flight(key) or self.cache.get("location_prefetch", key) is not None:
+            return False
         
-        return self._generate_response(prompt)
+        try:
+            self._generate_location_description(location_data, player_data, key)
+        except AIUnavailableError:
+            return None
+        return True
+    
+    def _generate_location_description(self, location_data, player_data, key):
+        """Generate a location description with the model and cache it."""
+        description = self._generate_text(self._location_description_prompt(location_data, player_data))
+        if self.cache:
+            self.cache.put("location", key, description)
+        return description
+    
+    async def _generate_location_description_async(self, location_data, player_data, key):
+        """Generate a location description with the model's async API and cache it."""
+        description = await self._generate_text_async(self._location_description_prompt(location_data, player_data))
+        if self.cache:
+            await self._run_cache(self.cache.put, "location", key, description)
+        return description
+    
+    async def _run_cache(self, func, *args):
+        """Run a narrative cache call on the storage executor, since it can reach the storage backend."""
+        loop = asyncio.get_running_loop()
+        # Run in a copy of this task's context so spans and metrics attribution carry over
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(services.get_storage_executor(), functools.partial(context.run, func, *args))
+    
+    def _location_cache_key(self, location_data, player_data):
+        """Cache key for a location description: its structured inputs and the model."""
+        return cache_key("location", {"model": GEMINI_MODEL, **location_inputs(location_data, player_data)})
+    
+    def _location_description_prompt(self, location_data, player_data):
+        """Build the prompt for a location description."""
+        visited = player_data and player_data.get('visited_locations', {}).get(location_data['_id'])
+        return prompts.LOCATION_DESCRIPTION.render(
+            name=location_data['name'],
+            description=location_data['description'],
+            danger_level=location_data['danger_level'],
+            npcs=location_data.get('npcs', []),
+            enemies=location_data.get('enemies', []),
+            connections=location_data.get('connections', []),
+            visited="Note: The player has visited this location before." if visited else ""
+        )
+    
+    def generate_combat_narrative(self, player_data, enemy_data, combat_result):
+        """Generate a narrative for a combat encounter."""
+        player_stats = player_data.get('stats', {})
+        prompt = prompts.COMBAT_NARRATIVE.render(
+            name=player_data['name'],
+            level=player_data['level'],
+            player_class=player_data['class'],
+            health=player_stats.get('health', 'unknown'),
+            strength=player_stats.get('strength', 'unknown'),
+            defense=player_stats.get('defense', 'unknown'),
+            equipment=list(player_data.get('inventory', {})),
+            enemy_name=enemy_data['name'],
+            enemy_description=enemy_data['description'],
+            result=combat_result
+        )
+        
+        return self._generate_response(prompt, functools.partial(
+            self.narrator.generate_combat_narrative, player_data, enemy_data, combat_result
+        ))
     
     def generate_quest_dialogue(self, quest_data, npc_data, stage="introduction"):
-        """Generate dialogue for a quest giver NPC."""
+        """Generate dialogue for a quest giver NPC, or reuse a cached or pre-generated one."""
+        key = self._quest_dialogue_cache_key(quest_data, npc_data, stage)
+        cached = self.cache.get("quest", key) if self.cache else None
+        if cached is not None:
+            return cached
+        
+        try:
+            dialogue = self._generate_text(self._quest_dialogue_prompt(quest_data, npc_data, stage))
+        except AIUnavailableError as e:
+            return self._fallback(e, self.narrator.generate_quest_dialogue, quest_data, npc_data, stage)
+        if self.cache:
+            self.cache.put("quest", key, dialogue)
+        return dialogue
+    
+    def _quest_dialogue_cache_key(self, quest_data, npc_data, stage):
+        """Cache key for quest dialogue: its structured inputs and the model."""
+        return cache_key("quest_dialogue", {"model": GEMINI_MODEL, **quest_dialogue_inputs(quest_data, npc_data, stage)})
+    
+    def _quest_dialogue_prompt(self, quest_data, npc_data, stage):
+        """Build the prompt for quest giver dialogue."""
         # Get quest steps and rewards
         quest_steps = quest_data.get('steps', [])
         quest_rewards = quest_data.get('rewards', {})
@@ -115,29 +240,48 @@ class AIGenerator:
             for item_id, quantity in quest_rewards['items'].items():
                 rewards_str.append(f"{quantity} {item_id}")
         
-        rewards_text = ", ".join(rewards_str) if rewards_str else "No specific rewards"
-        
-        prompt = f"""
-        {self.game_context}
-        
-        Generate dialogue for this quest interaction:
-        NPC: {npc_data['name']} - {npc_data['description']}
-        Quest: {quest_data['name']} - {quest_data['description']}
-        Quest Steps: {', '.join(quest_steps)}
-        Quest Rewards: {rewards_text}
-        Stage: {stage} (introduction, in-progress, or completion)
-        
-        RULES:
-        1. ONLY reference quest steps and rewards that are listed above
-        2. DO NOT invent or hallucinate new quest objectives or rewards
-        3. Write the NPC's dialogue to the player in a natural and in-character way
-        4. Keep the dialogue focused on the actual quest details
-        5. If this is an introduction, explain what needs to be done and why
-        6. If this is in-progress, ask about progress or provide encouragement
-        7. If this is completion, thank the player and mention the specific rewards
-        """
+        return prompts.QUEST_DIALOGUE.render(
+            npc_name=npc_data['name'],
+            npc_description=npc_data['description'],
+            quest_name=quest_data['name'],
+            quest_description=quest_data['description'],
+            steps=quest_steps,
+            rewards=rewards_str,
+            stage=stage
+        )
+    
+    def location_description_request(self, location_data, player_data=None):
+        """Get the (cache key, prompt) a location description is generated and cached under."""
+        return (
+            self._location_cache_key(location_data, player_data),
+            self._location_description_prompt(location_data, player_data)
+        )
+    
+    def quest_dialogue_request(self, quest_data, npc_data, stage="introduction"):
+        """Get the (cache key, prompt) quest giver dialogue is generated and cached under."""
+        return (
+            self._quest_dialogue_cache_key(quest_data, npc_data, stage),
+            self._quest_dialogue_prompt(quest_data, npc_data, stage)
+        )
+    
+    def pregenerate(self, kind, key, prompt, variants):
+        """Generate `variants` distinct texts for a prompt and store them in the cache without expiry.
         
-        return self._generate_response(prompt)
+        Raises AIUnavailableError if the model can't be used, and ValueError
+        if there is no cache to store them in.
+        """
+        if not self.cache:
+            raise ValueError("pre-generation needs the narrative cache (AI_CACHE_ENABLED)")
+        texts = []
+        # Identical responses are retried, up to one extra call per variant
+        for _ in range(variants * 2):
+            text = self._generate_text(prompt)
+            if text not in texts:
+                texts.append(text)
+            if len(texts) >= variants:
+                break
+        self.cache.store_variants(kind, key, texts)
+        return texts
     
     def generate_item_discovery(self, item_data, discovery_context):
         """Generate a narrative for discovering an item."""
@@ -151,84 +295,162 @@ class AIGenerator:
         for effect, value in item_effects.items():
             effects_str.append(f"{effect}: {value}")
         
-        effects_text = ", ".join(effects_str) if effects_str else "No special effects"
-        
-        prompt = f"""
-        {self.game_context}
-        
-        Generate a description for finding this item:
-        Item: {item_data['name']} - {item_data['description']}
-        Type: {item_type}
-        Value: {item_value} gold
-        Effects: {effects_text}
-        Context: {discovery_context}
-        
-        RULES:
-        1. ONLY reference properties of the item that are listed above
-        2. DO NOT invent or hallucinate new item properties or effects
-        3. Describe how the player finds or receives this item in an interesting way
-        4. Keep the description consistent with the item's actual properties
-        5. Make the discovery feel rewarding and meaningful
-        """
-        
-        return self._generate_response(prompt)
+        prompt = prompts.ITEM_DISCOVERY.render(
+            name=item_data['name'],
+            description=item_data['description'],
+            type=item_type,
+            value=item_value,
+            effects=effects_str,
+            context=discovery_context
+        )
+        
+        return self._generate_response(prompt, functools.partial(
+            self.narrator.generate_item_discovery, item_data, discovery_context
+        ))
     
     def generate_response_to_action(self, player_data, action, current_location, game_state):
         """Generate a response to a player's action."""
-        # Get available NPCs, items, and connections for the current location
-        available_npcs = current_location.get('npcs', [])
-        available_enemies = current_location.get('enemies', [])
-        available_connections = current_location.get('connections', [])
-        
-        # Format the available objects for the prompt
-        npcs_str = "None" if not available_npcs else ", ".join(available_npcs)
-        enemies_str = "None" if not available_enemies else ", ".join(available_enemies)
-        connections_str = "None" if not available_connections else ", ".join(available_connections)
-        
-        prompt = f"""
-        {self.game_context}
-        
-        The player has taken this action: "{action}"
-        
-        Player: {player_data['name']}, a level {player_data['level']} {player_data['class']}
-        Current Location: {current_location['name']} - {current_location['description']}
-        
-        IMPORTANT: Only reference game objects that actually exist in the current context:
-        - Available NPCs in this location: {npcs_str}
-        - Available enemies in this location: {enemies_str}
-        - Connected locations: {connections_str}
-        - Player's inventory: {', '.join(player_data.get('inventory', {}).keys()) or 'Empty'}
-        
-        Generate a response to the player's action that advances the story and provides 
-        feedback on what happened as a result. Be creative but consistent with the game world.
-        
-        RULES:
-        1. ONLY mention NPCs, enemies, items, and locations that are listed above
-        2. DO NOT invent or hallucinate new game elements that aren't in the lists above
-        3. If the player tries to interact with something that doesn't exist, gently inform them
-        4. If the action doesn't make sense, suggest valid commands (go, look, talk, etc.)
-        5. Always include a suggestion to type 'help' for a list of commands if the player seems lost
-        """
-        
-        return self._generate_response(prompt)
+        return self._generate_response(
+            self._action_prompt(player_data, action, current_location),
+            functools.partial(self.narrator.generate_response_to_action, player_data, action, current_location, game_state)
+        )
+    
+    async def generate_response_to_action_async(self, player_data, action, current_location, game_state):
+        """Generate a response to a player's action without blocking the event loop."""
+        return await self._generate_response_async(
+            self._action_prompt(player_data, action, current_location),
+            functools.partial(self.narrator.generate_response_to_action, player_data, action, current_location, game_state)
+        )
     
-    def _generate_response(self, prompt):
-        """Generate a response using the Gemini model."""
-        # Add a final reminder to avoid hallucinations
-        final_prompt = f"""
-        {prompt}
+    def generate_response_to_action_stream(self, player_data, action, current_location, game_state):
+        """Generate a response to a player's action, yielding text as it arrives."""
+        yield from self._generate_response_stream(
+            self._action_prompt(player_data, action, current_location),
+            functools.partial(self.narrator.generate_response_to_action, player_data, action, current_location, game_state)
+        )
+    
+    def _action_prompt(self, player_data, action, current_location):
+        """Build the prompt for a response to a player's action."""
+        return prompts.ACTION_RESPONSE.render(
+            action=action,
+            name=player_data['name'],
+            level=player_data['level'],
+            player_class=player_data['class'],
+            location_name=current_location['name'],
+            location_description=current_location['description'],
+            npcs=current_location.get('npcs', []),
+            enemies=current_location.get('enemies', []),
+            connections=current_location.get('connections', []),
+            inventory=list(player_data.get('inventory', {}))
+        )
+    
+    def _response_text(self, response):
+        """Get the text of a model response or stream chunk, or None if it has none."""
+        try:
+            return response.text or None
+        except (AttributeError, ValueError):
+            # Blocked or empty candidates have no text
+            return None
+    
+    def _fallback(self, error, narrate=None, *args):
+        """Report an unavailable model and narrate from templates instead."""
+        print(f"Error generating AI response: {error}")
+        REGISTRY.inc("ai_fallback_responses_total", {})
+        return narrate(*args) if narrate else FALLBACK_RESPONSE
+    
+    def _generate_text(self, prompt):
+        """Get the model's text for a Prompt, within the deadline, retry and breaker limits.
         
-        FINAL REMINDER: Your response must ONLY reference game elements that actually exist in the game world.
-        DO NOT invent or hallucinate new NPCs, items, locations, or abilities that weren't mentioned in the prompt.
-        Keep your response concise (2-3 paragraphs maximum) and focused on the actual game state.
+        Raises AIUnavailableError if the model has no text for it in time.
         """
+        started = time.perf_counter()
+        with tracing.span("ai generate_content", "ai", prompt_chars=len(prompt.text), prompt_tokens=prompt.tokens) as ai_span:
+            response = call_with_retries(
+                lambda timeout: self.model.generate_content(prompt.text, request_options={"timeout": timeout}),
+                self.breaker,
+                scheduler=self.scheduler
+            )
+            text = self._response_text(response)
+            if ai_span:
+                ai_span.set("response_chars", len(text or ""))
+        prompts.log_usage(prompt, text, time.perf_counter() - started)
+        if not text:
+            raise AIUnavailableError("the model returned no text")
+        return text
+    
+    async def _generate_text_async(self, prompt):
+        """Get the model's text for a Prompt through the async API, with the same limits as _generate_text."""
+        started = time.perf_counter()
+        with tracing.span("ai generate_content_async", "ai", prompt_chars=len(prompt.text), prompt_tokens=prompt.tokens) as ai_span:
+            response = await call_with_retries_async(
+                lambda timeout: self.model.generate_content_async(prompt.text, request_options={"timeout": timeout}),
+                self.breaker,
+                scheduler=self.scheduler
+            )
+            text = self._response_text(response)
+            if ai_span:
+                ai_span.set("response_chars", len(text or ""))
+        prompts.log_usage(prompt, text, time.perf_counter() - started)
+        if not text:
+            raise AIUnavailableError("the model returned no text")
+        return text
+    
+    def _generate_response(self, prompt, fallback=None):
+        """Generate a response using the Gemini model, or fallback() if it is unavailable."""
+        try:
+            return self._generate_text(prompt)
+        except AIUnavailableError as e:
+            return self._fallback(e, fallback)
+    
+    async def _generate_response_async(self, prompt, fallback=None):
+        """Generate a response using the Gemini model's async API, or fallback() if it is unavailable."""
+        try:
+            return await self._generate_text_async(prompt)
+        except AIUnavailableError as e:
+            return self._fallback(e, fallback)
+    
+    def _generate_response_stream(self, prompt, fallback=None):
+        """Generate a response using the Gemini model, yielding text chunks as they arrive.
         
+        Retries cover the request up to its first chunk. If nothing arrives,
+        yields fallback() instead. Returns the whole text when the stream
+        completes, or None if it failed, so callers only cache complete responses.
+        """
+        started = time.perf_counter()
+        chunks = []
         try:
-            response = self.model.generate_content(final_prompt)
-            if response and hasattr(response, 'text') and response.text:
-                return response.text
-            else:
-                return "I don't understand that command. Type 'help' for a list of available commands."
+            with tracing.span("ai generate_content stream", "ai", prompt_chars=len(prompt.text), prompt_tokens=prompt.tokens) as ai_span:
+                stream = call_with_retries(
+                    lambda timeout: self.model.generate_content(
+                        prompt.text, stream=True, request_options={"timeout": timeout}
+                    ),
+                    self.breaker,
+                    scheduler=self.scheduler
+                )
+                for chunk in stream:
+                    text = self._response_text(chunk)
+                    if not text:
+                        continue
+                    if ai_span and not chunks:
+                        ai_span.set("first_chunk_ms", round((time.perf_counter() - started) * 1000, 1))
+                    chunks.append(text)
+                    yield text
+                if ai_span:
+                    ai_span.set("response_chars", sum(len(chunk) for chunk in chunks))
+            prompts.log_usage(prompt, "".join(chunks), time.perf_counter() - started)
+        except AIUnavailableError as e:
+            yield self._fallback(e, fallback)
+            return None
         except Exception as e:
-            print(f"Error generating AI response: {e}")
-            return "I don't understand that command. Type 'help' for a list of available commands."
\ No newline at end of file
+            # The stream broke after it started
+            self.breaker.record_failure()
+            if chunks:
+                print(f"Error generating AI response: {e}")
+            else:
+                yield self._fallback(e, fallback)
+            return None
+        
+        if not chunks:
+            yield self._fallback(AIUnavailableError("the model returned no text"), fallback)
+            return None
+        return "".join(chunks)
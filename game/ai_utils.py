@@ -3,10 +3,10 @@ AI utilities for the Fantasy RPG text adventure game.
 Provides a wrapper around the AIGenerator class.
 """
 
-from game.ai_generator import AIGenerator
+from game.services import get_ai_generator
 
-# Create a global instance of the AIGenerator
-ai_generator = AIGenerator()
+# Use the process-wide instance of the AIGenerator
+ai_generator = get_ai_generator()
 
 def generate_response(context, prompt):
     """
@@ -0,0 +1,171 @@
+"""
+Async Game Engine module for the Fantasy RPG text adventure game.
+Runs game sessions on an asyncio event loop so one process can serve many
+players at once: storage calls run on a bounded thread pool and Gemini
+calls use the async API, so no session blocks the loop while it waits.
+"""
+
+import asyncio
+import contextvars
+import functools
+from datetime import datetime
+
+from game import scheduler, services, tracing
+from game.game_engine import COMMAND_VERBS, GameEngine, command_verb
+from game.storage import PLAYER_PAGE_SIZE
+
+class AsyncGameEngine:
+    """Asyncio version of GameEngine with the same command surface.
+    
+    Game rules and session state live in a wrapped GameEngine. Blocking
+    storage work runs on the shared storage executor; AI narration awaits
+    the generator's *_async methods when it has them. Calls for one session
+    must be awaited one at a time, like commands typed by one player.
+    """
+    
+    def __init__(self, db=None, ai=None, world=None, executor=None, prefetcher=None):
+        """Initialize the async game engine."""
+        self.engine = GameEngine(db=db, ai=ai, world=world, prefetcher=prefetcher)
+        self.executor = executor or services.get_storage_executor()
+    
+    # Session state lives on the wrapped engine
+    
+    @property
+    def current_player(self):
+        """The loaded player, or None."""
+        return self.engine.current_player
+    
+    @property
+    def current_location(self):
+        """The player's current location, or None."""
+        return self.engine.current_location
+    
+    @property
+    def game_state(self):
+        """Quests, enemies and recent actions for the current session."""
+        return self.engine.game_state
+    
+    def close(self):
+        """End play for the current character, cancelling its queued prefetches."""
+        self.engine.close()
+    
+    async def _run(self, func, *args):
+        """Run a blocking call on the storage executor."""
+        loop = asyncio.get_running_loop()
+        # Run in a copy of this task's context so spans and metrics attribution carry over
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+    
+    async def _narrate(self, method_name, *args):
+        """Call an AI generator method, using its async version if it has one."""
+        async_method = getattr(self.engine.ai, f"{method_name}_async", None)
+        if async_method:
+            return await async_method(*args)
+        return await self._run(getattr(self.engine.ai, method_name), *args)
+    
+    # Characters
+    
+    async def create_new_player(self, name, player_class):
+        """Create a new player character."""
+        return await self._run(self.engine.create_new_player, name, player_class)
+    
+    async def load_player(self, player_id):
+        """Load a player character."""
+        # The player document and the world graph don't depend on each other
+        player_data, _ = await asyncio.gather(
+            self._run(self.engine.db.get_player, player_id),
+            self._run(self.engine.world.refresh)
+        )
+        if not player_data:
+            return False, "Player not found."
+        
+        return await self._run(self.engine._enter_game, player_data)
+    
+    async def load_player_by_name(self, name):
+        """Load a player character by name."""
+        player_data = await self._run(self.engine.db.get_player_by_name, name)
+        if not player_data:
+            return False, "Player not found."
+        
+        return await self.load_player(player_data["_id"])
+    
+    async def delete_player_by_name(self, name):
+        """Delete a player character by name."""
+        return await self._run(self.engine.delete_player_by_name, name)
+    
+    async def list_characters(self, sort="last_played", page_size=PLAYER_PAGE_SIZE, page_token=None, name_prefix=None):
+        """Get one page of characters. Returns (players, next_page_token)."""
+        return await self._run(self.engine.list_characters, sort, page_size, page_token, name_prefix)
+    
+    # Commands
+    
+    async def get_location_description(self):
+        """Get the description of the current location."""
+        engine = self.engine
+        if not engine.current_location or not engine.current_player:
+            return "You are nowhere. The void surrounds you."
+        
+        # The visit is recorded on an executor thread while the description is
+        # generated, so narrate from a copy that already counts it, as the sync
+        # engine does, rather than the player document being changed
+        location = engine.current_location
+        visited = engine.current_player.get("visited_locations", {})
+        player_view = {
+            **engine.current_player,
+            "visited_locations": {**visited, location["_id"]: visited.get(location["_id"]) or datetime.now()}
+        }
+        with scheduler.call_context(engine.session_id):
+            _, description = await asyncio.gather(
+                self._run(engine._mark_location_visited),
+                self._narrate("generate_location_description", location, player_view)
+            )
+        
+        return engine._add_location_details(description)
+    
+    async def process_command(self, command):
+        """Process a player command."""
+        command = self.engine._resolve_intent(command)
+        with tracing.trace_command(command, command_verb(command), self.engine.trace_hooks) as trace:
+            with scheduler.call_context(self.engine.session_id):
+                self.engine.last_trace = trace
+                try:
+                    return await self._process_command(command)
+                finally:
+                    # Write every player update buffered during this turn in one round trip
+                    if self.engine.current_player:
+                        await self._run(self.engine.db.flush, self.engine.current_player["_id"])
+                    self.engine._prefetch_neighbours()
+    
+    async def _process_command(self, command):
+        """Dispatch a player command, awaiting AI narration off the storage executor."""
+        engine = self.engine
+        parts = command.lower().split() if command else []
+        looking_around = len(parts) == 1 and parts[0] in ["look", "examine", "inspect"]
+        
+        # Commands that don't involve the AI narrator run entirely on the executor
+        if not engine.current_player or not parts or (parts[0] in COMMAND_VERBS and not looking_around):
+            return await self._run(engine._process_command, command)
+        
+        await self._run(engine._refresh_world)
+        
+        if looking_around:
+            return await self.get_location_description()
+        
+        # If no specific command is recognized, check if it's a repeat command
+        repeat_message = engine._check_repeated_command(command)
+        if repeat_message:
+            return repeat_message
+        
+        # Use AI to generate a response for unrecognized commands
+        try:
+            return await self._narrate(
+                "generate_response_to_action",
+                engine._enriched_player(),
+                command,
+                engine.current_location,
+                engine.game_state
+            )
+        except Exception as e:
+            # Fallback if AI fails
+            print(f"AI response generation failed: {e}")
+            return "I don't understand that command. Type 'help' for a list of available commands."
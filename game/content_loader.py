@@ -0,0 +1,175 @@
+"""
+Content loader for the Fantasy RPG text adventure game.
+Streams content packs (world, items, quests, enemies and NPCs) into storage
+in batches of _id-keyed upserts, so a pack can be reloaded any number of
+times without wiping collections first.
+"""
+
+import os
+import time
+from bson import json_util
+
+from game.storage import JSON_OPTIONS
+
+# Collections a content pack can contain, in load order
+CONTENT_COLLECTIONS = ["world", "items", "quests", "enemies", "npcs"]
+
+# File extensions read as one JSON document per line
+NDJSON_EXTENSIONS = [".ndjson", ".jsonl"]
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Seconds between progress lines while a collection loads
+PROGRESS_INTERVAL = 2.0
+
+# Changed documents listed per collection in a dry run
+DRY_RUN_SAMPLES = 10
+
+def iter_content_file(path):
+    """Stream documents from a content file.
+    
+    NDJSON files (.ndjson, .jsonl) hold one document per line and are read
+    lazily. .json files hold either a list of documents or an object keyed
+    by _id, like game.data.enemies.ENEMIES, and are read whole. MongoDB
+    extended JSON ({"$oid": ...}, {"$date": ...}) is understood in both.
+    """
+    if os.path.splitext(path)[1].lower() in NDJSON_EXTENSIONS:
+        with open(path, encoding="utf-8") as content_file:
+            for line in content_file:
+                line = line.strip()
+                if line:
+                    yield json_util.loads(line, json_options=JSON_OPTIONS)
+        return
+    
+    with open(path, encoding="utf-8") as content_file:
+        data = json_util.loads(content_file.read(), json_options=JSON_OPTIONS)
+    if isinstance(data, dict):
+        for doc_id, document in data.items():
+            yield {"_id": doc_id, **document}
+    else:
+        yield from data
+
+def find_pack_files(directory):
+    """Get (collection name, path) for each content file in a pack directory.
+    
+    Files are matched to collections by name, e.g. world.ndjson or items.json.
+    """
+    files = []
+    for collection_name in CONTENT_COLLECTIONS:
+        for extension in NDJSON_EXTENSIONS + [".json"]:
+            path = os.path.join(directory, collection_name + extension)
+            if os.path.isfile(path):
+                files.append((collection_name, path))
+                break
+    return files
+
+def as_stored(value):
+    """Convert a document the way storage does, so tuples compare equal to stored lists."""
+    if isinstance(value, dict):
+        return {key: as_stored(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [as_stored(item) for item in value]
+    return value
+
+def changed_fields(old, new):
+    """Top-level fields that differ between two versions of a document."""
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+class ContentLoader:
+    """Loads content into a storage backend in batches of upserts.
+    
+    With dry_run set, nothing is written: each batch is compared with what
+    is stored and the loader reports new, changed and unchanged documents.
+    """
+    
+    def __init__(self, db, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, output=print):
+        """Initialize the loader."""
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+        self.output = output
+        # IDs of the world documents written, for world graphs to reread
+        self.changed_locations = []
+    
+    def load_pack(self, directory):
+        """Load every content file in a pack directory. Returns counts per collection."""
+        files = find_pack_files(directory)
+        if not files:
+            self.output(f"No content files found in {directory}")
+            return {}
+        return self.load_collections(
+            {collection_name: iter_content_file(path) for collection_name, path in files}
+        )
+    
+    def load_collections(self, content):
+        """Load a dict of collection name to documents. Returns counts per collection."""
+        self.changed_locations = []
+        results = {}
+        for collection_name, documents in content.items():
+            results[collection_name] = self.load(collection_name, documents)
+        
+        # Tell running game processes to drop their cached copies of static content
+        if not self.dry_run and any(counts["written"] for counts in results.values()):
+            self.db.bump_content_version(self.changed_locations)
+        return results
+    
+    def load(self, collection_name, documents):
+        """Load documents into one collection, batch_size at a time."""
+        counts = {"read": 0, "skipped": 0, "written": 0, "new": 0, "changed": 0, "unchanged": 0}
+        started = time.perf_counter()
+        last_report = started
+        
+        batch = []
+        for document in documents:
+            counts["read"] += 1
+            if "_id" not in document:
+                counts["skipped"] += 1
+                self.output(f"Skipping {collection_name} document {counts['read']}: it has no _id")
+                continue
+            
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                self._load_batch(collection_name, batch, counts)
+                batch = []
+                if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.perf_counter()
+                    self._report(collection_name, counts, last_report - started)
+        if batch:
+            self._load_batch(collection_name, batch, counts)
+        
+        self._report(collection_name, counts, time.perf_counter() - started, final=True)
+        return counts
+    
+    def _load_batch(self, collection_name, batch, counts):
+        """Write one batch, or compare it with storage in a dry run."""
+        if not self.dry_run:
+            counts["written"] += self.db.upsert_documents(collection_name, batch)
+            if collection_name == "world":
+                self.changed_locations.extend(doc["_id"] for doc in batch)
+            return
+        
+        stored = self.db.get_documents(collection_name, [doc["_id"] for doc in batch])
+        for document in map(as_stored, batch):
+            existing = stored.get(document["_id"])
+            if existing is None:
+                counts["new"] += 1
+            elif existing == document:
+                counts["unchanged"] += 1
+            else:
+                counts["changed"] += 1
+                if counts["changed"] <= DRY_RUN_SAMPLES:
+                    fields = ", ".join(changed_fields(existing, document))
+                    self.output(f"  ~ {collection_name}/{document['_id']}: {fields}")
+    
+    def _report(self, collection_name, counts, elapsed, final=False):
+        """Print a progress or summary line for a collection."""
+        rate = counts["read"] / elapsed if elapsed > 0 else 0
+        if self.dry_run:
+            line = (f"{collection_name}: {counts['read']:,} read, {counts['new']:,} new, "
+                    f"{counts['changed']:,} changed, {counts['unchanged']:,} unchanged")
+        else:
+            line = f"{collection_name}: {counts['read']:,} read, {counts['written']:,} written"
+        if counts["skipped"]:
+            line += f", {counts['skipped']:,} skipped"
+        line += f" ({rate:,.0f} docs/s)"
+        self.output(line if final else line + " ...")
@@ -0,0 +1,213 @@
+"""
+Procedural content generator for the Fantasy RPG text adventure game.
+Builds seeded worlds of any size in the same document shapes as the
+hand-written seed data, for load testing and benchmarks.
+"""
+
+import random
+
+ADJECTIVES = [
+    "Misty", "Silent", "Golden", "Shadowed", "Frozen", "Sunlit", "Ancient", "Whispering",
+    "Crimson", "Hollow", "Broken", "Emerald", "Forgotten", "Windswept", "Mossy", "Ashen",
+    "Gloomy", "Verdant", "Stormy", "Quiet"
+]
+PLACES = [
+    "Village", "Forest", "Clearing", "Cave", "Ridge", "Marsh", "Crossing", "Ruins",
+    "Meadow", "Hollow", "Tower", "Bridge", "Glade", "Pass", "Harbor", "Mine",
+    "Shrine", "Valley", "Camp", "Watchtower"
+]
+CREATURES = [
+    "Wolf", "Goblin", "Bandit", "Bear", "Spider", "Troll", "Bat", "Skeleton",
+    "Wraith", "Boar", "Serpent", "Ogre"
+]
+TITLES = ["Elder", "Blacksmith", "Merchant", "Hunter", "Healer", "Guard", "Scholar", "Farmer"]
+FIRST_NAMES = ["Aldric", "Brina", "Cedric", "Dara", "Edda", "Fenn", "Gwen", "Hale", "Ilse", "Joren"]
+ITEM_KINDS = [
+    ("consumable", "Potion", "A small vial of restorative liquid."),
+    ("weapon", "Blade", "A well-balanced blade."),
+    ("armor", "Shield", "A sturdy shield."),
+    ("tool", "Lantern", "A lantern that lights the way."),
+]
+
+def _entity_name(words_a, words_b, index):
+    """Build a readable name that stays unique for any index."""
+    combos = len(words_a) * len(words_b)
+    name = f"{words_a[index % len(words_a)]} {words_b[(index // len(words_a)) % len(words_b)]}"
+    if index >= combos:
+        name += f" {index // combos + 1}"
+    return name
+
+def _location_id(index):
+    """ID of the location at an index. Location 0 is the starting village."""
+    return "village_start" if index == 0 else f"loc_{index}"
+
+class WorldGenerator:
+    """Seeded generator for world, enemy, NPC, item and quest documents.
+    
+    The same seed and sizes always produce the same content. Collections are
+    produced lazily by the generate_* methods, so only the connection graph
+    and entity placements are held in memory.
+    """
+    
+    def __init__(self, locations=1000, avg_connections=3, npcs=None, enemies=None,
+                 items=None, quests=None, seed=42):
+        """Initialize the generator and lay out the connection graph."""
+        self.locations = max(1, locations)
+        self.avg_connections = avg_connections
+        self.npcs = npcs if npcs is not None else max(1, self.locations // 4)
+        self.enemies = enemies if enemies is not None else max(1, min(self.locations // 10, 10000))
+        self.items = items if items is not None else max(1, self.locations // 5)
+        self.quests = quests if quests is not None else max(1, self.locations // 5)
+        self.seed = seed
+        
+        rng = random.Random(seed)
+        self._connections = self._build_connections(rng)
+        self._npc_locations = [rng.randrange(self.locations) for _ in range(self.npcs)]
+        self._npcs_at = {}
+        for npc_index, location_index in enumerate(self._npc_locations):
+            self._npcs_at.setdefault(location_index, []).append(npc_index)
+    
+    def _build_connections(self, rng):
+        """Connect every location into one graph, mostly to nearby indexes.
+        
+        A random spanning tree keeps the world connected; extra edges bring
+        the average degree up to avg_connections. Connections go both ways.
+        """
+        connections = [set() for _ in range(self.locations)]
+        for index in range(1, self.locations):
+            other = rng.randrange(max(0, index - 50), index)
+            connections[index].add(other)
+            connections[other].add(index)
+        
+        extra_edges = max(0, int(self.locations * self.avg_connections / 2) - (self.locations - 1))
+        for _ in range(extra_edges):
+            index = rng.randrange(self.locations)
+            other = min(self.locations - 1, max(0, index + rng.randint(-100, 100)))
+            if other != index:
+                connections[index].add(other)
+                connections[other].add(index)
+        return [sorted(c) for c in connections]
+    
+    def counts(self):
+        """Number of documents each collection will receive."""
+        return {
+            "world": self.locations,
+            "npcs": self.npcs,
+            "enemies": self.enemies,
+            "items": self.items,
+            "quests": self.quests,
+        }
+    
+    def generate_world(self):
+        """Yield location documents."""
+        rng = random.Random(self.seed + 1)
+        for index in range(self.locations):
+            danger_level = 0 if index == 0 else min(5, rng.randint(0, 1 + index * 5 // self.locations))
+            location = {
+                "_id": _location_id(index),
+                "name": "Starting Village" if index == 0 else _entity_name(ADJECTIVES, PLACES, index - 1),
+                "description": f"A generated location, region {index // 100}.",
+                "connections": [_location_id(i) for i in self._connections[index]],
+                "npcs": [f"npc_{i}" for i in self._npcs_at.get(index, [])],
+                "danger_level": danger_level
+            }
+            if danger_level:
+                location["enemies"] = [
+                    f"enemy_{rng.randrange(self.enemies)}" for _ in range(rng.randint(1, 3))
+                ]
+            yield location
+    
+    def generate_enemies(self):
+        """Yield enemy documents shaped like game.data.enemies.ENEMIES entries."""
+        rng = random.Random(self.seed + 2)
+        for index in range(self.enemies):
+            level = rng.randint(1, 10)
+            creature = CREATURES[index % len(CREATURES)]
+            yield {
+                "_id": f"enemy_{index}",
+                "name": f"{ADJECTIVES[index % len(ADJECTIVES)]} {creature}",
+                "description": f"A hostile {creature.lower()} of level {level}.",
+                "level": level,
+                "health": 10 + level * 10,
+                "attack": 1 + level,
+                "defense": level // 2,
+                "xp_reward": level * 12,
+                "gold_reward": [level, level * 3],
+                "loot_table": {f"item_{rng.randrange(self.items)}": round(rng.random() * 0.5, 2)}
+            }
+    
+    def generate_npcs(self):
+        """Yield NPC documents shaped like game.data.npcs.NPCS entries."""
+        rng = random.Random(self.seed + 3)
+        for index in range(self.npcs):
+            title = TITLES[index % len(TITLES)]
+            npc = {
+                "_id": f"npc_{index}",
+                "name": f"{FIRST_NAMES[(index // len(TITLES)) % len(FIRST_NAMES)]} the {title}",
+                "description": f"A local {title.lower()}.",
+                "location": _location_id(self._npc_locations[index]),
+                "dialogue": {
+                    "greeting": "Well met, traveler.",
+                    "farewell": "Safe travels."
+                },
+                "quests": [f"quest_{i}" for i in range(index, self.quests, self.npcs)][:3]
+            }
+            if title == "Merchant":
+                npc["shop"] = {
+                    f"item_{rng.randrange(self.items)}": rng.randint(5, 100) for _ in range(3)
+                }
+            yield npc
+    
+    def generate_items(self):
+        """Yield item documents."""
+        rng = random.Random(self.seed + 4)
+        for index in range(self.items):
+            item_type, noun, description = ITEM_KINDS[index % len(ITEM_KINDS)]
+            item = {
+                "_id": f"item_{index}",
+                "name": f"{ADJECTIVES[(index // len(ITEM_KINDS)) % len(ADJECTIVES)]} {noun}",
+                "type": item_type,
+                "description": description,
+                "value": rng.randint(1, 200)
+            }
+            if item_type == "consumable":
+                item["effects"] = {"health": rng.randint(10, 50)}
+            elif item_type == "weapon":
+                item["damage"] = rng.randint(2, 12)
+            elif item_type == "armor":
+                item["defense"] = rng.randint(1, 8)
+            yield item
+    
+    def generate_quests(self):
+        """Yield quest documents, each given by an NPC at that NPC's location."""
+        rng = random.Random(self.seed + 5)
+        for index in range(self.quests):
+            npc_index = index % self.npcs
+            yield {
+                "_id": f"quest_{index}",
+                "name": f"Trouble at {_entity_name(ADJECTIVES, PLACES, index)}",
+                "description": "Someone needs a hand with a local problem.",
+                "location": _location_id(self._npc_locations[npc_index]),
+                "giver": f"npc_{npc_index}",
+                "min_level": rng.randint(1, 10),
+                "rewards": {
+                    "xp": rng.randint(20, 500),
+                    "gold": rng.randint(5, 100),
+                    "items": {f"item_{rng.randrange(self.items)}": 1}
+                },
+                "steps": [
+                    "Talk to the quest giver",
+                    f"Defeat the enemy_{rng.randrange(self.enemies)} nearby",
+                    "Return for your reward"
+                ]
+            }
+    
+    def generate(self):
+        """Get a lazy iterator of documents for every collection."""
+        return {
+            "world": self.generate_world(),
+            "npcs": self.generate_npcs(),
+            "enemies": self.generate_enemies(),
+            "items": self.generate_items(),
+            "quests": self.generate_quests(),
+        }
@@ -3,113 +3,727 @@ Database module for the Fantasy RPG text adventure game.
 Handles all MongoDB operations.
 """
 
+import atexit
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
 from bson.objectid import ObjectId
 
+from game.metrics import instrument_storage, operation
+from game.storage import (
+    CONTENT_CHANGE_LOG_LENGTH,
+    PLAYER_PAGE_SIZE,
+    PLAYER_SUMMARY_FIELDS,
+    SCHEMA_META_ID,
+    SCHEMA_UPGRADE_LEASE,
+    SCHEMA_VERSION,
+    StorageBackend,
+    check_player_sort,
+    content_change_versions,
+    content_changes_id,
+    decode_page_token,
+    encode_page_token,
+    logged_changes,
+    merge_content_changes,
+    new_choice_event,
+    prefix_upper_bound
+)
+
 # Load environment variables
 load_dotenv()
 
 # Get MongoDB connection string from environment variables
 MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "fantasy_rpg")
+
+# Indexes every collection is expected to carry, keyed by collection name.
+# Each entry mirrors the arguments of pymongo's IndexModel. Bump
+# game.storage.SCHEMA_VERSION after changing them.
+INDEX_SPECS = {
+    "players": [
+        {"keys": [("name", ASCENDING)], "name": "name_unique", "unique": True},
+        {"keys": [("last_played", DESCENDING), ("_id", DESCENDING)], "name": "last_played_id_desc"},
+    ],
+    "items": [
+        {"keys": [("type", ASCENDING)], "name": "type"},
+    ],
+    "quests": [
+        {"keys": [("location", ASCENDING), ("min_level", ASCENDING)], "name": "location_min_level"},
+    ],
+    "world": [
+        {"keys": [("name", ASCENDING)], "name": "name"},
+    ],
+    "player_choices": [
+        {"keys": [("player_id", ASCENDING), ("ts", ASCENDING), ("_id", ASCENDING)], "name": "player_id_ts"},
+    ],
+    "narratives": [
+        {"keys": [("expires_at", ASCENDING)], "name": "expires_at_ttl", "expireAfterSeconds": 0},
+    ],
+}
+
+# Player documents are loaded without their unbounded history fields
+PLAYER_PROJECTION = {"choices": 0}
+
+# Read-through cache settings for static content (world, items, quests).
+# Entries expire after STATIC_CACHE_TTL seconds; the content version document
+# is re-read at most every CONTENT_VERSION_CHECK_INTERVAL seconds and a
+# changed version clears every static cache at once.
+STATIC_CACHE_TTL = float(os.getenv("STATIC_CACHE_TTL", "300"))
+STATIC_CACHE_SIZES = {
+    "world": int(os.getenv("STATIC_CACHE_WORLD_SIZE", "10000")),
+    "items": int(os.getenv("STATIC_CACHE_ITEMS_SIZE", "5000")),
+    "quests": int(os.getenv("STATIC_CACHE_QUESTS_SIZE", "5000")),
+}
+CONTENT_VERSION_CHECK_INTERVAL = float(os.getenv("CONTENT_VERSION_CHECK_INTERVAL", "30"))
+CONTENT_VERSION_ID = "content_version"
+
+# Write-behind buffering of player updates. Buffered operations are flushed
+# at the end of every command, every WRITE_BUFFER_FLUSH_INTERVAL seconds and
+# when the process exits.
+WRITE_BUFFER_ENABLED = os.getenv("WRITE_BUFFER_ENABLED", "true").lower() in ("1", "true", "yes")
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.getenv("WRITE_BUFFER_FLUSH_INTERVAL", "5"))
+
+class LRUCache:
+    """Thread-safe LRU mapping with an optional TTL and hit/miss counters."""
+    
+    def __init__(self, max_size, ttl=None):
+        """Initialize an empty cache holding at most max_size entries."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """Return (found, value) for a key, refreshing its recency on a hit."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+    
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Return the hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+def _paths_overlap(path, other):
+    """Check whether two dotted field paths refer to the same or nested fields."""
+    return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+
+def _legacy_choice_id(player_id, index):
+    """Deterministic ObjectId for the index-th choice embedded in a player document."""
+    return ObjectId(hashlib.sha256(f"{player_id}:{index}".encode("utf-8")).digest()[:12])
+
+class PlayerWriteBuffer:
+    """Unit of work that coalesces player updates into a single bulk_write.
+    
+    Operations for the same player are merged into one update document while
+    they touch independent fields: repeated $set keep the last value, $inc
+    amounts are summed and $push values are appended with $each. An operation
+    that would conflict with the pending document starts a new one, so the
+    original order of writes is preserved.
+    
+    Append-only events (player choices) are batched alongside and written
+    with one insert_many per flush.
+    """
+    
+    def __init__(self, collection, events_collection=None, flush_interval=None):
+        """Initialize the buffer and start the periodic flush thread."""
+        self.collection = collection
+        self.events_collection = events_collection
+        self._pending = OrderedDict()
+        self._events = []
+        self._lock = threading.RLock()
+        # Held for the whole of a flush, so flushes write in the order they took their batches
+        self._flush_lock = threading.Lock()
+        self.operations_buffered = 0
+        self.updates_written = 0
+        self.events_written = 0
+        self.flushes = 0
+        
+        self._stop = threading.Event()
+        if flush_interval:
+            self._thread = threading.Thread(
+                target=self._flush_periodically,
+                args=(flush_interval,),
+                name="player-write-buffer",
+                daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.close)
+    
+    def add(self, player_id, operator, fields):
+        """Queue a $set, $inc or $push of the given fields for a player."""
+        with self._lock:
+            updates = self._pending.setdefault(player_id, [])
+            if not updates or not self._merge(updates[-1], operator, fields):
+                updates.append({})
+                self._merge(updates[-1], operator, fields)
+            self.operations_buffered += 1
+    
+    def add_event(self, event):
+        """Queue an event document for the events collection."""
+        with self._lock:
+            self._events.append(event)
+            self.operations_buffered += 1
+    
+    def _merge(self, update, operator, fields):
+        """Merge fields into an update document. Returns False on a conflict."""
+        for path in fields:
+            for other_operator, other_fields in update.items():
+                for other_path in other_fields:
+                    if not _paths_overlap(path, other_path):
+                        continue
+                    if other_operator != operator or path != other_path:
+                        return False
+        
+        target = update.setdefault(operator, {})
+        for path, value in fields.items():
+            if operator == "$inc":
+                target[path] = target.get(path, 0) + value
+            elif operator == "$push":
+                target.setdefault(path, {"$each": []})["$each"].append(value)
+            else:
+                target[path] = value
+        return True
+    
+    def has_pending(self, player_id=None):
+        """Check whether anything is waiting to be written."""
+        with self._lock:
+            if self._events:
+                return True
+            if player_id is None:
+                return bool(self._pending)
+            return player_id in self._pending
+    
+    def has_pending_updates(self, player_id):
+        """Check whether updates for one player are waiting to be written."""
+        with self._lock:
+            return player_id in self._pending
+    
+    def discard(self, player_id):
+        """Forget buffered writes for a player, e.g. one that was deleted."""
+        with self._lock:
+            self._pending.pop(player_id, None)
+            self._events = [e for e in self._events if e["player_id"] != player_id]
+    
+    def flush(self, player_id=None):
+        """Write buffered updates (for one player or all) in one bulk_write.
+        
+        Buffered events are always written in full. Pending writes are taken
+        under the buffer lock and sent after it is released, so game threads
+        queueing updates never wait on the network.
+        """
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+                if player_id is None:
+                    batch = list(self._pending.items())
+                    self._pending.clear()
+                elif player_id in self._pending:
+                    batch = [(player_id, self._pending.pop(player_id))]
+                else:
+                    batch = []
+            
+            self._write_events(events)
+            
+            requests = [
+                (pid, update)
+                for pid, updates in batch
+                for update in updates
+            ]
+            if not requests:
+                return None
+            
+            try:
+                result = self.collection.bulk_write(
+                    [UpdateOne({"_id": pid}, update) for pid, update in requests],
+                    ordered=True
+                )
+            except BulkWriteError as e:
+                # Ordered bulk writes stop at the first error; that update is
+                # dropped and the ones after it are kept for the next flush.
+                failed_index = e.details["writeErrors"][0]["index"]
+                print(f"Error flushing player updates: {e.details['writeErrors'][0].get('errmsg')}")
+                self._requeue(requests[failed_index + 1:])
+                return None
+            except PyMongoError as e:
+                print(f"Error flushing player updates: {e}")
+                self._requeue(requests)
+                return None
+            
+            with self._lock:
+                self.flushes += 1
+                self.updates_written += len(requests)
+            return result
+    
+    def _write_events(self, events):
+        """Write taken events in one unordered insert_many, putting them back if it fails."""
+        if not events:
+            return
+        try:
+            self.events_collection.insert_many(events, ordered=False)
+            written = len(events)
+        except BulkWriteError as e:
+            # Events already carry their _id, so only the failed ones are lost
+            print(f"Error writing player events: {len(e.details['writeErrors'])} failed")
+            written = e.details["nInserted"]
+        except PyMongoError as e:
+            print(f"Error writing player events: {e}")
+            with self._lock:
+                self._events = events + self._events
+            return
+        with self._lock:
+            self.events_written += written
+    
+    def _requeue(self, requests):
+        """Put unwritten updates back in front of anything queued since."""
+        with self._lock:
+            pending = OrderedDict()
+            for pid, update in requests:
+                pending.setdefault(pid, []).append(update)
+            for pid, updates in self._pending.items():
+                pending.setdefault(pid, []).extend(updates)
+            self._pending = pending
+    
+    def _flush_periodically(self, interval):
+        """Background loop for the timer-driven flush."""
+        while not self._stop.wait(interval):
+            with operation("write_buffer_timer"):
+                self.flush()
+    
+    def close(self):
+        """Stop the timer thread and write anything still buffered."""
+        self._stop.set()
+        self.flush()
+    
+    def stats(self):
+        """Get counters showing how many operations were coalesced."""
+        with self._lock:
+            return {
+                "operations_buffered": self.operations_buffered,
+                "updates_written": self.updates_written,
+                "events_written": self.events_written,
+                "flushes": self.flushes,
+                "pending_players": len(self._pending),
+            }
 
-class Database:
+@instrument_storage("mongo")
+class Database(StorageBackend):
     """MongoDB database connection and operations."""
     
-    def __init__(self):
-        """Initialize database connection."""
-        self.client = MongoClient(MONGODB_URI)
-        self.db = self.client["fantasy_rpg"]
+    def __init__(self, client=None, db_name=MONGODB_DB_NAME):
+        """Initialize database connection, optionally on a shared client."""
+        self.client = client or MongoClient(MONGODB_URI)
+        self.db = self.client[db_name]
         
         # Collections
         self.players = self.db["players"]
         self.items = self.db["items"]
         self.quests = self.db["quests"]
         self.world = self.db["world"]
+        self.meta = self.db["meta"]
+        self.player_choices = self.db["player_choices"]
+        self.narratives = self.db["narratives"]
+        
+        # Read-through caches for static content, keyed by collection name
+        self.static_cache = {
+            name: LRUCache(size, STATIC_CACHE_TTL)
+            for name, size in STATIC_CACHE_SIZES.items()
+        }
+        self._content_version = None
+        self._content_version_checked_at = None
+        self.content_version_reads = 0
         
+        # Write-behind buffer for per-turn player updates
+        self.write_buffer = None
+        if WRITE_BUFFER_ENABLED:
+            self.write_buffer = PlayerWriteBuffer(
+                self.players, self.player_choices, WRITE_BUFFER_FLUSH_INTERVAL
+            )
+    
+    def ensure_indexes(self):
+        """Create any declared indexes that are missing. Safe to call repeatedly."""
+        for collection_name, specs in INDEX_SPECS.items():
+            for spec in specs:
+                options = {k: v for k, v in spec.items() if k != "keys"}
+                try:
+                    self.db[collection_name].create_index(spec["keys"], **options)
+                except (DuplicateKeyError, OperationFailure) as e:
+                    # Typically a unique index over data that already has duplicates
+                    print(f"Could not create index '{spec['name']}' on '{collection_name}': {e}")
+    
+    def index_report(self):
+        """Report declared indexes that are missing and existing indexes that are unused."""
+        report = {}
+        for collection_name, specs in INDEX_SPECS.items():
+            collection = self.db[collection_name]
+            existing = collection.index_information()
+            declared = {spec["name"] for spec in specs}
+            
+            # $indexStats counts accesses since the server last restarted
+            try:
+                usage = {
+                    stat["name"]: stat["accesses"]["ops"]
+                    for stat in collection.aggregate([{"$indexStats": {}}])
+                }
+            except OperationFailure:
+                usage = {}
+            
+            report[collection_name] = {
+                "missing": sorted(declared - set(existing)),
+                "unused": sorted(
+                    name for name in existing
+                    if name != "_id_" and usage.get(name) == 0
+                ),
+                "undeclared": sorted(
+                    name for name in existing
+                    if name != "_id_" and name not in declared
+                ),
+            }
+        return report
+    
     def create_player(self, player_data):
-        """Create a new player in the database."""
-        return self.players.insert_one(player_data).inserted_id
+        """Create a new player in the database. Returns None if the name is taken."""
+        try:
+            return self.players.insert_one(player_data).inserted_id
+        except DuplicateKeyError:
+            return None
     
     def get_player(self, player_id):
         """Get player data by ID."""
-        return self.players.find_one({"_id": ObjectId(player_id)})
+        self.flush(ObjectId(player_id))
+        return self.players.find_one({"_id": ObjectId(player_id)}, PLAYER_PROJECTION)
     
     def get_player_by_name(self, name):
         """Get player data by name."""
-        return self.players.find_one({"name": name})
+        player = self.players.find_one({"name": name}, PLAYER_PROJECTION)
+        # Names never change, so only the matched player's buffered updates need writing first
+        if player and self.write_buffer and self.write_buffer.has_pending_updates(player["_id"]):
+            self.write_buffer.flush(player["_id"])
+            player = self.players.find_one({"_id": player["_id"]}, PLAYER_PROJECTION)
+        return player
     
-    def get_all_players(self):
-        """Get all players from the database."""
-        return list(self.players.find({}, {"name": 1, "class": 1, "level": 1, "created_at": 1, "last_played": 1}))
-    
-    def update_player(self, player_id, update_data):
-        """Update player data."""
-        return self.players.update_one(
-            {"_id": ObjectId(player_id)},
-            {"$set": update_data}
+    def list_players(self, sort="last_played", limit=PLAYER_PAGE_SIZE, page_token=None, name_prefix=None):
+        """Get one page of player summaries, keyset-paginated on (sort field, _id)."""
+        descending = check_player_sort(sort)
+        direction = DESCENDING if descending else ASCENDING
+        self.flush()
+        
+        query = {}
+        if name_prefix:
+            # A range rather than a regex so the name index bounds the scan
+            query["name"] = {"$gte": name_prefix, "$lt": prefix_upper_bound(name_prefix)}
+        if page_token:
+            last_value, last_id = decode_page_token(page_token)
+            after = "$lt" if descending else "$gt"
+            query["$or"] = [{sort: {after: last_value}}, {sort: last_value, "_id": {after: last_id}}]
+        
+        # Names are unique, so sorting on name alone can use the name index
+        sort_keys = [(sort, direction)] if sort == "name" else [(sort, direction), ("_id", direction)]
+        players = list(
+            self.players.find(query, {field: 1 for field in PLAYER_SUMMARY_FIELDS})
+            .sort(sort_keys)
+            .limit(limit + 1)
         )
+        
+        next_page_token = None
+        if len(players) > limit:
+            players = players[:limit]
+            next_page_token = encode_page_token([players[-1].get(sort), players[-1]["_id"]])
+        return players, next_page_token
     
-    def update_player_inventory(self, player_id, item_id, quantity=1, remove=False):
-        """Add or remove items from player inventory."""
-        if remove:
-            return self.players.update_one(
-                {"_id": ObjectId(player_id)},
-                {"$inc": {f"inventory.{item_id}": -quantity}}
-            )
-        else:
-            return self.players.update_one(
-                {"_id": ObjectId(player_id)},
-                {"$inc": {f"inventory.{item_id}": quantity}}
-            )
+    def add_player_choice(self, player_id, choice_data):
+        """Add player choice to the append-only choice history."""
+        event = new_choice_event(player_id, choice_data)
+        if self.write_buffer:
+            self.write_buffer.add_event(event)
+            return None
+        return self.player_choices.insert_one(event)
     
-    def update_player_progress(self, player_id, quest_id, status):
-        """Update player quest progress."""
-        return self.players.update_one(
-            {"_id": ObjectId(player_id)},
-            {"$set": {f"quests.{quest_id}": status}}
+    def get_player_choices(self, player_id, limit=50, page_token=None):
+        """Get one page of a player's choice history, oldest first.
+        
+        Returns (choices, next_page_token); the token is None on the last page.
+        """
+        self.flush(ObjectId(player_id))
+        query = {"player_id": ObjectId(player_id)}
+        if page_token:
+            last_ts, last_id = decode_page_token(page_token)
+            query["$or"] = [
+                {"ts": {"$gt": last_ts}},
+                {"ts": last_ts, "_id": {"$gt": last_id}}
+            ]
+        
+        choices = list(
+            self.player_choices.find(query)
+            .sort([("ts", ASCENDING), ("_id", ASCENDING)])
+            .limit(limit + 1)
         )
+        next_page_token = None
+        if len(choices) > limit:
+            choices = choices[:limit]
+            next_page_token = encode_page_token([choices[-1]["ts"], choices[-1]["_id"]])
+        return choices, next_page_token
     
-    def add_player_choice(self, player_id, choice_data):
-        """Add player choice to history."""
+    def iter_player_choices(self, player_id, batch_size=100):
+        """Stream a player's whole choice history through a server-side cursor."""
+        self.flush(ObjectId(player_id))
+        cursor = (
+            self.player_choices.find({"player_id": ObjectId(player_id)})
+            .sort([("ts", ASCENDING), ("_id", ASCENDING)])
+            .batch_size(batch_size)
+        )
+        with cursor:
+            for choice in cursor:
+                yield choice
+    
+    def migrate_legacy_choices(self):
+        """Move choice arrays embedded in player documents into player_choices.
+        
+        Each event's _id is derived from the player and the choice's position,
+        and written with an upsert, so a run interrupted before a player's
+        array is unset copies nothing twice when it is run again.
+        """
+        migrated = 0
+        for player in self.players.find({"choices.0": {"$exists": True}}, {"choices": 1}):
+            requests = []
+            for index, choice in enumerate(player["choices"]):
+                event = {
+                    "player_id": player["_id"],
+                    "ts": choice.get("timestamp", datetime.now()) if isinstance(choice, dict) else datetime.now(),
+                    "choice": choice
+                }
+                requests.append(UpdateOne(
+                    {"_id": _legacy_choice_id(player["_id"], index)}, {"$setOnInsert": event}, upsert=True
+                ))
+            self.player_choices.bulk_write(requests, ordered=False)
+            self.players.update_one({"_id": player["_id"]}, {"$unset": {"choices": ""}})
+            migrated += len(requests)
+        return migrated
+    
+    def _update_player(self, player_id, operator, fields):
+        """Apply a player update now, or queue it when write buffering is on.
+        
+        Buffered updates return None; the write happens on the next flush.
+        """
+        if self.write_buffer:
+            self.write_buffer.add(ObjectId(player_id), operator, fields)
+            return None
         return self.players.update_one(
             {"_id": ObjectId(player_id)},
-            {"$push": {"choices": choice_data}}
+            {operator: fields}
         )
-        
+    
+    def flush(self, player_id=None):
+        """Write buffered player updates for one player, or for all players."""
+        if self.write_buffer and self.write_buffer.has_pending(player_id):
+            return self.write_buffer.flush(player_id)
+        return None
+    
     def delete_player(self, player_id):
         """Delete a player from the database."""
         if isinstance(player_id, str):
             player_id = ObjectId(player_id)
+        if self.write_buffer:
+            self.write_buffer.discard(player_id)
+        self.player_choices.delete_many({"player_id": player_id})
         return self.players.delete_one({"_id": player_id})
-        
-    def delete_player_by_name(self, name):
-        """Delete a player from the database by name."""
-        player = self.get_player_by_name(name)
-        if player:
-            return self.delete_player(player["_id"])
-        return None
     
     def get_item(self, item_id):
         """Get item data by ID."""
+        return self._get_static("items", item_id, self._find_item)
+    
+    def _find_item(self, item_id):
+        """Read an item straight from MongoDB."""
         if isinstance(item_id, str) and len(item_id) == 24:
             return self.items.find_one({"_id": ObjectId(item_id)})
         return self.items.find_one({"_id": item_id})
     
+    def get_items(self, item_ids):
+        """Get several items in one query. Returns a dict of item ID to item data."""
+        return self._get_static_many("items", self.items, item_ids)
+    
     def get_items_by_type(self, item_type):
         """Get items by type."""
         return list(self.items.find({"type": item_type}))
     
     def get_quest(self, quest_id):
         """Get quest data by ID."""
+        return self._get_static("quests", quest_id, self._find_quest)
+    
+    def _find_quest(self, quest_id):
+        """Read a quest straight from MongoDB."""
         if isinstance(quest_id, str) and len(quest_id) == 24:
             return self.quests.find_one({"_id": ObjectId(quest_id)})
         return self.quests.find_one({"_id": quest_id})
     
+    def get_quests(self, quest_ids):
+        """Get several quests in one query. Returns a dict of quest ID to quest data."""
+        return self._get_static_many("quests", self.quests, quest_ids)
+    
     def get_location(self, location_id):
         """Get location data by ID."""
-        return self.world.find_one({"_id": location_id})
+        return self._get_static(
+            "world", location_id, lambda doc_id: self.world.find_one({"_id": doc_id})
+        )
+    
+    def iter_locations(self, batch_size=1000):
+        """Stream every location in the world collection."""
+        return self.world.find({}).batch_size(batch_size)
+    
+    def _get_static(self, collection_name, doc_id, loader):
+        """Serve a static document from cache, loading it on a miss.
+        
+        Cached documents are shared between callers and must not be mutated.
+        Missing documents are cached as None so repeated lookups of dangling
+        references do not reach the database either.
+        """
+        self._check_content_version()
+        cache = self.static_cache[collection_name]
+        found, doc = cache.get(doc_id)
+        if not found:
+            doc = loader(doc_id)
+            cache.put(doc_id, doc)
+        return doc
+    
+    def _get_static_many(self, collection_name, collection, doc_ids):
+        """Serve several static documents, fetching all cache misses with one $in query.
+        
+        IDs that don't exist map to None, like the single-document getters.
+        """
+        self._check_content_version()
+        cache = self.static_cache[collection_name]
+        result = {}
+        missing = []
+        for doc_id in doc_ids:
+            found, doc = cache.get(doc_id)
+            if found:
+                result[doc_id] = doc
+            else:
+                missing.append(doc_id)
+        
+        if missing:
+            # Same ID coercion as get_item/get_quest: 24-character strings are ObjectIds
+            query_ids = {
+                ObjectId(doc_id) if isinstance(doc_id, str) and len(doc_id) == 24 else doc_id: doc_id
+                for doc_id in missing
+            }
+            found_docs = {
+                query_ids[doc["_id"]]: doc
+                for doc in collection.find({"_id": {"$in": list(query_ids)}})
+            }
+            for doc_id in missing:
+                doc = found_docs.get(doc_id)
+                cache.put(doc_id, doc)
+                result[doc_id] = doc
+        return result
+    
+    def _check_content_version(self):
+        """Clear the static caches if the content version document has changed."""
+        now = time.monotonic()
+        if (self._content_version_checked_at is not None
+                and now - self._content_version_checked_at < CONTENT_VERSION_CHECK_INTERVAL):
+            return
+        self._content_version_checked_at = now
+        self.content_version_reads += 1
+        
+        version_doc = self.meta.find_one({"_id": CONTENT_VERSION_ID})
+        version = version_doc.get("version") if version_doc else None
+        if version != self._content_version:
+            self.invalidate_static_cache()
+            self._content_version = version
+    
+    def get_content_version(self):
+        """Get the static content version, re-read at most every CONTENT_VERSION_CHECK_INTERVAL."""
+        self._check_content_version()
+        return self._content_version
+    
+    def invalidate_static_cache(self):
+        """Drop all cached world, item and quest documents."""
+        for cache in self.static_cache.values():
+            cache.clear()
+    
+    def bump_content_version(self, changed_locations=None):
+        """Mark static content as changed so every process reloads its caches.
+        
+        The changed location IDs, if known, are logged under the new version
+        for world graphs to reread.
+        """
+        version = self.meta.find_one_and_update(
+            {"_id": CONTENT_VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )["version"]
+        # A version without a log entry reads as unknown changes, so a reader
+        # that sees the version before its entry rereads the whole world
+        changes = logged_changes(changed_locations)
+        if changes is not None:
+            self.meta.replace_one(
+                {"_id": content_changes_id(version)},
+                {"_id": content_changes_id(version), "locations": changes},
+                upsert=True
+            )
+        self.meta.delete_one({"_id": content_changes_id(version - CONTENT_CHANGE_LOG_LENGTH)})
+        self.invalidate_static_cache()
+        self._content_version_checked_at = None
+    
+    def get_changed_locations(self, since_version, version):
+        """Get the location IDs logged for the versions after since_version, with one $in query."""
+        versions = content_change_versions(since_version, version)
+        if versions is None:
+            return None
+        logged = {
+            doc["_id"]: doc["locations"]
+            for doc in self.meta.find({"_id": {"$in": [content_changes_id(v) for v in versions]}})
+        }
+        return merge_content_changes(logged.get(content_changes_id(v)) for v in versions)
+    
+    def cache_stats(self):
+        """Get hit/miss counters for the static content caches."""
+        stats = {name: cache.stats() for name, cache in self.static_cache.items()}
+        stats["content_version"] = self._content_version
+        stats["content_version_reads"] = self.content_version_reads
+        return stats
     
     def get_available_quests(self, location_id, player_level):
         """Get available quests for a location and player level."""
@@ -118,134 +732,93 @@ class Database:
             "min_level": {"$lte": player_level}
         }))
     
-    def initialize_game_data(self):
-        """Initialize game data if collections are empty."""
-        # Check if items collection is empty
-        if self.items.count_documents({}) == 0:
-            self._initialize_items()
-        
-        # Check if world collection is empty
-        if self.world.count_documents({}) == 0:
-            self._initialize_world()
-        
-        # Check if quests collection is empty
-        if self.quests.count_documents({}) == 0:
-            self._initialize_quests()
-    
-    def _initialize_items(self):
-        """Initialize basic items in the database."""
-        basic_items = [
-            {
-                "_id": "potion_health",
-                "name": "Health Potion",
-                "type": "consumable",
-                "description": "Restores 25 health points when consumed.",
-                "value": 10,
-                "effects": {"health": 25}
-            },
-            {
-                "_id": "sword_rusty",
-                "name": "Rusty Sword",
-                "type": "weapon",
-                "description": "An old rusty sword. Better than nothing.",
-                "value": 5,
-                "damage": 3
-            },
-            {
-                "_id": "shield_wooden",
-                "name": "Wooden Shield",
-                "type": "armor",
-                "description": "A simple wooden shield that offers minimal protection.",
-                "value": 5,
-                "defense": 2
-            }
-        ]
-        self.items.insert_many(basic_items)
-    
-    def _initialize_world(self):
-        """Initialize world locations in the database."""
-        locations = [
-            {
-                "_id": "village_start",
-                "name": "Starting Village",
-                "description": "A small peaceful village surrounded by farmland.",
-                "connections": ["forest_path", "village_market"],
-                "npcs": ["elder", "blacksmith"],
-                "danger_level": 0
-            },
-            {
-                "_id": "village_market",
-                "name": "Village Market",
-                "description": "A bustling marketplace where villagers trade goods.",
-                "connections": ["village_start"],
-                "npcs": ["merchant"],
-                "danger_level": 0
-            },
-            {
-                "_id": "forest_path",
-                "name": "Forest Path",
-                "description": "A winding path through the dense forest.",
-                "connections": ["village_start", "forest_clearing"],
-                "enemies": ["wolf", "bandit"],
-                "danger_level": 1
-            },
-            {
-                "_id": "forest_clearing",
-                "name": "Forest Clearing",
-                "description": "A peaceful clearing in the middle of the forest.",
-                "connections": ["forest_path", "cave_entrance"],
-                "enemies": ["wolf", "bear"],
-                "danger_level": 2
-            },
-            {
-                "_id": "cave_entrance",
-                "name": "Cave Entrance",
-                "description": "A dark, foreboding cave entrance carved into the mountainside.",
-                "connections": ["forest_clearing", "cave_interior"],
-                "enemies": ["goblin"],
-                "danger_level": 3
-            }
+    def insert_documents(self, collection_name, documents):
+        """Insert content documents into a collection."""
+        documents = list(documents)
+        if not documents:
+            return 0
+        return len(self.db[collection_name].insert_many(documents, ordered=False).inserted_ids)
+    
+    def upsert_documents(self, collection_name, documents):
+        """Insert or replace content documents by _id, in one unordered bulk write."""
+        requests = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in documents]
+        if not requests:
+            return 0
+        result = self.db[collection_name].bulk_write(requests, ordered=False)
+        return result.upserted_count + result.matched_count
+    
+    def insert_missing_documents(self, collection_name, documents):
+        """Insert content documents whose _id is missing with $setOnInsert upserts, in one unordered bulk write."""
+        requests = [
+            UpdateOne({"_id": doc["_id"]}, {"$setOnInsert": {k: v for k, v in doc.items() if k != "_id"}}, upsert=True)
+            for doc in documents
         ]
-        self.world.insert_many(locations)
-    
-    def _initialize_quests(self):
-        """Initialize basic quests in the database."""
-        quests = [
-            {
-                "_id": "quest_village_rats",
-                "name": "Rat Problem",
-                "description": "The village elder needs help clearing rats from the cellar.",
-                "location": "village_start",
-                "giver": "elder",
-                "min_level": 1,
-                "rewards": {
-                    "xp": 50,
-                    "gold": 10,
-                    "items": {"potion_health": 1}
-                },
-                "steps": [
-                    "Talk to the village elder",
-                    "Clear the rats from the cellar",
-                    "Return to the elder for your reward"
-                ]
-            },
-            {
-                "_id": "quest_lost_sword",
-                "name": "The Blacksmith's Lost Sword",
-                "description": "The blacksmith has lost a valuable sword in the forest.",
-                "location": "village_start",
-                "giver": "blacksmith",
-                "min_level": 2,
-                "rewards": {
-                    "xp": 100,
-                    "gold": 25,
-                    "items": {"sword_rusty": 1}
+        if not requests:
+            return 0
+        return self.db[collection_name].bulk_write(requests, ordered=False).upserted_count
+    
+    def get_documents(self, collection_name, doc_ids):
+        """Read content documents by _id with one $in query, bypassing the static cache."""
+        return {
+            doc["_id"]: doc
+            for doc in self.db[collection_name].find({"_id": {"$in": list(doc_ids)}})
+        }
+    
+    def iter_documents(self, collection_name, batch_size=1000):
+        """Stream every document in a content collection with one cursor."""
+        return self.db[collection_name].find({}).batch_size(batch_size)
+    
+    def get_narrative(self, key):
+        """Get cached narrative variants with one _id lookup.
+        
+        The TTL index deletes expired entries in the background, which can lag
+        by a minute or so, so expiry is checked here as well.
+        """
+        entry = self.narratives.find_one({"_id": key}, {"variants": 1, "expires_at": 1})
+        if not entry or (entry.get("expires_at") and entry["expires_at"] <= datetime.utcnow()):
+            return None
+        return entry["variants"]
+    
+    def put_narrative(self, key, variants, expires_at=None):
+        """Store narrative variants, replacing any cached for the key."""
+        entry = {"_id": key, "variants": list(variants), "updated_at": datetime.now()}
+        if expires_at:
+            entry["expires_at"] = expires_at
+        self.narratives.replace_one({"_id": key}, entry, upsert=True)
+    
+    def get_schema_version(self):
+        """Get the schema version from the meta collection with one _id lookup."""
+        schema = self.meta.find_one({"_id": SCHEMA_META_ID}, {"version": 1})
+        return schema.get("version", 0) if schema else 0
+    
+    def _claim_schema_upgrade(self):
+        """Claim the upgrade with a lease on the schema document.
+        
+        The filter only matches an outdated, unclaimed (or lapsed) document;
+        when it doesn't match, the upsert collides on _id and the claim fails.
+        """
+        now = datetime.now()
+        try:
+            self.meta.update_one(
+                {
+                    "_id": SCHEMA_META_ID,
+                    "version": {"$not": {"$gte": SCHEMA_VERSION}},
+                    "$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lt": now}}]
                 },
-                "steps": [
-                    "Speak with the blacksmith",
-                    "Search the forest path for the lost sword",
-                    "Return the sword to the blacksmith"
-                ]
-            }
-        ]
-        self.quests.insert_many(quests)
\ No newline at end of file
+                {"$set": {"lease_until": now + timedelta(seconds=SCHEMA_UPGRADE_LEASE)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+    
+    def _finish_schema_upgrade(self, version):
+        """Record the new schema version and drop the lease."""
+        self.meta.update_one(
+            {"_id": SCHEMA_META_ID},
+            {"$set": {"version": version, "upgraded_at": datetime.now()}, "$unset": {"lease_until": ""}}
+        )
+    
+    def _release_schema_upgrade(self):
+        """Drop the lease after a failed upgrade."""
+        self.meta.update_one({"_id": SCHEMA_META_ID}, {"$unset": {"lease_until": ""}})
\ No newline at end of file
@@ -3,23 +3,62 @@ Game Engine module for the Fantasy RPG text adventure game.
 Handles core game mechanics and logic.
 """
 
+import contextvars
 import random
 import time
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 
-from game.database import Database
-from game.ai_generator import AIGenerator
+from game import intent, scheduler, services, tracing
+from game.storage import PLAYER_PAGE_SIZE
+
+# First words of every command handled without the AI narrator, mapped to
+# the verb their traces and latency percentiles are grouped under
+COMMAND_VERB_GROUPS = {
+    "go": "go", "move": "go", "travel": "go",
+    "look": "look", "examine": "look", "inspect": "look",
+    "inventory": "inventory", "items": "inventory", "i": "inventory",
+    "status": "status", "stats": "status", "character": "status",
+    "quest": "quests", "quests": "quests",
+    "talk": "talk", "speak": "talk",
+    "use": "use", "consume": "use",
+    "attack": "attack", "fight": "attack",
+    "map": "map", "routes": "map", "where": "map",
+    "help": "help", "commands": "help"
+}
+COMMAND_VERBS = set(COMMAND_VERB_GROUPS)
+
+def command_verb(command):
+    """Verb a command is traced under: its canonical command verb, "travel to", or "ai" for the AI narrator."""
+    parts = command.lower().split() if command else []
+    if not parts:
+        return "empty"
+    if parts[0] == "travel" and len(parts) > 2 and parts[1] == "to":
+        return "travel to"
+    return COMMAND_VERB_GROUPS.get(parts[0], "ai")
 
 class GameEngine:
-    """Core game engine for the Fantasy RPG text adventure."""
+    """Core game engine for the Fantasy RPG text adventure.
     
-    def __init__(self):
+    Each engine holds the state of one play session. The database and AI
+    generator are process-wide services shared by every engine.
+    """
+    
+    def __init__(self, db=None, ai=None, world=None, prefetcher=None):
         """Initialize the game engine."""
-        self.db = Database()
-        self.ai = AIGenerator()
+        self.db = db or services.get_database()
+        self.ai = ai or services.get_ai_generator()
+        self.world = world or services.get_world_graph()
+        
+        # Maps free text like "walk to the market" onto engine commands
+        self.intents = intent.IntentClassifier(self.world, COMMAND_VERB_GROUPS) if intent.INTENT_ENABLED else None
         
-        # Initialize game data if needed
-        self.db.initialize_game_data()
+        # Identifies this session's model calls to the scheduler's fair share
+        self.session_id = uuid.uuid4().hex
+        
+        # Background generation of neighbouring location descriptions
+        prefetcher = prefetcher or services.get_prefetcher()
+        self.prefetch = prefetcher.session(self.session_id) if prefetcher else None
         
         # Current game state
         self.current_player = None
@@ -32,6 +71,10 @@ class GameEngine:
             "last_combat": None,
             "last_command": None
         }
+        
+        # Called with the Trace of every processed command, e.g. to print or display it
+        self.trace_hooks = []
+        self.last_trace = None
     
     def create_new_player(self, name, player_class):
         """Create a new player character."""
@@ -39,11 +82,6 @@ class GameEngine:
         if player_class.lower() not in valid_classes:
             return False, f"Invalid class. Please choose from: {', '.join(valid_classes)}"
         
-        # Check if player name already exists
-        existing_player = self.db.get_player_by_name(name)
-        if existing_player:
-            return False, "A character with that name already exists."
-        
         # Create base stats based on class
         stats = self._generate_base_stats(player_class.lower())
         
@@ -63,13 +101,14 @@ class GameEngine:
             "equipment": {},
             "quests": {},
             "visited_locations": {"village_start": datetime.now()},
-            "choices": [],
             "created_at": datetime.now(),
             "last_played": datetime.now()
         }
         
-        # Save player to database
+        # Save player to database; the unique index on name rejects duplicates
         player_id = self.db.create_player(player_data)
+        if player_id is None:
+            return False, "A character with that name already exists."
         
         # Load the player
         self.load_player(player_id)
@@ -82,10 +121,17 @@ class GameEngine:
         if not player_data:
             return False, "Player not found."
         
+        self.world.refresh()
+        return self._enter_game(player_data)
+    
+    def _enter_game(self, player_data):
+        """Make a loaded player current and place them at their last location."""
+        # Prefetches made for the previous character are of no use to this one
+        self.close()
         self.current_player = player_data
         
         # Update last played timestamp
-        self.db.update_player(player_id, {"last_played": datetime.now()})
+        self.db.update_player(player_data["_id"], {"last_played": datetime.now()})
         
         # Load the most recently visited location or default to starting location
         visited_locations = self.current_player.get("visited_locations", {})
@@ -101,16 +147,17 @@ class GameEngine:
                     most_recent_time = visit_time
             
             if most_recent_location:
-                self.current_location = self.db.get_location(most_recent_location)
+                self.current_location = self.world.get_location(most_recent_location)
             else:
                 # Fallback to default starting location
-                self.current_location = self.db.get_location("village_start")
+                self.current_location = self.world.get_location("village_start")
         else:
             # If no visited locations, use default starting location
-            self.current_location = self.db.get_location("village_start")
+            self.current_location = self.world.get_location("village_start")
         
         # Update game state
         self._update_game_state()
+        self._prefetch_neighbours()
         
         return True, f"Loaded character: {player_data['name']} (Level {player_data['level']} {player_data['class']})\nYou are currently in {self.current_location['name']}."
     
@@ -121,7 +168,7 @@ class GameEngine:
             return False, "Player not found."
         
         return self.load_player(player_data["_id"])
-        
+    
     def delete_player_by_name(self, name):
         """Delete a player character by name."""
         player_data = self.db.get_player_by_name(name)
@@ -133,6 +180,7 @@ class GameEngine:
         
         # Reset current player if it's the one being deleted
         if self.current_player and self.current_player["name"] == name:
+            self.close()
             self.current_player = None
             self.current_location = None
             self.game_state = {
@@ -147,41 +195,80 @@ class GameEngine:
             return True, f"Character '{name}' has been deleted."
         else:
             return False, f"Failed to delete character '{name}'."
-            
-    def list_all_characters(self):
-        """Get a list of all characters in the database."""
-        players = self.db.get_all_players()
-        
-        if not players:
-            return False, "No characters found in the database."
-            
-        return True, players
+    
+    def close(self):
+        """End play for the current character, e.g. on quit or return to the menu.
+        
+        Cancels prefetches still queued for the session and settles their
+        hit and waste accounting. The engine can load a character again after.
+        """
+        if self.prefetch:
+            self.prefetch.close()
+    
+    def list_characters(self, sort="last_played", page_size=PLAYER_PAGE_SIZE, page_token=None, name_prefix=None):
+        """Get one page of characters. Returns (players, next_page_token)."""
+        return self.db.list_players(sort, page_size, page_token, name_prefix or None)
     
     def get_location_description(self):
         """Get the description of the current location."""
         if not self.current_location or not self.current_player:
             return "You are nowhere. The void surrounds you."
         
-        # Mark location as visited
+        self._mark_location_visited()
+        
+        # Generate AI description
+        with scheduler.call_context(self.session_id):
+            description = self.ai.generate_location_description(
+                self.current_location,
+                self.current_player
+            )
+        
+        return self._add_location_details(description)
+    
+    def get_location_description_stream(self):
+        """Get the description of the current location, yielding text as the AI narrator produces it."""
+        if not self.current_location or not self.current_player:
+            yield "You are nowhere. The void surrounds you."
+            return
+        
+        self._mark_location_visited()
+        
+        with scheduler.call_context(self.session_id):
+            yield from self._narrate_stream(
+                "generate_location_description",
+                self.current_location,
+                self.current_player
+            )
+        
+        # Exits and quests are known up front, so they follow the narration as one chunk
+        details = self._add_location_details("")
+        if details:
+            yield details
+    
+    def _narrate_stream(self, method_name, *args):
+        """Call an AI generator method, streaming through its *_stream version if it has one."""
+        stream_method = getattr(self.ai, f"{method_name}_stream", None)
+        if stream_method:
+            yield from stream_method(*args)
+        else:
+            yield getattr(self.ai, method_name)(*args)
+    
+    def _mark_location_visited(self):
+        """Record the first visit to the current location."""
         if self.current_location["_id"] not in self.current_player.get("visited_locations", {}):
             self.db.update_player(
                 self.current_player["_id"],
                 {f"visited_locations.{self.current_location['_id']}": datetime.now()}
             )
             self.current_player["visited_locations"][self.current_location["_id"]] = datetime.now()
-        
-        # Generate AI description
-        description = self.ai.generate_location_description(
-            self.current_location,
-            self.current_player
-        )
-        
+    
+    @tracing.traced("render location details", "render")
+    def _add_location_details(self, description):
+        """Append exits and available quests to a location description."""
         # Add available connections
-        connections = []
-        for conn_id in self.current_location.get("connections", []):
-            conn_location = self.db.get_location(conn_id)
-            if conn_location:
-                connections.append(f"- {conn_location['name']}")
+        connections = [
+            f"- {name}" for name in self.world.neighbour_names(self.current_location["_id"])
+        ]
         
         if connections:
             description += "\n\nPaths lead to:\n" + "\n".join(connections)
@@ -201,13 +288,9 @@ class GameEngine:
         if not self.current_player or not self.current_location:
             return False, "No active player or location."
         
-        # Find the location by name
-        target_location = None
-        for conn_id in self.current_location.get("connections", []):
-            conn_location = self.db.get_location(conn_id)
-            if conn_location and conn_location["name"].lower() == location_name.lower():
-                target_location = conn_location
-                break
+        # Find the location by name among the current location's connections
+        target_id = self.world.resolve_neighbour(self.current_location["_id"], location_name)
+        target_location = self.world.get_location(target_id) if target_id else None
         
         if not target_location:
             return False, f"Cannot find a path to {location_name} from your current location."
@@ -238,15 +321,169 @@ class GameEngine:
         
         return True, f"You travel to {target_location['name']}."
     
+    def travel_to_location(self, location_name):
+        """Travel along the shortest route to any known location.
+        
+        Encounters are checked at every stop; an encounter ends the journey
+        there. All visited stops are saved in a single write.
+        """
+        if not self.current_player or not self.current_location:
+            return False, "No active player or location."
+        
+        start_id = self.current_location["_id"]
+        candidates = self.world.resolve(location_name)
+        if not candidates:
+            return False, f"You have never heard of a place called {location_name}."
+        
+        # Several places can share a name; head for the nearest one
+        route = self.world.find_nearest_route(start_id, candidates)
+        if not route:
+            return False, f"There is no known route to {location_name} from here."
+        
+        destination = self.world.get_location(route[-1])
+        if len(route) == 1:
+            return False, f"You are already in {destination['name']}."
+        
+        # Walk the route one stop at a time, stopping at the first encounter
+        travelled = []
+        encounter = None
+        for location_id in route[1:]:
+            location = self.world.get_location(location_id)
+            travelled.append(location)
+            encounter = self._check_for_encounter(location)
+            if encounter:
+                break
+        
+        # Record every stop in one write; later stops get later timestamps
+        # (MongoDB stores datetimes to the millisecond)
+        current_time = datetime.now()
+        visits = {
+            location["_id"]: current_time + timedelta(milliseconds=i)
+            for i, location in enumerate(travelled)
+        }
+        self.db.update_player(
+            self.current_player["_id"],
+            {f"visited_locations.{location_id}": visit_time for location_id, visit_time in visits.items()}
+        )
+        self.current_player.setdefault("visited_locations", {}).update(visits)
+        
+        self.current_location = travelled[-1]
+        self._update_game_state()
+        
+        waypoints = [location["name"] for location in travelled[:-1]]
+        if encounter:
+            message = f"You set out for {destination['name']}, but stop in {self.current_location['name']}."
+            if waypoints:
+                message += f"\nYou passed through {', '.join(waypoints)}."
+            return True, f"{message}\n\n{encounter}"
+        
+        message = f"You travel to {destination['name']}."
+        if waypoints:
+            message += f"\nYour route took you through {', '.join(waypoints)}."
+        return True, message
+    
     def process_command(self, command):
         """Process a player command."""
+        command = self._resolve_intent(command)
+        with tracing.trace_command(command, command_verb(command), self.trace_hooks) as trace:
+            with scheduler.call_context(self.session_id):
+                self.last_trace = trace
+                try:
+                    return self._process_command(command)
+                finally:
+                    # Write every player update buffered during this turn in one round trip
+                    if self.current_player:
+                        self.db.flush(self.current_player["_id"])
+                    self._prefetch_neighbours()
+    
+    def process_command_stream(self, command):
+        """Process a player command, yielding the response in chunks as it is generated.
+        
+        Commands answered by the AI narrator stream its text as it arrives;
+        every other command yields its whole response as one chunk.
+        """
+        command = self._resolve_intent(command)
+        # The command's trace and call context live in a context of their own,
+        # entered around each step of the stream, so they never leak into the
+        # caller between chunks however the stream is consumed or abandoned
+        context = contextvars.copy_context()
+        stream = self._traced_command_stream(command)
+        try:
+            while True:
+                try:
+                    chunk = context.run(next, stream)
+                except StopIteration:
+                    return
+                yield chunk
+        finally:
+            context.run(stream.close)
+    
+    def _traced_command_stream(self, command):
+        """Stream a command's response inside its trace and call context."""
+        with tracing.trace_command(command, command_verb(command), self.trace_hooks) as trace:
+            with scheduler.call_context(self.session_id):
+                self.last_trace = trace
+                started = time.perf_counter()
+                first_chunk = True
+                try:
+                    for chunk in self._process_command_stream(command):
+                        if trace and first_chunk:
+                            trace.root.set("first_chunk_ms", round((time.perf_counter() - started) * 1000, 1))
+                            first_chunk = False
+                        yield chunk
+                finally:
+                    # Write every player update buffered during this turn in one round trip
+                    if self.current_player:
+                        self.db.flush(self.current_player["_id"])
+                    self._prefetch_neighbours()
+    
+    def _process_command_stream(self, command):
+        """Dispatch a player command, streaming the AI narrator's responses."""
+        parts = command.lower().split() if command else []
+        looking_around = len(parts) == 1 and parts[0] in ["look", "examine", "inspect"]
+        
+        # Commands that don't involve the AI narrator answer in one piece
+        if not self.current_player or not parts or (parts[0] in COMMAND_VERBS and not looking_around):
+            yield self._process_command(command)
+            return
+        
+        self._refresh_world()
+        
+        if looking_around:
+            yield from self.get_location_description_stream()
+            return
+        
+        # If no specific command is recognized, check if it's a repeat command
+        repeat_message = self._check_repeated_command(command)
+        if repeat_message:
+            yield repeat_message
+            return
+        
+        # Use AI to generate a response for unrecognized commands
+        try:
+            yield from self._narrate_stream(
+                "generate_response_to_action",
+                self._enriched_player(),
+                command,
+                self.current_location,
+                self.game_state
+            )
+        except Exception as e:
+            # Fallback if AI fails
+            print(f"AI response generation failed: {e}")
+            yield "I don't understand that command. Type 'help' for a list of available commands."
+    
+    def _process_command(self, command):
+        """Dispatch a player command to its handler."""
         if not self.current_player:
             return "No active player. Please create or load a character first."
         
+        self._refresh_world()
+        
         # Check if command is None or empty
         if command is None:
             return "Please enter a command."
-            
+        
         # Split the command into parts
         parts = command.lower().split()
         if not parts:
@@ -255,8 +492,14 @@ class GameEngine:
         # Process the command based on the first word
         action = parts[0]
         
+        # Multi-stop travel along the shortest route
+        if action == "travel" and len(parts) > 2 and parts[1] == "to":
+            location_name = " ".join(parts[2:])
+            success, message = self.travel_to_location(location_name)
+            return message
+        
         # Movement commands
-        if action in ["go", "move", "travel"]:
+        elif action in ["go", "move", "travel"]:
             if len(parts) < 2:
                 return "Go where? Please specify a location."
             
@@ -311,12 +554,54 @@ class GameEngine:
         # Map command
         elif action in ["map", "routes", "where"]:
             return self._show_map()
-            
+        
         # Help command
         elif action in ["help", "commands"]:
             return self._show_help()
         
         # If no specific command is recognized, check if it's a repeat command
+        repeat_message = self._check_repeated_command(command)
+        if repeat_message:
+            return repeat_message
+        
+        # Use AI to generate a response for unrecognized commands
+        try:
+            ai_response = self.ai.generate_response_to_action(
+                self._enriched_player(),
+                command,
+                self.current_location,
+                self.game_state
+            )
+            return ai_response
+        except Exception as e:
+            # Fallback if AI fails
+            print(f"AI response generation failed: {e}")
+            return "I don't understand that command. Type 'help' for a list of available commands."
+    
+    def _resolve_intent(self, command):
+        """Rewrite free text the intent classifier recognises into an engine command, counting how it will be answered."""
+        if not command or not command.strip() or not self.current_player or not self.current_location:
+            return command
+        
+        rewritten = self.intents.rewrite(command, self.current_location, self.current_player) if self.intents else None
+        if rewritten:
+            intent.record_route("rewritten")
+            return rewritten
+        intent.record_route("ai" if command_verb(command) == "ai" else "engine")
+        return command
+    
+    def _prefetch_neighbours(self):
+        """Start generating descriptions of the locations next to the player, if they moved."""
+        if self.prefetch and self.current_player and self.current_location and hasattr(self.ai, "prefetch_location_description"):
+            self.prefetch.update(self.ai, self.world, self.current_location, self.current_player)
+    
+    def _refresh_world(self):
+        """Pick up world changes, keeping the current location document in step."""
+        if self.world.refresh() and self.current_location:
+            self.current_location = self.world.get_location(self.current_location["_id"]) or self.current_location
+    
+    def _check_repeated_command(self, command):
+        """Get a hint if an unrecognized command was just tried, else remember it."""
         last_command = self.game_state.get("last_command", "")
         if last_command and command.lower() == last_command.lower():
             # If it's a repeat command, suggest help
@@ -324,13 +609,10 @@ class GameEngine:
         
         # Store the current command to check for loops in future calls
         self.game_state["last_command"] = command
-        
-        # Get available items in the current location
-        available_items = []
-        if hasattr(self.current_location, 'items'):
-            available_items = self.current_location.get('items', [])
-        
-        # Enrich the player data with more context
+        return None
+    
+    def _enriched_player(self):
+        """Copy of the player with extra context for the AI narrator."""
         enriched_player = self.current_player.copy()
         
         # Add visited locations if not present
@@ -341,19 +623,7 @@ class GameEngine:
         if self.current_location and '_id' in self.current_location:
             enriched_player['visited_locations'][self.current_location['_id']] = True
         
-        # Use AI to generate a response for unrecognized commands
-        try:
-            ai_response = self.ai.generate_response_to_action(
-                enriched_player,
-                command,
-                self.current_location,
-                self.game_state
-            )
-            return ai_response
-        except Exception as e:
-            # Fallback if AI fails
-            print(f"AI response generation failed: {e}")
-            return "I don't understand that command. Type 'help' for a list of available commands."
+        return enriched_player
     
     def _generate_base_stats(self, player_class):
         """Generate base stats for a new character based on class."""
@@ -433,6 +703,7 @@ class GameEngine:
         # for NPCs, items, or features in the current location
         return f"You examine the {target}, but don't notice anything special."
     
+    @tracing.traced("render inventory", "render")
     def _show_inventory(self):
         """Show the player's inventory."""
         if not self.current_player:
@@ -443,8 +714,9 @@ class GameEngine:
             return "Your inventory is empty."
         
         result = "Inventory:\n"
+        items = self.db.get_items(list(inventory))
         for item_id, quantity in inventory.items():
-            item_data = self.db.get_item(item_id)
+            item_data = items.get(item_id)
             if item_data:
                 result += f"- {item_data['name']} (x{quantity}): {item_data['description']}\n"
             else:
@@ -453,6 +725,7 @@ class GameEngine:
         result += f"\nGold: {self.current_player.get('gold', 0)}"
         return result
     
+    @tracing.traced("render status", "render")
     def _show_character_status(self):
         """Show the player's character status."""
         if not self.current_player:
@@ -474,6 +747,7 @@ class GameEngine:
         
         return result
     
+    @tracing.traced("render quests", "render")
     def _show_quests(self):
         """Show the player's active quests."""
         if not self.current_player:
@@ -484,8 +758,9 @@ class GameEngine:
             return "You don't have any active quests."
         
         result = "Active Quests:\n"
+        quests = self.db.get_quests(list(active_quests))
         for quest_id, status in active_quests.items():
-            quest_data = self.db.get_quest(quest_id)
+            quest_data = quests.get(quest_id)
             if quest_data:
                 result += f"- {quest_data['name']}: {status}\n"
                 result += f"  {quest_data['description']}\n"
@@ -510,6 +785,7 @@ class GameEngine:
         # for enemies in the current location and start combat
         return f"You prepare to fight {target_name}, but they're not here."
     
+    @tracing.traced("render map", "render")
     def _show_map(self):
         """Show current location and available routes."""
         if not self.current_location or not self.current_player:
@@ -522,24 +798,24 @@ class GameEngine:
         response = f"You are currently in: {location_name}\n"
         
         # Add available connections
-        connections = []
-        for conn_id in self.current_location.get("connections", []):
-            conn_location = self.db.get_location(conn_id)
-            if conn_location:
-                connections.append(f"- {conn_location['name']}")
+        connections = [
+            f"- {name}" for name in self.world.neighbour_names(self.current_location["_id"])
+        ]
         
         if connections:
             response += "\nAvailable routes:\n" + "\n".join(connections)
         else:
             response += "\nThere are no obvious exits from here."
-            
-        return response
         
+        return response
+    
+    @tracing.traced("render help", "render")
     def _show_help(self):
         """Show available commands."""
         help_text = """
 Available Commands:
 - go/move/travel [location]: Move to a new location
+- travel to [location]: Journey to any known location along the shortest route
 - look/examine/inspect [target]: Look around or examine something specific
 - map/routes/where: Show your current location and available routes
 - inventory/items/i: Check your inventory
@@ -553,6 +829,7 @@ Available Commands:
 
 Examples:
 - "go town square"
+- "travel to cave entrance"
 - "look around"
 - "examine chest"
 - "talk to merchant"
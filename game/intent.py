@@ -0,0 +1,169 @@
+"""
+Intent module for the Fantasy RPG text adventure game.
+Rewrites free-text input such as "walk to the market" or "check my bag"
+into engine commands with a precompiled phrase index and the world graph's
+name index, so only actions the engine has no handler for reach Gemini.
+"""
+
+import os
+import re
+from dotenv import load_dotenv
+
+from game.metrics import REGISTRY
+
+# Load environment variables
+load_dotenv()
+
+# Rewrite free-text commands into engine commands before asking the AI narrator
+INTENT_ENABLED = os.getenv("INTENT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Phrases that open a command, by the engine command they mean. Commands
+# marked with a target take the rest of the input as what they act on.
+# Talk, use and attack aren't listed: their handlers can't act on a target
+# yet, so those actions are left to the AI narrator.
+INTENT_PHRASES = {
+    "look": [
+        "look", "look around", "look about", "look at", "examine", "inspect", "observe",
+        "survey", "search", "search around", "describe", "view", "what do i see"
+    ],
+    "go": [
+        "go", "go to", "go into", "move", "move to", "walk", "walk to", "walk into", "run", "run to",
+        "head", "head to", "head for", "head towards", "travel", "enter", "visit", "journey to",
+        "wander to", "venture to", "proceed to", "return to"
+    ],
+    "inventory": [
+        "inventory", "check inventory", "show inventory", "open inventory", "bag", "check bag",
+        "open bag", "look in bag", "backpack", "check backpack", "items", "what do i have",
+        "what am i carrying"
+    ],
+    "status": [
+        "status", "stats", "check stats", "show stats", "character", "character sheet",
+        "health", "check health", "how am i", "how am i doing"
+    ],
+    "quests": ["quests", "quest log", "journal", "check quests", "show quests", "what are quests"],
+    "map": [
+        "map", "show map", "check map", "open map", "routes", "exits", "where can i go",
+        "which way", "directions"
+    ],
+    "help": ["help", "commands", "what can i do", "how do i play"],
+}
+TARGET_INTENTS = {"look", "go"}
+
+# Words dropped before matching: articles and possessives anywhere,
+# politeness and hedging in front of a command, and prepositions in a target
+ARTICLES = {"the", "a", "an", "my", "your"}
+LEADING_WORDS = {
+    "please", "i", "i'd", "i'll", "want", "wanna", "would", "like", "to", "let's", "lets",
+    "let", "me", "us", "can", "could", "shall", "will", "try", "and", "then", "now"
+}
+FILLER_WORDS = {
+    "some", "this", "that", "to", "at", "with", "into", "towards", "toward", "on", "of",
+    "over", "around", "about", "back", "here", "please", "again", "now"
+}
+
+REGISTRY.describe("intent_commands_total", "Commands by route: engine (typed as an engine command), rewritten (mapped onto one by the intent classifier) or ai (answered by the AI narrator).")
+
+def _words(text):
+    """Lowercase words of a text without articles, keeping apostrophes."""
+    return [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in ARTICLES]
+
+def _build_phrase_index(phrases):
+    """Index phrases by their first word, longest first. Returns {word: [(words, intent)]}."""
+    index = {}
+    for intent, intent_phrases in phrases.items():
+        for phrase in intent_phrases:
+            words = tuple(_words(phrase))
+            index.setdefault(words[0], []).append((words, intent))
+    for candidates in index.values():
+        candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+    return index
+
+# Built once at import, so classifying a command is a few dictionary lookups
+PHRASE_INDEX = _build_phrase_index(INTENT_PHRASES)
+
+def match_phrase(words):
+    """Find the longest known phrase opening a command. Returns (intent, remaining words) or (None, words)."""
+    if not words:
+        return None, words
+    for phrase, intent in PHRASE_INDEX.get(words[0], ()):
+        if tuple(words[:len(phrase)]) == phrase:
+            return intent, words[len(phrase):]
+    return None, words
+
+def record_route(route):
+    """Count a command by how it will be answered: engine, rewritten or ai."""
+    REGISTRY.inc("intent_commands_total", {"route": route})
+
+def avoidance_rate():
+    """Share of commands answered without the AI narrator, or None before any."""
+    counts = {
+        dict(labels)["route"]: count
+        for labels, count in REGISTRY.snapshot().get("intent_commands_total", {}).items()
+    }
+    total = sum(counts.values())
+    if not total:
+        return None
+    return (total - counts.get("ai", 0)) / total
+
+class IntentClassifier:
+    """Maps free text onto engine commands using phrases and the world graph's location names.
+    
+    Only commands whose handlers resolve what they act on are produced:
+    looking around, moving and travelling, and the player's inventory,
+    status, quests, map and help. Input that doesn't open with a known
+    phrase, or names no location, is left alone for the AI narrator.
+    """
+    
+    def __init__(self, world, command_verbs=None):
+        """Initialize the classifier over a world graph and the engine's {verb: canonical verb} map."""
+        self.world = world
+        self.command_verbs = command_verbs or {}
+    
+    def rewrite(self, command, location, player):
+        """Get the engine command free text stands for, or None to leave it unchanged."""
+        words = _words(command)
+        typed_verb = words[0] if words else None
+        while words and words[0] in LEADING_WORDS:
+            words = words[1:]
+        # Engine verbs typed as the first word keep the handler they name
+        typed_intent = self.command_verbs.get(typed_verb) if words and words[0] == typed_verb else None
+        
+        intent, rest = match_phrase(words)
+        if intent is None:
+            return None
+        target = [word for word in rest if word not in FILLER_WORDS]
+        
+        if words[:2] == ["travel", "to"]:
+            # The engine routes "travel to" itself, across several hops if need be
+            rewritten = f"travel to {' '.join(target)}" if typed_intent is None and target else None
+        elif intent not in TARGET_INTENTS:
+            rewritten = intent if not target else None
+        elif not target:
+            rewritten = intent if intent == "look" else None
+        else:
+            rewritten = self._rewrite_movement(target, location) if intent == "go" else None
+            # Engine verbs still reach their handler, minus the filler words,
+            # when the target is unknown or farther than one move
+            if typed_intent == intent and (rewritten is None or rewritten.startswith("travel to ")):
+                rewritten = f"{intent} {' '.join(target)}"
+        
+        if rewritten is None or rewritten == command.strip().lower():
+            return None
+        # Commands typed with an engine verb only lose their filler words, so
+        # "go" stays a one-step move
+        if typed_intent is not None and (typed_intent != intent or rewritten.startswith("travel to ")):
+            return None
+        return rewritten
+    
+    def _rewrite_movement(self, target, location):
+        """Go to a neighbouring location, or travel to a farther one, named by the target."""
+        name = " ".join(target)
+        neighbours = set(self.world.neighbours(location["_id"]))
+        matches = set(self.world.resolve(name)) or self.world.search(name)
+        nearby = matches & neighbours
+        if len(nearby) == 1:
+            return f"go {self.world.get_location(nearby.pop())['name'].lower()}"
+        matches.discard(location["_id"])
+        if len(matches) == 1:
+            return f"travel to {self.world.get_location(matches.pop())['name'].lower()}"
+        return None
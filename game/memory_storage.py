@@ -0,0 +1,263 @@
+"""
+In-memory storage backend for the Fantasy RPG text adventure game.
+Keeps every collection in Python dictionaries, for benchmarks, offline
+runs and single-process play without MongoDB. Nothing is persisted.
+"""
+
+import copy
+import threading
+from datetime import datetime
+from bson.objectid import ObjectId
+
+from game.metrics import instrument_storage
+from game.storage import (
+    PLAYER_PAGE_SIZE,
+    DeleteResult,
+    StorageBackend,
+    apply_update,
+    check_player_sort,
+    decode_page_token,
+    encode_page_token,
+    new_choice_event,
+    player_summary,
+    prefix_upper_bound,
+    quest_is_available,
+    to_milliseconds
+)
+
+def _doc_id(value):
+    """Coerce an ID the way the MongoDB backend does: 24-character strings are ObjectIds."""
+    if isinstance(value, str) and len(value) == 24:
+        return ObjectId(value)
+    return value
+
+@instrument_storage("memory")
+class MemoryStorage(StorageBackend):
+    """Storage backend holding all game data in process memory."""
+    
+    def __init__(self):
+        """Initialize empty collections."""
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._player_names = {}
+        self._choices = []
+        self._quests_by_location = {}
+        self._content_version = None
+        self._schema_version = 0
+        self._schema_claimed = False
+    
+    def _collection(self, collection_name):
+        """Get a collection's ID-to-document dict, creating it if needed."""
+        return self._collections.setdefault(collection_name, {})
+    
+    # Players
+    
+    def create_player(self, player_data):
+        """Create a new player. Returns None if the name is taken."""
+        with self._lock:
+            if player_data["name"] in self._player_names:
+                return None
+            player = copy.deepcopy(player_data)
+            player.setdefault("_id", ObjectId())
+            player_data["_id"] = player["_id"]
+            self._collection("players")[player["_id"]] = player
+            self._player_names[player["name"]] = player["_id"]
+            return player["_id"]
+    
+    def _copy_player(self, player):
+        """Copy a stored player without history fields, like a projected find."""
+        if player is None:
+            return None
+        return copy.deepcopy({k: v for k, v in player.items() if k != "choices"})
+    
+    def get_player(self, player_id):
+        """Get player data by ID."""
+        with self._lock:
+            return self._copy_player(self._collection("players").get(ObjectId(player_id)))
+    
+    def get_player_by_name(self, name):
+        """Get player data by name."""
+        with self._lock:
+            player_id = self._player_names.get(name)
+            return self._copy_player(self._collection("players").get(player_id))
+    
+    def list_players(self, sort="last_played", limit=PLAYER_PAGE_SIZE, page_token=None, name_prefix=None):
+        """Get one page of player summaries, keyset-paginated on (sort field, _id)."""
+        descending = check_player_sort(sort)
+        with self._lock:
+            players = [
+                player_summary(player) for player in self._collection("players").values()
+                if not name_prefix or name_prefix <= player["name"] < prefix_upper_bound(name_prefix)
+            ]
+        
+        def sort_key(player):
+            # Compared at the precision page tokens keep, as MongoDB stores datetimes
+            return (to_milliseconds(player.get(sort)), player["_id"])
+        
+        if page_token:
+            after = tuple(decode_page_token(page_token))
+            players = [p for p in players if (sort_key(p) < after if descending else sort_key(p) > after)]
+        players.sort(key=sort_key, reverse=descending)
+        
+        next_page_token = None
+        if len(players) > limit:
+            players = players[:limit]
+            next_page_token = encode_page_token(list(sort_key(players[-1])))
+        return copy.deepcopy(players), next_page_token
+    
+    def _update_player(self, player_id, operator, fields):
+        """Apply one $set, $inc or $push to a player."""
+        with self._lock:
+            player = self._collection("players").get(ObjectId(player_id))
+            if player is not None:
+                apply_update(player, {operator: copy.deepcopy(fields)})
+    
+    def delete_player(self, player_id):
+        """Delete a player and their history."""
+        with self._lock:
+            player = self._collection("players").pop(ObjectId(player_id), None)
+            if player is None:
+                return DeleteResult(0)
+            self._player_names.pop(player["name"], None)
+            self._choices = [c for c in self._choices if c["player_id"] != player["_id"]]
+            return DeleteResult(1)
+    
+    # Player choice history
+    
+    def add_player_choice(self, player_id, choice_data):
+        """Add player choice to the append-only choice history."""
+        with self._lock:
+            self._choices.append(new_choice_event(player_id, copy.deepcopy(choice_data)))
+    
+    def get_player_choices(self, player_id, limit=50, page_token=None):
+        """Get one page of a player's choice history, oldest first."""
+        after = tuple(decode_page_token(page_token)) if page_token else None
+        with self._lock:
+            choices = [
+                c for c in self._choices
+                if c["player_id"] == ObjectId(player_id)
+                and (after is None or (c["ts"], c["_id"]) > after)
+            ]
+        choices.sort(key=lambda c: (c["ts"], c["_id"]))
+        
+        next_page_token = None
+        if len(choices) > limit:
+            choices = choices[:limit]
+            next_page_token = encode_page_token([choices[-1]["ts"], choices[-1]["_id"]])
+        return copy.deepcopy(choices), next_page_token
+    
+    def iter_player_choices(self, player_id, batch_size=100):
+        """Stream a player's whole choice history, oldest first."""
+        page_token = None
+        while True:
+            choices, page_token = self.get_player_choices(player_id, batch_size, page_token)
+            yield from choices
+            if not page_token:
+                return
+    
+    # Static content
+    
+    def get_item(self, item_id):
+        """Get a copy of an item's data by ID."""
+        return copy.deepcopy(self._collection("items").get(_doc_id(item_id)))
+    
+    def get_items_by_type(self, item_type):
+        """Get copies of the items of a type."""
+        return copy.deepcopy([item for item in list(self._collection("items").values()) if item.get("type") == item_type])
+    
+    def get_quest(self, quest_id):
+        """Get a copy of a quest's data by ID."""
+        return copy.deepcopy(self._collection("quests").get(_doc_id(quest_id)))
+    
+    def get_location(self, location_id):
+        """Get a copy of a location's data by ID."""
+        return copy.deepcopy(self._collection("world").get(location_id))
+    
+    def iter_locations(self, batch_size=1000):
+        """Stream copies of every location in the world."""
+        for location in list(self._collection("world").values()):
+            yield copy.deepcopy(location)
+    
+    def get_available_quests(self, location_id, player_level):
+        """Get copies of the available quests for a location and player level."""
+        quests = self._collection("quests")
+        return copy.deepcopy([
+            quests[quest_id] for quest_id in list(self._quests_by_location.get(location_id, ()))
+            if quest_is_available(quests[quest_id], location_id, player_level)
+        ])
+    
+    def insert_documents(self, collection_name, documents, replace=True):
+        """Insert content documents into a collection, replacing any with the same _id unless replace is off."""
+        inserted = 0
+        with self._lock:
+            collection = self._collection(collection_name)
+            for document in documents:
+                if not replace and document["_id"] in collection:
+                    continue
+                collection[document["_id"]] = copy.deepcopy(document)
+                if collection_name == "quests":
+                    self._quests_by_location.setdefault(document.get("location"), {})[document["_id"]] = None
+                inserted += 1
+        return inserted
+    
+    def upsert_documents(self, collection_name, documents):
+        """Insert or replace content documents by _id."""
+        return self.insert_documents(collection_name, documents)
+    
+    def insert_missing_documents(self, collection_name, documents):
+        """Insert the content documents whose _id isn't stored yet."""
+        return self.insert_documents(collection_name, documents, replace=False)
+    
+    def get_documents(self, collection_name, doc_ids):
+        """Read content documents by _id."""
+        collection = self._collection(collection_name)
+        return {
+            doc_id: copy.deepcopy(collection[doc_id])
+            for doc_id in doc_ids if doc_id in collection
+        }
+    
+    def iter_documents(self, collection_name, batch_size=1000):
+        """Stream every document in a content collection."""
+        with self._lock:
+            documents = list(self._collection(collection_name).values())
+        return iter(copy.deepcopy(documents))
+    
+    # Narrative cache
+    
+    def get_narrative(self, key):
+        """Get cached narrative variants, or None if missing or expired."""
+        with self._lock:
+            entry = self._collection("narratives").get(key)
+            if not entry or (entry.get("expires_at") and entry["expires_at"] <= datetime.utcnow()):
+                return None
+            return list(entry["variants"])
+    
+    def put_narrative(self, key, variants, expires_at=None):
+        """Store narrative variants, replacing any cached for the key."""
+        with self._lock:
+            self._collection("narratives")[key] = {"_id": key, "variants": list(variants), "expires_at": expires_at}
+    
+    # Schema version
+    
+    def get_schema_version(self):
+        """Get the schema version of this store."""
+        return self._schema_version
+    
+    def _claim_schema_upgrade(self):
+        """Claim the schema upgrade for this caller."""
+        with self._lock:
+            if self._schema_claimed:
+                return False
+            self._schema_claimed = True
+            return True
+    
+    def _finish_schema_upgrade(self, version):
+        """Record the new schema version and drop the claim."""
+        with self._lock:
+            self._schema_version = version
+            self._schema_claimed = False
+    
+    def _release_schema_upgrade(self):
+        """Drop the claim after a failed upgrade."""
+        with self._lock:
+            self._schema_claimed = False
@@ -0,0 +1,300 @@
+"""
+Metrics module for the Fantasy RPG text adventure game.
+Records latency histograms and error counts for storage operations and the
+MongoDB commands they send, and renders them in the Prometheus text format.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+from game import tracing
+
+# Load environment variables
+load_dotenv()
+
+# Record storage and MongoDB command metrics
+DB_METRICS_ENABLED = os.getenv("DB_METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds between metric dumps (0 disables them), and where they go ("-" is stdout)
+DB_METRICS_DUMP_INTERVAL = float(os.getenv("DB_METRICS_DUMP_INTERVAL", "0"))
+DB_METRICS_DUMP_PATH = os.getenv("DB_METRICS_DUMP_PATH", "-")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Storage method currently running in this thread or task, for attributing MongoDB commands
+_current_operation = contextvars.ContextVar("storage_operation", default="unattributed")
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets."""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """Initialize empty buckets."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        """Record one sample."""
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket that holds it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+    
+    def snapshot(self):
+        """Get count, sum, mean, estimated p50/p95/p99 and cumulative buckets."""
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            cumulative.append((bound, seen))
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+class MetricsRegistry:
+    """Thread-safe store of labelled histograms and counters."""
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+    
+    def describe(self, name, help_text):
+        """Set the HELP line shown for a metric."""
+        self._help[name] = help_text
+    
+    def observe(self, name, labels, value):
+        """Record a sample in the histogram for a metric and label set."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {}).get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram()
+            histogram.observe(value)
+    
+    def inc(self, name, labels, amount=1):
+        """Add to the counter for a metric and label set."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + amount
+    
+    def snapshot(self):
+        """Get every metric as {name: {labels tuple: value or histogram snapshot}}."""
+        with self._lock:
+            result = {
+                name: {key: histogram.snapshot() for key, histogram in series.items()}
+                for name, series in self._histograms.items()
+            }
+            for name, series in self._counters.items():
+                result[name] = dict(series)
+        return result
+    
+    def reset(self):
+        """Drop every recorded sample."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+    
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, series in sorted(self.snapshot().items()):
+            is_histogram = any(isinstance(value, dict) for value in series.values())
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {'histogram' if is_histogram else 'counter'}")
+            for key, value in sorted(series.items()):
+                if not is_histogram:
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+                for bound, count in value["buckets"]:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(key):
+    """Format a labels tuple as {name="value",...}."""
+    if not key:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+# Process-wide registry
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("storage_operation_duration_seconds", "Time spent in each storage backend method.")
+REGISTRY.describe("storage_operation_errors_total", "Storage backend method calls that raised.")
+REGISTRY.describe("mongodb_command_duration_seconds", "MongoDB command round trips by command, collection and storage method.")
+REGISTRY.describe("mongodb_command_errors_total", "Failed MongoDB commands by command, collection and storage method.")
+
+def snapshot():
+    """Get every recorded metric from the process-wide registry."""
+    return REGISTRY.snapshot()
+
+def render():
+    """Render the process-wide registry in the Prometheus text format."""
+    return REGISTRY.render()
+
+@contextlib.contextmanager
+def operation(name):
+    """Attribute MongoDB commands sent inside this block to an operation name."""
+    token = _current_operation.set(name)
+    try:
+        yield
+    finally:
+        _current_operation.reset(token)
+
+def instrument_storage(backend):
+    """Class decorator that times every public method of a storage backend.
+    
+    Each call is recorded under storage_operation_duration_seconds and names
+    the operation that MongoDB commands sent during the call are attributed
+    to. Generators are attributed but not timed, since their callers decide
+    how long iteration takes.
+    """
+    def decorate(cls):
+        if not DB_METRICS_ENABLED:
+            return cls
+        for name, method in inspect.getmembers(cls, inspect.isfunction):
+            if not name.startswith("_"):
+                setattr(cls, name, _instrument_method(backend, name, method))
+        return cls
+    return decorate
+
+def _instrument_method(backend, name, method):
+    """Wrap one storage method with timing and operation attribution."""
+    labels = {"backend": backend, "method": name}
+    
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            iterator = method(*args, **kwargs)
+            while True:
+                with operation(name):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        return generator_wrapper
+    
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with operation(name), tracing.span(f"db {name}", "db", backend=backend):
+                return method(*args, **kwargs)
+        except Exception:
+            REGISTRY.inc("storage_operation_errors_total", labels)
+            raise
+        finally:
+            REGISTRY.observe("storage_operation_duration_seconds", labels, time.perf_counter() - start)
+    return wrapper
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """pymongo command listener that records every command's latency.
+    
+    pymongo publishes command events on the thread that runs the command,
+    so the storage method active when a command starts is still current.
+    """
+    
+    def __init__(self):
+        """Initialize the table of in-flight commands."""
+        self._in_flight = {}
+    
+    def started(self, event):
+        """Remember the collection and storage method of a starting command."""
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        self._in_flight[(event.request_id, event.connection_id)] = {
+            "command": event.command_name,
+            "collection": collection,
+            "method": _current_operation.get(),
+        }
+    
+    def succeeded(self, event):
+        """Record the latency of a finished command."""
+        labels = self._in_flight.pop((event.request_id, event.connection_id), None)
+        if labels:
+            REGISTRY.observe("mongodb_command_duration_seconds", labels, event.duration_micros / 1e6)
+    
+    def failed(self, event):
+        """Record the latency and error of a failed command."""
+        labels = self._in_flight.pop((event.request_id, event.connection_id), None)
+        if labels:
+            REGISTRY.observe("mongodb_command_duration_seconds", labels, event.duration_micros / 1e6)
+            REGISTRY.inc("mongodb_command_errors_total", labels)
+
+def event_listeners():
+    """Listeners to pass to MongoClient, empty when metrics are disabled."""
+    return [CommandMetricsListener()] if DB_METRICS_ENABLED else []
+
+def dump(path=DB_METRICS_DUMP_PATH):
+    """Write the current metrics to a file (replaced atomically) or stdout."""
+    text = render()
+    if not path or path == "-":
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as dump_file:
+        dump_file.write(text)
+    os.replace(temp_path, path)
+
+_dump_thread = None
+_dump_lock = threading.Lock()
+
+def start_periodic_dump(interval=DB_METRICS_DUMP_INTERVAL, path=DB_METRICS_DUMP_PATH):
+    """Start dumping metrics every interval seconds. Does nothing if interval is 0 or a dump is running."""
+    global _dump_thread
+    with _dump_lock:
+        if interval <= 0 or not DB_METRICS_ENABLED or _dump_thread is not None:
+            return
+        
+        def dump_periodically():
+            while True:
+                time.sleep(interval)
+                try:
+                    dump(path)
+                except OSError as e:
+                    print(f"Error writing metrics dump: {e}")
+        
+        _dump_thread = threading.Thread(target=dump_periodically, name="metrics-dump", daemon=True)
+        _dump_thread.start()
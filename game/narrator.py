@@ -0,0 +1,94 @@
+"""
+Template narrator for the Fantasy RPG text adventure game.
+Writes plain narration from the same structured inputs the AI generator
+prompts with, so the game keeps responding while Gemini is unavailable.
+"""
+
+import random
+
+def _names(ids):
+    """Readable names for a list of IDs, like 'forest_path' -> 'Forest Path'."""
+    return [str(doc_id).replace("_", " ").title() for doc_id in ids]
+
+def _join(names):
+    """Join names as 'a', 'a and b' or 'a, b and c'."""
+    if len(names) <= 1:
+        return "".join(names)
+    return ", ".join(names[:-1]) + " and " + names[-1]
+
+class TemplateNarrator:
+    """Fallback narrator with the same methods as AIGenerator."""
+    
+    LOCATION_OPENINGS = [
+        "You stand in {name}.",
+        "You find yourself in {name}.",
+        "You take in your surroundings: {name}.",
+    ]
+    DANGER_NOTES = {
+        0: "It feels safe here.",
+        1: "You stay alert, though nothing seems threatening.",
+        2: "Something about this place puts you on edge.",
+        3: "Danger hangs in the air here.",
+    }
+    
+    def generate_location_description(self, location_data, player_data=None):
+        """Describe a location from its description, occupants and exits."""
+        lines = [random.choice(self.LOCATION_OPENINGS).format(name=location_data["name"])]
+        lines.append(location_data.get("description", ""))
+        
+        if player_data and player_data.get("visited_locations", {}).get(location_data["_id"]):
+            lines.append("It looks much as you remember it.")
+        
+        npcs = _names(location_data.get("npcs", []))
+        if npcs:
+            lines.append(f"{_join(npcs)} {'is' if len(npcs) == 1 else 'are'} here.")
+        
+        enemies = _names(location_data.get("enemies", []))
+        if enemies:
+            lines.append(f"You sense {_join(enemies)} nearby.")
+        
+        danger_level = location_data.get("danger_level", 0)
+        lines.append(self.DANGER_NOTES.get(danger_level, self.DANGER_NOTES[3]))
+        return " ".join(line for line in lines if line)
+    
+    def generate_combat_narrative(self, player_data, enemy_data, combat_result):
+        """Narrate a combat encounter from its result."""
+        return (f"{player_data['name']} the {player_data['class']} faces the {enemy_data['name']}. "
+                f"{enemy_data.get('description', '')} {combat_result}").strip()
+    
+    def generate_quest_dialogue(self, quest_data, npc_data, stage="introduction"):
+        """Write quest giver dialogue for a quest stage."""
+        if stage == "completion":
+            rewards = quest_data.get("rewards", {})
+            parts = []
+            if "xp" in rewards:
+                parts.append(f"{rewards['xp']} XP")
+            if "gold" in rewards:
+                parts.append(f"{rewards['gold']} gold")
+            reward_text = f" Please accept {_join(parts)}." if parts else ""
+            return f"{npc_data['name']} says: \"You've done it - {quest_data['name']} is complete. Thank you.{reward_text}\""
+        if stage == "in-progress":
+            return f"{npc_data['name']} asks: \"How goes {quest_data['name']}? {quest_data['description']}\""
+        
+        steps = quest_data.get("steps", [])
+        step_text = f" First, {steps[0]}." if steps else ""
+        return f"{npc_data['name']} says: \"I need your help. {quest_data['description']}{step_text}\""
+    
+    def generate_item_discovery(self, item_data, discovery_context):
+        """Describe finding an item."""
+        return f"{discovery_context.rstrip('.')}. You find {item_data['name']}: {item_data['description']}"
+    
+    def generate_response_to_action(self, player_data, action, current_location, game_state):
+        """Respond to an action the engine doesn't handle by pointing at what is here."""
+        options = []
+        exits = _names(current_location.get("connections", []))
+        if exits:
+            options.append(f"paths lead to {_join(exits)}")
+        npcs = _names(current_location.get("npcs", []))
+        if npcs:
+            options.append(f"you could talk to {_join(npcs)}")
+        
+        response = f"You try to {action}, but nothing comes of it."
+        if options:
+            response += " From " + current_location["name"] + ", " + "; ".join(options) + "."
+        return response + " Type 'help' for a list of commands."
@@ -0,0 +1,155 @@
+"""
+Prefetch module for the Fantasy RPG text adventure game.
+While a player reads, generates and caches descriptions of the locations
+next to them on a small background pool, so the `look` after their next
+`go` is answered from the narrative cache instead of waiting on Gemini.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from game import scheduler
+from game.metrics import REGISTRY
+
+# Load environment variables
+load_dotenv()
+
+# Prefetch neighbouring location descriptions
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Worker threads, prefetches queued or running across the process, and
+# model calls one session may spend on prefetching in its lifetime
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "16"))
+PREFETCH_SESSION_BUDGET = int(os.getenv("PREFETCH_SESSION_BUDGET", "50"))
+
+REGISTRY.describe("prefetch_tasks_total", "Prefetch tasks by outcome: generated, cached, cancelled, failed, or skipped for budget or capacity.")
+REGISTRY.describe("prefetch_arrivals_total", "Moves into a location whose description prefetching had (hit) or hadn't (miss) made ready.")
+REGISTRY.describe("prefetch_wasted_total", "Prefetched descriptions of neighbours the player didn't move to next.")
+
+class Prefetcher:
+    """Bounded background pool shared by every session's prefetches."""
+    
+    def __init__(self, workers=PREFETCH_WORKERS, max_in_flight=PREFETCH_MAX_IN_FLIGHT,
+                 session_budget=PREFETCH_SESSION_BUDGET):
+        """Initialize the pool."""
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.max_in_flight = max_in_flight
+        self.session_budget = session_budget
+        self._lock = threading.Lock()
+        self.in_flight = 0
+    
+    def session(self, session_id=None):
+        """Start prefetch tracking for a new play session."""
+        return PrefetchSession(self, self.session_budget, session_id)
+    
+    def _submit(self, func, *args):
+        """Queue a task unless max_in_flight are already queued or running. Returns its Future or None."""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                return None
+            self.in_flight += 1
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self._task_done)
+        return future
+    
+    def _task_done(self, future):
+        """Free the in-flight slot of a finished or cancelled task."""
+        with self._lock:
+            self.in_flight -= 1
+
+class PrefetchSession:
+    """Prefetches for one play session, following the player's location.
+    
+    Each move cancels prefetches still queued for the previous location and
+    records whether the new location's description was ready (a hit) and
+    how many descriptions generated for other neighbours went unused (wasted). A prefetch already
+    calling the model can't be interrupted; its result stays in the cache.
+    """
+    
+    def __init__(self, prefetcher, budget, session_id=None):
+        """Initialize an idle session."""
+        self.prefetcher = prefetcher
+        self.budget = budget
+        self.session_id = session_id
+        self._lock = threading.Lock()
+        self.location_id = None
+        self._futures = {}
+        self._ready = set()
+        self._generated = set()
+    
+    def update(self, ai, world, location, player_data):
+        """Prefetch the neighbours of the player's location, if it changed since the last call."""
+        with self._lock:
+            if location["_id"] == self.location_id:
+                return
+            self._leave(location["_id"])
+            self.location_id = location["_id"]
+        
+        # Descriptions are generated after the visit is recorded, so prefetch
+        # them as they'll be requested: with the neighbour marked visited
+        visited = player_data.get("visited_locations", {})
+        for neighbour_id in world.neighbours(location["_id"]):
+            neighbour = world.get_location(neighbour_id)
+            if not neighbour:
+                continue
+            if self.budget <= 0:
+                REGISTRY.inc("prefetch_tasks_total", {"result": "skipped_budget"})
+                continue
+            player_view = {**player_data, "visited_locations": {**visited, neighbour_id: True}}
+            future = self.prefetcher._submit(self._prefetch, ai, neighbour, player_view, location["_id"])
+            if future is None:
+                REGISTRY.inc("prefetch_tasks_total", {"result": "skipped_capacity"})
+                continue
+            self.budget -= 1
+            with self._lock:
+                self._futures[neighbour_id] = future
+    
+    def close(self):
+        """Cancel every queued prefetch, e.g. when the player quits."""
+        with self._lock:
+            self._leave(None)
+            self.location_id = None
+    
+    def _leave(self, next_location_id):
+        """Settle the prefetches made for the current location as the player moves on."""
+        for neighbour_id, future in self._futures.items():
+            if neighbour_id != next_location_id and future.cancel():
+                self.budget += 1
+                REGISTRY.inc("prefetch_tasks_total", {"result": "cancelled"})
+        
+        if next_location_id is not None and self.location_id is not None:
+            result = "hit" if next_location_id in self._ready else "miss"
+            REGISTRY.inc("prefetch_arrivals_total", {"result": result})
+        wasted = len(self._generated - {next_location_id})
+        if wasted:
+            REGISTRY.inc("prefetch_wasted_total", {}, wasted)
+        
+        self._futures = {}
+        self._ready = set()
+        self._generated = set()
+    
+    def _prefetch(self, ai, location, player_data, origin_id):
+        """Generate and cache one description, unless the player has already moved on."""
+        if self.location_id != origin_id:
+            REGISTRY.inc("prefetch_tasks_total", {"result": "cancelled"})
+            return
+        try:
+            # Prefetches wait behind interactive turns and count toward the session's fair share
+            with scheduler.call_context(self.session_id, scheduler.PREFETCH):
+                generated = ai.prefetch_location_description(location, player_data)
+        except Exception as e:
+            print(f"Error prefetching description of {location['_id']}: {e}")
+            generated = None
+        if generated is None:
+            REGISTRY.inc("prefetch_tasks_total", {"result": "failed"})
+            return
+        
+        REGISTRY.inc("prefetch_tasks_total", {"result": "generated" if generated else "cached"})
+        with self._lock:
+            if self.location_id == origin_id:
+                self._ready.add(location["_id"])
+                if generated:
+                    self._generated.add(location["_id"])
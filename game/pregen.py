@@ -0,0 +1,171 @@
+"""
+Pre-generation module for the Fantasy RPG text adventure game.
+Walks the world, quests and npcs collections offline and fills the
+narrative cache with several variants of every location description and
+quest giver's dialogue, so play reads them from storage instead of waiting
+on Gemini. Finished keys go to a checkpoint file, so an interrupted run
+resumes where it stopped.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+
+from game import scheduler
+from game.data.npcs import NPCS
+from game.metrics import REGISTRY
+
+# Load environment variables
+load_dotenv()
+
+# Variants generated per location description or quest dialogue
+PREGEN_VARIANTS = int(os.getenv("PREGEN_VARIANTS", "3"))
+
+# Worker threads calling the model; the scheduler's rate limit still applies
+PREGEN_WORKERS = int(os.getenv("PREGEN_WORKERS", "4"))
+
+# File listing the cache keys a run has finished, one per line
+PREGEN_CHECKPOINT = os.getenv("PREGEN_CHECKPOINT", "pregen_checkpoint.txt")
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+# Quest stages a giver has dialogue for, as the template narrator names them
+QUEST_STAGES = ["introduction", "in-progress", "completion"]
+
+REGISTRY.describe("pregen_jobs_total", "Pre-generation jobs by kind and result: generated, skipped (already done) or failed.")
+
+class Checkpoint:
+    """Append-only file of finished cache keys."""
+    
+    def __init__(self, path, reset=False):
+        """Load the keys finished by earlier runs, or start over if reset."""
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        if reset and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint_file:
+                self.done = {line.strip() for line in checkpoint_file if line.strip()}
+    
+    def __contains__(self, key):
+        """Whether a key was finished."""
+        return key in self.done
+    
+    def add(self, key):
+        """Record a finished key, flushing it so a crash doesn't lose it."""
+        with self._lock:
+            self.done.add(key)
+            with open(self.path, "a", encoding="utf-8") as checkpoint_file:
+                checkpoint_file.write(key + "\n")
+
+class Pregenerator:
+    """Fills the narrative cache for every location and quest in storage.
+    
+    Each location gets descriptions for a first and a repeat visit, and
+    each quest gets its giver's dialogue for every stage, under the same
+    cache keys the game looks up. At most twice `workers` jobs are queued
+    at once, so large worlds are streamed rather than held in memory.
+    """
+    
+    def __init__(self, db, ai, variants=PREGEN_VARIANTS, workers=PREGEN_WORKERS,
+                 checkpoint_path=PREGEN_CHECKPOINT, force=False, output=print):
+        """Initialize a run over a storage backend and an AIGenerator with a narrative cache."""
+        self.db = db
+        self.ai = ai
+        self.variants = max(1, variants)
+        self.workers = max(1, workers)
+        self.force = force
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint_path, reset=force)
+        self._lock = threading.Lock()
+        self.counts = {"generated": 0, "skipped": 0, "failed": 0}
+    
+    def jobs(self):
+        """Yield (kind, name, cache key, prompt) for everything to pre-generate."""
+        for location in self.db.iter_documents("world"):
+            for visited in (False, True):
+                player_data = {"visited_locations": {location["_id"]: True}} if visited else None
+                key, prompt = self.ai.location_description_request(location, player_data)
+                yield "location", location["_id"], key, prompt
+        
+        givers = self._quest_givers()
+        for quest in self.db.iter_documents("quests"):
+            npc = givers.get(quest["_id"])
+            if npc is None:
+                self.output(f"Skipping quest {quest['_id']}: its giver isn't a known NPC")
+                continue
+            for stage in QUEST_STAGES:
+                key, prompt = self.ai.quest_dialogue_request(quest, npc, stage)
+                yield "quest", f"{quest['_id']} ({stage})", key, prompt
+    
+    def run(self):
+        """Run every job on the worker pool. Returns counts by result."""
+        started = time.perf_counter()
+        last_report = started
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pregen") as executor:
+            pending = set()
+            for job in self.jobs():
+                if len(pending) >= self.workers * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self._run_job, *job))
+                if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.perf_counter()
+                    self._report(last_report - started)
+            wait(pending)
+        
+        self._report(time.perf_counter() - started, final=True)
+        return dict(self.counts)
+    
+    def _quest_givers(self):
+        """Map quest IDs to their giver's NPC data, from quest "giver" fields and NPC "quests" lists."""
+        npcs = {npc_id: {"_id": npc_id, **npc} for npc_id, npc in NPCS.items()}
+        for npc in self.db.iter_documents("npcs"):
+            npcs[npc["_id"]] = npc
+        
+        givers = {}
+        for npc in npcs.values():
+            for quest_id in npc.get("quests", []):
+                givers[quest_id] = npc
+        for quest in self.db.iter_documents("quests"):
+            if quest.get("giver") in npcs:
+                givers[quest["_id"]] = npcs[quest["giver"]]
+        return givers
+    
+    def _run_job(self, kind, name, key, prompt):
+        """Generate and store one key's variants, unless an earlier run already did."""
+        if not self.force and key in self.checkpoint:
+            self._record(kind, "skipped")
+            return
+        if not self.force and len(self.db.get_narrative(key) or []) >= self.variants:
+            self.checkpoint.add(key)
+            self._record(kind, "skipped")
+            return
+        
+        try:
+            # Batch calls wait behind players' turns and prefetches
+            with scheduler.call_context(priority=scheduler.BACKGROUND):
+                self.ai.pregenerate(kind, key, prompt, self.variants)
+        except Exception as e:
+            self.output(f"Error pre-generating {kind} {name}: {e}")
+            self._record(kind, "failed")
+            return
+        self.checkpoint.add(key)
+        self._record(kind, "generated")
+    
+    def _record(self, kind, result):
+        """Count a finished job."""
+        REGISTRY.inc("pregen_jobs_total", {"kind": kind, "result": result})
+        with self._lock:
+            self.counts[result] += 1
+    
+    def _report(self, elapsed, final=False):
+        """Print a progress or summary line."""
+        done = sum(self.counts.values())
+        rate = done / elapsed if elapsed > 0 else 0
+        line = (f"{done:,} jobs: {self.counts['generated']:,} generated, {self.counts['skipped']:,} skipped, "
+                f"{self.counts['failed']:,} failed ({rate:,.1f} jobs/s)")
+        self.output(line if final else line + " ...")
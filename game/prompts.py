@@ -0,0 +1,129 @@
+"""
+Prompt module for the Fantasy RPG text adventure game.
+Builds compact Gemini prompts from templates compiled once at import: the
+narrator's preamble and rules go to the model once as its system
+instruction, each prompt carries only the facts of its call, and lists are
+shortened to keep every prompt within a token budget.
+"""
+
+import logging
+import math
+import os
+import string
+import textwrap
+from collections import namedtuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Estimated input tokens one prompt may use, not counting the system instruction
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "400"))
+
+# Rough characters per token of English text, for estimates without a tokenizer round trip
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+# Shared by every prompt, so it is sent as the model's system instruction instead of with each call
+SYSTEM_INSTRUCTION = textwrap.dedent("""
+    You are the narrator for a fantasy RPG text adventure game set in a medieval fantasy world with magic, monsters and quests. The player is on a journey to become a hero.
+    Your responses should be descriptive, immersive and move the story forward. Keep them concise (2-3 paragraphs maximum) but vivid, and focused on the actual game state.
+    Only reference NPCs, enemies, items, locations, quest details and abilities listed in the prompt. Never invent or hallucinate new game elements.
+""").strip()
+
+Prompt = namedtuple("Prompt", ["kind", "text", "tokens"])
+
+def estimate_tokens(text):
+    """Estimate the tokens in a text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def format_list(values, limit=None, empty="None"):
+    """Join values as 'a, b, c', or 'a, b and 3 more' past limit, or empty if there are none."""
+    if not values:
+        return empty
+    if limit is not None and len(values) > limit:
+        return ", ".join(values[:limit]) + f" and {len(values) - limit} more"
+    return ", ".join(values)
+
+class PromptTemplate:
+    """A dedented $-placeholder prompt whose list fields shrink to fit a token budget."""
+    
+    def __init__(self, kind, text, list_fields=None):
+        """Compile a template; list_fields maps list placeholders to the text shown when they are empty."""
+        self.kind = kind
+        self.template = string.Template(textwrap.dedent(text).strip())
+        self.list_fields = list_fields or {}
+    
+    def render(self, budget=PROMPT_TOKEN_BUDGET, **fields):
+        """Render a Prompt, halving how many items each list shows until it fits the budget."""
+        lists = {name: [str(value) for value in fields.pop(name, None) or []] for name in self.list_fields}
+        limit = max((len(values) for values in lists.values()), default=0)
+        while True:
+            for name, values in lists.items():
+                fields[name] = format_list(values, limit, self.list_fields[name])
+            text = "\n".join(line for line in self.template.substitute(fields).splitlines() if line.strip())
+            tokens = estimate_tokens(text)
+            if tokens <= budget or limit <= 1:
+                break
+            limit //= 2
+        
+        if tokens > budget:
+            logger.warning("%s prompt is ~%d tokens, over its budget of %d", self.kind, tokens, budget)
+        return Prompt(self.kind, text, tokens)
+
+def log_usage(prompt, response_text, seconds):
+    """Log a call's estimated input and output tokens and its latency."""
+    logger.info(
+        "%s: ~%d input tokens, ~%d output tokens, %.0f ms",
+        prompt.kind, prompt.tokens, estimate_tokens(response_text or ""), seconds * 1000
+    )
+
+LOCATION_DESCRIPTION = PromptTemplate("location", """
+    Describe this location as the player explores it: what they see, hear and feel, with atmospheric details and hints about what might be found here.
+    Name: $name
+    Basic description: $description
+    Danger level: $danger_level
+    NPCs present: $npcs
+    Enemies present: $enemies
+    Connected locations: $connections
+    $visited
+""", {"npcs": "None", "enemies": "None", "connections": "None"})
+
+COMBAT_NARRATIVE = PromptTemplate("combat", """
+    Narrate this combat encounter in an exciting way: attacks, defenses and the outcome, consistent with the player's class and equipment.
+    Player: $name, a level $level $player_class
+    Player stats: health $health, strength $strength, defense $defense
+    Player equipment: $equipment
+    Enemy: $enemy_name - $enemy_description
+    Combat result: $result
+""", {"equipment": "Basic equipment"})
+
+QUEST_DIALOGUE = PromptTemplate("quest", """
+    Write the NPC's dialogue to the player for this quest, naturally and in character. For an introduction, explain what needs to be done and why; in progress, ask about progress or encourage; on completion, thank the player and mention the rewards.
+    NPC: $npc_name - $npc_description
+    Quest: $quest_name - $quest_description
+    Quest steps: $steps
+    Quest rewards: $rewards
+    Stage: $stage
+""", {"steps": "None", "rewards": "No specific rewards"})
+
+ITEM_DISCOVERY = PromptTemplate("item", """
+    Describe how the player finds or receives this item in an interesting, rewarding way, consistent with its properties.
+    Item: $name - $description
+    Type: $type
+    Value: $value gold
+    Effects: $effects
+    Context: $context
+""", {"effects": "No special effects"})
+
+ACTION_RESPONSE = PromptTemplate("action", """
+    The player has taken this action: "$action"
+    Respond with what happens as a result. If they try to interact with something not listed, gently say so; if the action doesn't make sense, suggest valid commands (go, look, talk, etc.) and that they can type 'help' for a list of commands.
+    Player: $name, a level $level $player_class
+    Current location: $location_name - $location_description
+    NPCs here: $npcs
+    Enemies here: $enemies
+    Connected locations: $connections
+    Player's inventory: $inventory
+""", {"npcs": "None", "enemies": "None", "connections": "None", "inventory": "Empty"})
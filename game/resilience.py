@@ -0,0 +1,194 @@
+"""
+Resilience module for the Fantasy RPG text adventure game.
+Bounds how long a turn can wait on Gemini: every call gets a deadline,
+transient errors are retried with jittered exponential backoff, and a
+circuit breaker stops calling the model at all while it is failing or slow.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+from google.api_core import exceptions as google_exceptions
+
+from game.metrics import REGISTRY
+from game.scheduler import AIOverloadedError
+
+# Load environment variables
+load_dotenv()
+
+# Seconds one model request may take, and a turn may spend on all attempts
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "8"))
+AI_DEADLINE = float(os.getenv("AI_DEADLINE", "15"))
+
+# Retries after a transient error, with full-jitter backoff between base and max delay
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.25"))
+AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "2"))
+
+# Consecutive failed or slow calls that open the breaker, the latency that
+# counts as slow, and seconds the breaker stays open before one trial call
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "5"))
+AI_BREAKER_SLOW_CALL = float(os.getenv("AI_BREAKER_SLOW_CALL", "6"))
+AI_BREAKER_RESET = float(os.getenv("AI_BREAKER_RESET", "30"))
+
+# Errors worth retrying: timeouts, overload and server-side failures
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.InternalServerError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.TooManyRequests,
+)
+
+REGISTRY.describe("ai_call_duration_seconds", "Gemini request latency by outcome.")
+REGISTRY.describe("ai_call_retries_total", "Gemini requests retried after a transient error.")
+REGISTRY.describe("ai_calls_rejected_total", "Gemini calls skipped because the circuit breaker was open or the deadline had passed.")
+REGISTRY.describe("ai_breaker_opened_total", "Times the Gemini circuit breaker opened.")
+
+class AIUnavailableError(Exception):
+    """The model could not produce a response within the call's deadline."""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+    
+    Closed: calls go through. After `failure_threshold` consecutive failed
+    or slow calls it opens and rejects calls for `reset_timeout` seconds,
+    then lets a single trial call through (half-open); the trial's outcome
+    closes or reopens it.
+    """
+    
+    def __init__(self, failure_threshold=AI_BREAKER_FAILURES, slow_call_seconds=AI_BREAKER_SLOW_CALL,
+                 reset_timeout=AI_BREAKER_RESET):
+        """Initialize a closed breaker."""
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+    
+    def allow(self):
+        """Whether a call may go to the model now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self, duration):
+        """Record a completed call; a slow one counts as a failure."""
+        if duration > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        """Record a failed call, opening the breaker at the threshold or after a failed trial."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (
+                self.state == "closed" and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                REGISTRY.inc("ai_breaker_opened_total", {})
+
+def backoff_delay(attempt, base=AI_RETRY_BASE_DELAY, maximum=AI_RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff before retry number attempt + 1."""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+def is_retryable(error):
+    """Whether an error is transient enough to try the call again."""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+def call_with_retries(call, breaker, deadline=AI_DEADLINE, timeout=AI_REQUEST_TIMEOUT, retries=AI_MAX_RETRIES,
+                      scheduler=None):
+    """Call call(timeout) until it succeeds, within the breaker, retry and deadline limits.
+    
+    Each attempt waits for its turn from the scheduler, if there is one,
+    then gets the smaller of `timeout` and the time left before the
+    deadline. Raises AIUnavailableError when the model can't be used.
+    """
+    deadline_at = time.monotonic() + deadline
+    for attempt in range(retries + 1):
+        if scheduler is not None:
+            try:
+                scheduler.acquire(max(0, deadline_at - time.monotonic()))
+            except AIOverloadedError as e:
+                raise AIUnavailableError(str(e)) from e
+        _check_call_allowed(breaker, deadline_at)
+        started = time.monotonic()
+        try:
+            result = call(min(timeout, deadline_at - started))
+        except Exception as e:
+            delay = _handle_failure(e, breaker, attempt, retries, deadline_at, time.monotonic() - started)
+            time.sleep(delay)
+            continue
+        _record_success(breaker, time.monotonic() - started)
+        return result
+
+async def call_with_retries_async(call, breaker, deadline=AI_DEADLINE, timeout=AI_REQUEST_TIMEOUT,
+                                  retries=AI_MAX_RETRIES, scheduler=None):
+    """Await call(timeout) with the same limits as call_with_retries, cancelling attempts that overrun."""
+    deadline_at = time.monotonic() + deadline
+    for attempt in range(retries + 1):
+        if scheduler is not None:
+            try:
+                await scheduler.acquire_async(max(0, deadline_at - time.monotonic()))
+            except AIOverloadedError as e:
+                raise AIUnavailableError(str(e)) from e
+        _check_call_allowed(breaker, deadline_at)
+        started = time.monotonic()
+        attempt_timeout = min(timeout, deadline_at - started)
+        try:
+            result = await asyncio.wait_for(call(attempt_timeout), attempt_timeout)
+        except Exception as e:
+            delay = _handle_failure(e, breaker, attempt, retries, deadline_at, time.monotonic() - started)
+            await asyncio.sleep(delay)
+            continue
+        _record_success(breaker, time.monotonic() - started)
+        return result
+
+def _check_call_allowed(breaker, deadline_at):
+    """Raise AIUnavailableError if the deadline has passed or the breaker is open."""
+    # The deadline goes first: a half-open breaker's allow() hands out its one trial call
+    if time.monotonic() >= deadline_at:
+        REGISTRY.inc("ai_calls_rejected_total", {"reason": "deadline"})
+        raise AIUnavailableError("the AI call deadline has passed")
+    if not breaker.allow():
+        REGISTRY.inc("ai_calls_rejected_total", {"reason": "breaker_open"})
+        raise AIUnavailableError("the AI circuit breaker is open")
+
+def _record_success(breaker, duration):
+    """Record a successful attempt."""
+    REGISTRY.observe("ai_call_duration_seconds", {"outcome": "success"}, duration)
+    breaker.record_success(duration)
+
+def _handle_failure(error, breaker, attempt, retries, deadline_at, duration):
+    """Record a failed attempt. Returns the delay before retrying, or raises AIUnavailableError."""
+    outcome = "timeout" if isinstance(error, (TimeoutError, google_exceptions.DeadlineExceeded)) else "error"
+    REGISTRY.observe("ai_call_duration_seconds", {"outcome": outcome}, duration)
+    breaker.record_failure()
+    
+    delay = backoff_delay(attempt)
+    if attempt >= retries or not is_retryable(error) or time.monotonic() + delay >= deadline_at:
+        raise AIUnavailableError(f"{type(error).__name__}: {error}") from error
+    REGISTRY.inc("ai_call_retries_total", {})
+    return delay
@@ -0,0 +1,207 @@
+"""
+Scheduler module for the Fantasy RPG text adventure game.
+Puts every Gemini request from the process through one token-bucket rate
+limiter and a priority queue, so interactive turns go before prefetches and
+background generation, no session takes more than its share of the queue,
+and calls are shed to the template narrator rather than queueing without bound.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+from game.metrics import REGISTRY
+
+# Load environment variables
+load_dotenv()
+
+# Model requests per second across the process (0 disables the limit), and
+# how many may go out at once after a quiet spell
+AI_RATE_LIMIT = float(os.getenv("AI_RATE_LIMIT", "5"))
+AI_RATE_BURST = int(os.getenv("AI_RATE_BURST", "10"))
+
+# Requests waiting for a token across the process, and per play session;
+# further requests are answered from templates
+AI_QUEUE_MAX_DEPTH = int(os.getenv("AI_QUEUE_MAX_DEPTH", "32"))
+AI_SESSION_SHARE = int(os.getenv("AI_SESSION_SHARE", "4"))
+
+# Seconds between checks of the queue head by async waiters
+QUEUE_POLL_INTERVAL = 0.05
+
+# Call priorities, most urgent first
+INTERACTIVE = 0
+PREFETCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PREFETCH: "prefetch", BACKGROUND: "background"}
+
+REGISTRY.describe("ai_queue_wait_seconds", "Time Gemini requests waited in the scheduler queue, by priority.")
+REGISTRY.describe("ai_calls_shed_total", "Gemini requests the scheduler turned away, by priority and reason (queue_full, session_share or timeout).")
+
+# Play session and priority of the model calls made in this thread or task
+_call_context = contextvars.ContextVar("ai_call_context", default=(None, INTERACTIVE))
+
+class AIOverloadedError(Exception):
+    """The scheduler turned a model call away instead of queueing it."""
+
+@contextlib.contextmanager
+def call_context(session=None, priority=INTERACTIVE):
+    """Attribute model calls made inside the block to a session and priority."""
+    token = _call_context.set((session, priority))
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `burst`. Not thread-safe."""
+    
+    def __init__(self, rate, burst):
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        """Add the tokens earned since the last refill."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def take(self):
+        """Take a token if one is available."""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+    
+    def wait_time(self):
+        """Seconds until the next token is available."""
+        if self.rate <= 0:
+            return 0
+        self._refill()
+        return max(0, (1 - self.tokens) / self.rate)
+
+class Scheduler:
+    """Process-wide admission control for model calls.
+    
+    Waiting calls are ordered by priority, then by how many calls their
+    session already had waiting (so sessions take turns), then by arrival.
+    The call at the head of the queue goes when the bucket has a token.
+    A session's fair share counts only its waiting calls of the same or a
+    more urgent priority, and prefetch and background calls may only fill
+    half the queue, so neither can crowd out interactive turns.
+    """
+    
+    def __init__(self, rate=AI_RATE_LIMIT, burst=AI_RATE_BURST, max_depth=AI_QUEUE_MAX_DEPTH,
+                 session_share=AI_SESSION_SHARE):
+        """Initialize an empty queue with a full bucket."""
+        self.bucket = TokenBucket(rate, burst)
+        self.max_depth = max_depth
+        self.session_share = session_share
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._waiting = Counter()
+    
+    def acquire(self, timeout=None):
+        """Wait for this call's turn to go to the model.
+        
+        Raises AIOverloadedError if the call is shed, or if timeout seconds
+        pass before its turn comes.
+        """
+        ticket = self._enqueue()
+        started = time.monotonic()
+        with self._cond:
+            while not self._try_take(ticket):
+                remaining = None if timeout is None else started + timeout - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._discard(ticket)
+                    self._shed(ticket[0], "timeout")
+                # Only the head waits on the bucket; the rest wait for the head to go
+                wait = self.bucket.wait_time() if self._queue[0] is ticket else remaining
+                self._cond.wait(wait if remaining is None else min(wait, remaining))
+        self._record_wait(ticket, time.monotonic() - started)
+    
+    async def acquire_async(self, timeout=None):
+        """Await this call's turn to go to the model, with the same limits as acquire()."""
+        ticket = self._enqueue()
+        started = time.monotonic()
+        try:
+            while True:
+                with self._cond:
+                    if self._try_take(ticket):
+                        break
+                    wait = self.bucket.wait_time() if self._queue[0] is ticket else QUEUE_POLL_INTERVAL
+                remaining = None if timeout is None else started + timeout - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._shed(ticket[0], "timeout")
+                await asyncio.sleep(min(wait, QUEUE_POLL_INTERVAL))
+        except BaseException:
+            # Timed out or cancelled while waiting
+            with self._cond:
+                self._discard(ticket)
+            raise
+        self._record_wait(ticket, time.monotonic() - started)
+    
+    def depth(self):
+        """Number of calls waiting for their turn."""
+        with self._cond:
+            return len(self._queue)
+    
+    def _enqueue(self):
+        """Queue a ticket for the current call context, or raise AIOverloadedError to shed it."""
+        session, priority = _call_context.get()
+        with self._cond:
+            limit = self.max_depth if priority == INTERACTIVE else self.max_depth // 2
+            waiting = sum(self._waiting[session, urgent] for urgent in range(priority + 1)) if session is not None else 0
+            if len(self._queue) >= limit:
+                reason = "queue_full"
+            elif session is not None and waiting >= self.session_share:
+                reason = "session_share"
+            else:
+                ticket = (priority, waiting, next(self._sequence), session)
+                heapq.heappush(self._queue, ticket)
+                if session is not None:
+                    self._waiting[session, priority] += 1
+                return ticket
+        self._shed(priority, reason)
+    
+    def _try_take(self, ticket):
+        """Dequeue a ticket if it is at the head of the queue and a token is free. Call with the lock held."""
+        if self._queue[0] is not ticket or not self.bucket.take():
+            return False
+        self._discard(ticket)
+        return True
+    
+    def _discard(self, ticket):
+        """Remove a ticket from the queue, if it is still there, and wake the other waiters. Call with the lock held."""
+        if ticket not in self._queue:
+            return
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        priority, _, _, session = ticket
+        if session is not None:
+            self._waiting[session, priority] -= 1
+            if not self._waiting[session, priority]:
+                del self._waiting[session, priority]
+        self._cond.notify_all()
+    
+    def _shed(self, priority, reason):
+        """Count a shed call and raise AIOverloadedError."""
+        REGISTRY.inc("ai_calls_shed_total", {"priority": PRIORITY_NAMES[priority], "reason": reason})
+        raise AIOverloadedError(f"the AI request queue is overloaded ({reason})")
+    
+    def _record_wait(self, ticket, seconds):
+        """Record how long a call waited for its turn."""
+        REGISTRY.observe("ai_queue_wait_seconds", {"priority": PRIORITY_NAMES[ticket[0]]}, seconds)
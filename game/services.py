@@ -0,0 +1,157 @@
+"""
+Shared services for the Fantasy RPG text adventure game.
+Holds the process-wide MongoDB client, database layer and AI generator so
+that every GameEngine (one per CLI run or Streamlit session) reuses them.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from game import metrics
+from game.ai_cache import AI_CACHE_ENABLED, NarrativeCache
+from game.database import Database
+from game.memory_storage import MemoryStorage
+from game.prefetch import PREFETCH_ENABLED, Prefetcher
+from game.scheduler import Scheduler
+from game.sqlite_storage import SQLiteStorage
+from game.world_graph import WorldGraph
+
+# Load environment variables
+load_dotenv()
+
+# Get MongoDB connection string from environment variables
+MONGODB_URI = os.getenv("MONGODB_URI")
+
+# Storage backend: "mongo" (default), "sqlite" or "memory"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "fantasy_rpg.db")
+
+# Connection pool settings shared by every session in the process
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "10000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+# Worker threads that run blocking storage calls for AsyncGameEngine sessions
+STORAGE_EXECUTOR_WORKERS = int(os.getenv("STORAGE_EXECUTOR_WORKERS", "32"))
+
+_lock = threading.RLock()
+_mongo_client = None
+_database = None
+_world_graph = None
+_ai_model = None
+_ai_generator = None
+_narrative_cache = None
+_prefetcher = None
+_scheduler = None
+_storage_executor = None
+
+def get_mongo_client():
+    """Get the pooled MongoClient shared by the whole process."""
+    global _mongo_client
+    with _lock:
+        if _mongo_client is None:
+            _mongo_client = MongoClient(
+                MONGODB_URI,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=MONGODB_MIN_POOL_SIZE,
+                connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+                waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                event_listeners=metrics.event_listeners()
+            )
+        return _mongo_client
+
+def create_storage(backend=None):
+    """Create a storage backend by name, defaulting to STORAGE_BACKEND."""
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend == "mongo":
+        return Database(get_mongo_client())
+    if backend == "sqlite":
+        return SQLiteStorage(SQLITE_PATH)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend '{backend}'. Choose mongo, sqlite or memory.")
+
+def get_database():
+    """Get the shared storage backend, upgrading seed data and indexes on first use if needed."""
+    global _database
+    with _lock:
+        if _database is None:
+            database = create_storage()
+            database.initialize_game_data()
+            metrics.start_periodic_dump()
+            _database = database
+        return _database
+
+def get_world_graph():
+    """Get the in-memory WorldGraph shared by the whole process."""
+    global _world_graph
+    with _lock:
+        if _world_graph is None:
+            _world_graph = WorldGraph(get_database())
+        return _world_graph
+
+def get_storage_executor():
+    """Get the bounded thread pool that runs storage calls for async sessions."""
+    global _storage_executor
+    with _lock:
+        if _storage_executor is None:
+            _storage_executor = ThreadPoolExecutor(
+                max_workers=STORAGE_EXECUTOR_WORKERS,
+                thread_name_prefix="storage"
+            )
+        return _storage_executor
+
+def get_ai_model():
+    """Get the Gemini model handle shared by the whole process."""
+    global _ai_model
+    with _lock:
+        if _ai_model is None:
+            # Imported lazily so database-only scripts don't need the Gemini SDK
+            import google.generativeai as genai
+            from game.ai_generator import GEMINI_MODEL
+            from game.prompts import SYSTEM_INSTRUCTION
+            
+            _ai_model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=SYSTEM_INSTRUCTION)
+        return _ai_model
+
+def get_narrative_cache():
+    """Get the narrative cache shared by the whole process, or None if AI_CACHE_ENABLED is off."""
+    global _narrative_cache
+    with _lock:
+        if _narrative_cache is None and AI_CACHE_ENABLED:
+            _narrative_cache = NarrativeCache(get_database())
+        return _narrative_cache
+
+def get_ai_generator():
+    """Get the AIGenerator shared by the whole process."""
+    global _ai_generator
+    with _lock:
+        if _ai_generator is None:
+            from game.ai_generator import AIGenerator
+            
+            _ai_generator = AIGenerator(get_ai_model(), get_narrative_cache(), scheduler=get_scheduler())
+        return _ai_generator
+
+def get_scheduler():
+    """Get the rate limiter and priority queue every model call in the process goes through."""
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+def get_prefetcher():
+    """Get the background prefetch pool shared by the whole process, or None if PREFETCH_ENABLED is off."""
+    global _prefetcher
+    with _lock:
+        if _prefetcher is None and PREFETCH_ENABLED:
+            _prefetcher = Prefetcher()
+        return _prefetcher
@@ -0,0 +1,470 @@
+"""
+SQLite storage backend for the Fantasy RPG text adventure game.
+Stores each collection as a table of JSON documents with indexed columns
+for the fields the game queries on, for single-node deployments that
+don't run MongoDB.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from bson import json_util
+from bson.objectid import ObjectId
+
+from game.database import CONTENT_VERSION_CHECK_INTERVAL
+from game.metrics import instrument_storage
+from game.storage import (
+    CONTENT_CHANGE_LOG_LENGTH,
+    JSON_OPTIONS,
+    PLAYER_PAGE_SIZE,
+    PLAYER_SUMMARY_FIELDS,
+    SCHEMA_META_ID,
+    SCHEMA_UPGRADE_LEASE,
+    SCHEMA_VERSION,
+    DeleteResult,
+    StorageBackend,
+    apply_update,
+    check_player_sort,
+    content_change_versions,
+    content_changes_id,
+    decode_page_token,
+    encode_page_token,
+    logged_changes,
+    merge_content_changes,
+    new_choice_event,
+    prefix_upper_bound
+)
+
+# Indexed columns extracted from content documents, per collection
+CONTENT_COLUMNS = {
+    "items": {"type": lambda doc: doc.get("type")},
+    "quests": {
+        "location": lambda doc: doc.get("location"),
+        "min_level": lambda doc: doc.get("min_level", 0),
+    },
+    "world": {},
+    "enemies": {},
+    "npcs": {},
+}
+
+# Player summaries are built from the stored documents in SQL, so listings
+# don't decode whole players; json_patch drops the fields a player lacks
+PLAYER_SUMMARY_SQL = "json_patch('{}', json_object(%s))" % ", ".join(
+    f"'{field}', json_extract(doc, '$.{field}')" for field in ["_id"] + PLAYER_SUMMARY_FIELDS
+)
+
+# Stay under SQLite's limit on bound parameters per statement
+MAX_QUERY_PARAMS = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    last_played TEXT,
+    doc TEXT NOT NULL
+);
+DROP INDEX IF EXISTS players_last_played;
+CREATE INDEX IF NOT EXISTS players_last_played_id ON players (last_played DESC, id DESC);
+CREATE TABLE IF NOT EXISTS player_choices (
+    id TEXT PRIMARY KEY,
+    player_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS player_choices_player_ts ON player_choices (player_id, ts, id);
+CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, type TEXT, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS items_type ON items (type);
+CREATE TABLE IF NOT EXISTS quests (id TEXT PRIMARY KEY, location TEXT, min_level INTEGER, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS quests_location_min_level ON quests (location, min_level);
+CREATE TABLE IF NOT EXISTS world (id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS enemies (id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS npcs (id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS narratives (id TEXT PRIMARY KEY, expires_at TEXT, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS narratives_expires_at ON narratives (expires_at);
+"""
+
+def _key(value):
+    """Primary key for a document ID. ObjectIds are stored as hex strings."""
+    return str(value)
+
+def _dumps(document):
+    """Serialize a document, keeping ObjectIds and datetimes."""
+    return json_util.dumps(document)
+
+def _loads(text):
+    """Deserialize a document written by _dumps."""
+    return json_util.loads(text, json_options=JSON_OPTIONS)
+
+def _sort_key(value):
+    """Sortable text for a datetime column, at MongoDB's millisecond precision."""
+    return value.isoformat(timespec="milliseconds") if value else None
+
+@instrument_storage("sqlite")
+class SQLiteStorage(StorageBackend):
+    """Storage backend on an embedded SQLite database file."""
+    
+    def __init__(self, path="fantasy_rpg.db"):
+        """Open (or create) the database file."""
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._content_version = None
+        self._content_version_checked_at = None
+        self.ensure_indexes()
+    
+    def ensure_indexes(self):
+        """Create tables and indexes that don't exist yet."""
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+    
+    def _query(self, sql, params=()):
+        """Run a read query and return all rows."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+    
+    def _get_doc(self, table, doc_id):
+        """Get one document by ID from a table, or None."""
+        rows = self._query(f"SELECT doc FROM {table} WHERE id = ?", (_key(doc_id),))
+        return _loads(rows[0][0]) if rows else None
+    
+    # Players
+    
+    def create_player(self, player_data):
+        """Create a new player. Returns None if the name is taken."""
+        player_data.setdefault("_id", ObjectId())
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO players (id, name, last_played, doc) VALUES (?, ?, ?, ?)",
+                    (
+                        _key(player_data["_id"]),
+                        player_data["name"],
+                        _sort_key(player_data.get("last_played")),
+                        _dumps(player_data)
+                    )
+                )
+        except sqlite3.IntegrityError:
+            return None
+        return player_data["_id"]
+    
+    def _without_history(self, player):
+        """Drop history fields, like the MongoDB backend's projection."""
+        if player is not None:
+            player.pop("choices", None)
+        return player
+    
+    def get_player(self, player_id):
+        """Get player data by ID."""
+        return self._without_history(self._get_doc("players", ObjectId(player_id)))
+    
+    def get_player_by_name(self, name):
+        """Get player data by name."""
+        rows = self._query("SELECT doc FROM players WHERE name = ?", (name,))
+        return self._without_history(_loads(rows[0][0])) if rows else None
+    
+    def list_players(self, sort="last_played", limit=PLAYER_PAGE_SIZE, page_token=None, name_prefix=None):
+        """Get one page of player summaries, keyset-paginated on (sort column, id)."""
+        descending = check_player_sort(sort)
+        order = "DESC" if descending else "ASC"
+        after = "<" if descending else ">"
+        
+        conditions = []
+        params = []
+        if name_prefix:
+            conditions.append("name >= ? AND name < ?")
+            params += [name_prefix, prefix_upper_bound(name_prefix)]
+        if page_token:
+            last_value, last_id = decode_page_token(page_token)
+            if sort == "last_played":
+                last_value = _sort_key(last_value)
+            conditions.append(f"({sort}, id) {after} (?, ?)")
+            params += [last_value, _key(last_id)]
+        
+        sql = f"SELECT {PLAYER_SUMMARY_SQL} FROM players"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {sort} {order}, id {order} LIMIT ?"
+        params.append(limit + 1)
+        
+        players = [_loads(summary) for (summary,) in self._query(sql, params)]
+        next_page_token = None
+        if len(players) > limit:
+            players = players[:limit]
+            next_page_token = encode_page_token([players[-1].get(sort), players[-1]["_id"]])
+        return players, next_page_token
+    
+    def _update_player(self, player_id, operator, fields):
+        """Apply one $set, $inc or $push to a player inside a transaction."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT doc FROM players WHERE id = ?", (_key(ObjectId(player_id)),)
+            ).fetchall()
+            if not rows:
+                return
+            player = apply_update(_loads(rows[0][0]), {operator: fields})
+            self._conn.execute(
+                "UPDATE players SET name = ?, last_played = ?, doc = ? WHERE id = ?",
+                (player["name"], _sort_key(player.get("last_played")), _dumps(player), _key(player["_id"]))
+            )
+    
+    def delete_player(self, player_id):
+        """Delete a player and their history."""
+        key = _key(ObjectId(player_id))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM player_choices WHERE player_id = ?", (key,))
+            deleted = self._conn.execute("DELETE FROM players WHERE id = ?", (key,)).rowcount
+        return DeleteResult(deleted)
+    
+    # Player choice history
+    
+    def add_player_choice(self, player_id, choice_data):
+        """Add player choice to the append-only choice history."""
+        event = new_choice_event(player_id, choice_data)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO player_choices (id, player_id, ts, doc) VALUES (?, ?, ?, ?)",
+                (_key(event["_id"]), _key(event["player_id"]), _sort_key(event["ts"]), _dumps(event))
+            )
+    
+    def get_player_choices(self, player_id, limit=50, page_token=None):
+        """Get one page of a player's choice history, oldest first."""
+        sql = "SELECT doc FROM player_choices WHERE player_id = ?"
+        params = [_key(ObjectId(player_id))]
+        if page_token:
+            last_ts, last_id = decode_page_token(page_token)
+            sql += " AND (ts > ? OR (ts = ? AND id > ?))"
+            params += [_sort_key(last_ts), _sort_key(last_ts), _key(last_id)]
+        sql += " ORDER BY ts, id LIMIT ?"
+        params.append(limit + 1)
+        
+        choices = [_loads(doc) for (doc,) in self._query(sql, params)]
+        next_page_token = None
+        if len(choices) > limit:
+            choices = choices[:limit]
+            next_page_token = encode_page_token([choices[-1]["ts"], choices[-1]["_id"]])
+        return choices, next_page_token
+    
+    def iter_player_choices(self, player_id, batch_size=100):
+        """Stream a player's whole choice history, oldest first."""
+        page_token = None
+        while True:
+            choices, page_token = self.get_player_choices(player_id, batch_size, page_token)
+            yield from choices
+            if not page_token:
+                return
+    
+    # Static content
+    
+    def get_item(self, item_id):
+        """Get item data by ID."""
+        return self._get_doc("items", item_id)
+    
+    def get_items(self, item_ids):
+        """Get several items in one query."""
+        return self._get_docs("items", item_ids)
+    
+    def get_items_by_type(self, item_type):
+        """Get items by type."""
+        return [_loads(doc) for (doc,) in self._query("SELECT doc FROM items WHERE type = ?", (item_type,))]
+    
+    def get_quest(self, quest_id):
+        """Get quest data by ID."""
+        return self._get_doc("quests", quest_id)
+    
+    def get_quests(self, quest_ids):
+        """Get several quests in one query."""
+        return self._get_docs("quests", quest_ids)
+    
+    def _get_docs(self, table, doc_ids):
+        """Get several documents by ID with one IN query."""
+        doc_ids = list(doc_ids)
+        result = dict.fromkeys(doc_ids)
+        keys = {_key(doc_id): doc_id for doc_id in doc_ids}
+        key_list = list(keys)
+        for start in range(0, len(key_list), MAX_QUERY_PARAMS):
+            chunk = key_list[start:start + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            for key, doc in self._query(f"SELECT id, doc FROM {table} WHERE id IN ({placeholders})", chunk):
+                result[keys[key]] = _loads(doc)
+        return result
+    
+    def get_location(self, location_id):
+        """Get location data by ID."""
+        return self._get_doc("world", location_id)
+    
+    def iter_locations(self, batch_size=1000):
+        """Stream every location in the world, batch_size rows at a time."""
+        last_key = ""
+        while True:
+            rows = self._query(
+                "SELECT id, doc FROM world WHERE id > ? ORDER BY id LIMIT ?", (last_key, batch_size)
+            )
+            for _, doc in rows:
+                yield _loads(doc)
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+    
+    def get_available_quests(self, location_id, player_level):
+        """Get available quests for a location and player level."""
+        rows = self._query(
+            "SELECT doc FROM quests WHERE location = ? AND min_level <= ?", (location_id, player_level)
+        )
+        return [_loads(doc) for (doc,) in rows]
+    
+    def insert_documents(self, collection_name, documents):
+        """Insert content documents into a collection."""
+        return self._write_documents(collection_name, documents, "INSERT")
+    
+    def upsert_documents(self, collection_name, documents):
+        """Insert or replace content documents by _id."""
+        return self._write_documents(collection_name, documents, "INSERT OR REPLACE")
+    
+    def insert_missing_documents(self, collection_name, documents):
+        """Insert the content documents whose _id isn't stored yet."""
+        return self._write_documents(collection_name, documents, "INSERT OR IGNORE")
+    
+    def get_documents(self, collection_name, doc_ids):
+        """Read content documents by _id with one IN query."""
+        if collection_name not in CONTENT_COLUMNS:
+            raise ValueError(f"Unknown content collection: {collection_name}")
+        found = self._get_docs(collection_name, doc_ids)
+        return {doc_id: doc for doc_id, doc in found.items() if doc is not None}
+    
+    def iter_documents(self, collection_name, batch_size=1000):
+        """Stream every document in a content collection, batch_size rows at a time."""
+        if collection_name not in CONTENT_COLUMNS:
+            raise ValueError(f"Unknown content collection: {collection_name}")
+        last_key = ""
+        while True:
+            rows = self._query(
+                f"SELECT id, doc FROM {collection_name} WHERE id > ? ORDER BY id LIMIT ?", (last_key, batch_size)
+            )
+            for _, doc in rows:
+                yield _loads(doc)
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+    
+    def _write_documents(self, collection_name, documents, statement):
+        """Write content documents with one executemany in a single transaction. Returns the rows changed."""
+        if collection_name not in CONTENT_COLUMNS:
+            raise ValueError(f"Unknown content collection: {collection_name}")
+        columns = CONTENT_COLUMNS[collection_name]
+        names = ["id", *columns, "doc"]
+        sql = f"{statement} INTO {collection_name} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        rows = [
+            (_key(doc["_id"]), *(extract(doc) for extract in columns.values()), _dumps(doc))
+            for doc in documents
+        ]
+        with self._lock, self._conn:
+            return self._conn.executemany(sql, rows).rowcount
+    
+    # Narrative cache
+    
+    def get_narrative(self, key):
+        """Get cached narrative variants, or None if missing or expired."""
+        rows = self._query(
+            "SELECT doc FROM narratives WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, _sort_key(datetime.utcnow()))
+        )
+        return _loads(rows[0][0])["variants"] if rows else None
+    
+    def put_narrative(self, key, variants, expires_at=None):
+        """Store narrative variants, pruning expired entries in the same transaction."""
+        entry = {"_id": key, "variants": list(variants), "expires_at": expires_at}
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM narratives WHERE expires_at <= ?", (_sort_key(datetime.utcnow()),))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO narratives (id, expires_at, doc) VALUES (?, ?, ?)",
+                (key, _sort_key(expires_at), _dumps(entry))
+            )
+    
+    # Schema version
+    
+    def get_schema_version(self):
+        """Get the schema version from the meta table."""
+        schema = self._get_doc("meta", SCHEMA_META_ID)
+        return schema.get("version", 0) if schema else 0
+    
+    def _claim_schema_upgrade(self):
+        """Claim the upgrade with a lease on the schema row, in one conditional upsert.
+        
+        The update only applies to an outdated row with no live lease, so of
+        several processes sharing the file exactly one gets a row count of 1.
+        """
+        now = time.time()
+        claim = {"_id": SCHEMA_META_ID, "version": 0, "lease_until": now + SCHEMA_UPGRADE_LEASE}
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO meta (id, doc) VALUES (?, ?)
+                ON CONFLICT (id) DO UPDATE
+                SET doc = json_set(doc, '$.lease_until', json_extract(excluded.doc, '$.lease_until'))
+                WHERE coalesce(json_extract(doc, '$.version'), 0) < ?
+                AND coalesce(json_extract(doc, '$.lease_until'), 0) < ?
+                """,
+                (SCHEMA_META_ID, _dumps(claim), SCHEMA_VERSION, now)
+            )
+            return cursor.rowcount == 1
+    
+    def _finish_schema_upgrade(self, version):
+        """Record the new schema version and drop the lease."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (id, doc) VALUES (?, ?)",
+                (SCHEMA_META_ID, _dumps({"_id": SCHEMA_META_ID, "version": version}))
+            )
+    
+    def _release_schema_upgrade(self):
+        """Drop the lease after a failed upgrade."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE meta SET doc = json_remove(doc, '$.lease_until') WHERE id = ?", (SCHEMA_META_ID,)
+            )
+    
+    # Content versioning
+    
+    def get_content_version(self):
+        """Get the static content version from the meta table, re-read at most every CONTENT_VERSION_CHECK_INTERVAL."""
+        now = time.monotonic()
+        if (self._content_version_checked_at is None
+                or now - self._content_version_checked_at >= CONTENT_VERSION_CHECK_INTERVAL):
+            meta = self._get_doc("meta", "content_version")
+            self._content_version = meta["version"] if meta else None
+            self._content_version_checked_at = now
+        return self._content_version
+    
+    def bump_content_version(self, changed_locations=None):
+        """Mark static content as changed for every process using this file, logging the changed locations."""
+        changes = logged_changes(changed_locations)
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT doc FROM meta WHERE id = 'content_version'").fetchall()
+            version = (_loads(rows[0][0])["version"] if rows else 0) + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (id, doc) VALUES ('content_version', ?)",
+                (_dumps({"_id": "content_version", "version": version}),)
+            )
+            if changes is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (id, doc) VALUES (?, ?)",
+                    (content_changes_id(version), _dumps({"_id": content_changes_id(version), "locations": changes}))
+                )
+            self._conn.execute(
+                "DELETE FROM meta WHERE id = ?", (content_changes_id(version - CONTENT_CHANGE_LOG_LENGTH),)
+            )
+        # This process sees its own change at once
+        self._content_version_checked_at = None
+    
+    def get_changed_locations(self, since_version, version):
+        """Get the location IDs logged for the versions after since_version, with one IN query."""
+        versions = content_change_versions(since_version, version)
+        if versions is None:
+            return None
+        logged = self._get_docs("meta", [content_changes_id(v) for v in versions])
+        return merge_content_changes(
+            doc["locations"] if doc else None for doc in (logged[content_changes_id(v)] for v in versions)
+        )
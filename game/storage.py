@@ -0,0 +1,388 @@
+"""
+Storage interface for the Fantasy RPG text adventure game.
+Defines the operations every storage backend provides, plus helpers that
+reproduce MongoDB update and pagination semantics for non-Mongo backends.
+"""
+
+import base64
+import time
+from collections import namedtuple
+from datetime import datetime
+from bson import json_util
+from bson.objectid import ObjectId
+
+from game.data import seed
+
+# Mirrors the deleted_count attribute of pymongo's DeleteResult
+DeleteResult = namedtuple("DeleteResult", ["deleted_count"])
+
+# Collections seeded by initialize_game_data
+SEED_DATA = {
+    "items": seed.ITEMS,
+    "world": seed.LOCATIONS,
+    "quests": seed.QUESTS,
+}
+
+# Version of the seed data and index definitions. Bump it whenever either
+# changes; each database is then upgraded once, by the first process to start.
+SCHEMA_VERSION = 4
+SCHEMA_META_ID = "schema"
+
+# Seconds one process may hold the upgrade claim, and how often others check on it
+SCHEMA_UPGRADE_LEASE = 60
+SCHEMA_UPGRADE_POLL_INTERVAL = 0.5
+
+# Content versions whose changed location IDs are kept, and the most IDs one
+# version records; world graphs reread the whole world for anything older or bigger
+CONTENT_CHANGE_LOG_LENGTH = 100
+CONTENT_CHANGE_LOG_MAX_IDS = 10000
+
+# Keep datetimes naive when decoding, as pymongo does by default
+JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+# Fields returned for each player by list_players
+PLAYER_SUMMARY_FIELDS = ["name", "class", "level", "created_at", "last_played"]
+
+# Orders list_players can return, as field -> descending. Pages are keyed on
+# (field, _id); names are unique, so only last_played needs the _id tie-breaker.
+PLAYER_SORTS = {"last_played": True, "name": False}
+PLAYER_PAGE_SIZE = 20
+
+def encode_page_token(values):
+    """Encode the sort key of the last row of a page as an opaque string."""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_page_token(token):
+    """Decode a token made by encode_page_token."""
+    return json_util.loads(base64.urlsafe_b64decode(token.encode()).decode(), json_options=JSON_OPTIONS)
+
+def player_summary(player):
+    """The fields of a player document shown in character listings."""
+    return {"_id": player["_id"], **{f: player[f] for f in PLAYER_SUMMARY_FIELDS if f in player}}
+
+def check_player_sort(sort):
+    """Get whether a list_players sort is descending, rejecting unknown sorts."""
+    if sort not in PLAYER_SORTS:
+        raise ValueError(f"Unknown sort '{sort}'. Choose from: {', '.join(PLAYER_SORTS)}")
+    return PLAYER_SORTS[sort]
+
+def prefix_upper_bound(prefix):
+    """The smallest string that sorts after every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def content_changes_id(version):
+    """ID of the document listing the locations changed in one content version."""
+    return f"content_changes.{version}"
+
+def logged_changes(changed_locations):
+    """The location IDs to record for a content version, or None if too many or unknown."""
+    if changed_locations is None:
+        return None
+    changed_locations = list(changed_locations)
+    return changed_locations if len(changed_locations) <= CONTENT_CHANGE_LOG_MAX_IDS else None
+
+def content_change_versions(since_version, version):
+    """The versions whose change logs lead from since_version to version, or None if they can't be logged."""
+    if since_version is None or version is None or not 0 <= version - since_version <= CONTENT_CHANGE_LOG_LENGTH:
+        return None
+    return range(since_version + 1, version + 1)
+
+def merge_content_changes(id_lists):
+    """Union the location IDs logged for several versions, or None if any version's are unknown."""
+    changed = set()
+    for ids in id_lists:
+        if ids is None:
+            return None
+        changed.update(ids)
+    return changed
+
+def to_milliseconds(value):
+    """Truncate a datetime to MongoDB's millisecond precision, which is all a page token keeps."""
+    if isinstance(value, datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+def new_choice_event(player_id, choice_data):
+    """Build an event for the append-only player choice history."""
+    # Stored at MongoDB's millisecond precision so page tokens round-trip exactly
+    return {
+        "_id": ObjectId(),
+        "player_id": ObjectId(player_id),
+        "ts": to_milliseconds(datetime.now()),
+        "choice": choice_data
+    }
+
+def apply_update(document, update):
+    """Apply a MongoDB-style update document in place.
+    
+    Supports $set, $inc, $push (including $each) and $unset on dotted paths,
+    creating intermediate documents as needed.
+    """
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            parts = path.split(".")
+            target = document
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            key = parts[-1]
+            
+            if operator == "$set":
+                target[key] = value
+            elif operator == "$inc":
+                target[key] = target.get(key, 0) + value
+            elif operator == "$push":
+                values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                target.setdefault(key, []).extend(values)
+            elif operator == "$unset":
+                target.pop(key, None)
+            else:
+                raise ValueError(f"Unsupported update operator: {operator}")
+    return document
+
+def quest_is_available(quest, location_id, player_level):
+    """Same filter as get_available_quests: matching location and min_level <= level."""
+    return quest.get("location") == location_id and quest.get("min_level", 0) <= player_level
+
+class StorageBackend:
+    """Operations the game engine needs from storage.
+    
+    game.database.Database is the MongoDB implementation. Backends for
+    other stores subclass this and implement every method that raises
+    NotImplementedError; the rest have working defaults.
+    """
+    
+    # Players
+    
+    def create_player(self, player_data):
+        """Create a new player. Returns the new ID, or None if the name is taken."""
+        raise NotImplementedError
+    
+    def get_player(self, player_id):
+        """Get player data by ID, without history fields."""
+        raise NotImplementedError
+    
+    def get_player_by_name(self, name):
+        """Get player data by name, without history fields."""
+        raise NotImplementedError
+    
+    def list_players(self, sort="last_played", limit=PLAYER_PAGE_SIZE, page_token=None, name_prefix=None):
+        """Get one page of player summaries, sorted by last_played (newest first) or name.
+        
+        Returns (players, next_page_token); the token is None on the last page.
+        name_prefix limits the listing to names starting with it (case-sensitive).
+        """
+        raise NotImplementedError
+    
+    def update_player(self, player_id, update_data):
+        """Update player data."""
+        return self._update_player(player_id, "$set", update_data)
+    
+    def update_player_inventory(self, player_id, item_id, quantity=1, remove=False):
+        """Add or remove items from player inventory."""
+        if remove:
+            return self._update_player(player_id, "$inc", {f"inventory.{item_id}": -quantity})
+        else:
+            return self._update_player(player_id, "$inc", {f"inventory.{item_id}": quantity})
+    
+    def update_player_progress(self, player_id, quest_id, status):
+        """Update player quest progress."""
+        return self._update_player(player_id, "$set", {f"quests.{quest_id}": status})
+    
+    def _update_player(self, player_id, operator, fields):
+        """Apply one $set, $inc or $push to a player."""
+        raise NotImplementedError
+    
+    def delete_player(self, player_id):
+        """Delete a player and their history. Returns an object with deleted_count."""
+        raise NotImplementedError
+    
+    def delete_player_by_name(self, name):
+        """Delete a player by name."""
+        player = self.get_player_by_name(name)
+        if player:
+            return self.delete_player(player["_id"])
+        return None
+    
+    def flush(self, player_id=None):
+        """Write any buffered player updates. Backends that don't buffer do nothing."""
+        return None
+    
+    # Player choice history
+    
+    def add_player_choice(self, player_id, choice_data):
+        """Add player choice to the append-only choice history."""
+        raise NotImplementedError
+    
+    def get_player_choices(self, player_id, limit=50, page_token=None):
+        """Get one page of a player's choice history, oldest first.
+        
+        Returns (choices, next_page_token); the token is None on the last page.
+        """
+        raise NotImplementedError
+    
+    def iter_player_choices(self, player_id, batch_size=100):
+        """Stream a player's whole choice history, oldest first."""
+        raise NotImplementedError
+    
+    def migrate_legacy_choices(self):
+        """Move choice arrays embedded in player documents into the history store."""
+        return 0
+    
+    # Static content
+    
+    def get_item(self, item_id):
+        """Get item data by ID."""
+        raise NotImplementedError
+    
+    def get_items(self, item_ids):
+        """Get several items. Returns a dict of item ID to item data (None if unknown)."""
+        return {item_id: self.get_item(item_id) for item_id in item_ids}
+    
+    def get_items_by_type(self, item_type):
+        """Get items by type."""
+        raise NotImplementedError
+    
+    def get_quest(self, quest_id):
+        """Get quest data by ID."""
+        raise NotImplementedError
+    
+    def get_quests(self, quest_ids):
+        """Get several quests. Returns a dict of quest ID to quest data (None if unknown)."""
+        return {quest_id: self.get_quest(quest_id) for quest_id in quest_ids}
+    
+    def get_location(self, location_id):
+        """Get location data by ID."""
+        raise NotImplementedError
+    
+    def iter_locations(self, batch_size=1000):
+        """Stream every location in the world."""
+        raise NotImplementedError
+    
+    def get_available_quests(self, location_id, player_level):
+        """Get available quests for a location and player level."""
+        raise NotImplementedError
+    
+    def insert_documents(self, collection_name, documents):
+        """Insert content documents into a collection. Returns the number inserted."""
+        raise NotImplementedError
+    
+    def upsert_documents(self, collection_name, documents):
+        """Insert or replace content documents by _id. Returns the number written."""
+        raise NotImplementedError
+    
+    def insert_missing_documents(self, collection_name, documents):
+        """Insert the content documents whose _id isn't stored yet, leaving the rest untouched. Returns the number inserted."""
+        raise NotImplementedError
+    
+    def get_documents(self, collection_name, doc_ids):
+        """Read content documents by _id, bypassing any cache. Returns a dict of the ones found."""
+        raise NotImplementedError
+    
+    def iter_documents(self, collection_name, batch_size=1000):
+        """Stream every document in a content collection, bypassing any cache."""
+        raise NotImplementedError
+    
+    # Narrative cache
+    
+    def get_narrative(self, key):
+        """Get the cached narrative variants for a key, or None if missing or expired."""
+        raise NotImplementedError
+    
+    def put_narrative(self, key, variants, expires_at=None):
+        """Store the narrative variants for a key until expires_at (naive UTC, as MongoDB TTL indexes expect).
+        
+        Entries without expires_at never expire.
+        """
+        raise NotImplementedError
+    
+    # Schema version
+    
+    def initialize_game_data(self):
+        """Seed static content and create indexes if the database is behind SCHEMA_VERSION.
+        
+        A current database costs one read of the schema document. Otherwise one
+        process claims the upgrade and the rest wait for it. Only seed documents
+        whose _id is missing are inserted, so a retried upgrade never inserts
+        twice and content edited or loaded from a pack is never overwritten;
+        updating content is the content loader's job. Returns True if this
+        call applied the upgrade.
+        """
+        while self.get_schema_version() < SCHEMA_VERSION:
+            if not self._claim_schema_upgrade():
+                # Another process is upgrading; wait for it or for its claim to lapse
+                time.sleep(SCHEMA_UPGRADE_POLL_INTERVAL)
+                continue
+            
+            try:
+                self.ensure_indexes()
+                for collection_name, documents in SEED_DATA.items():
+                    self.insert_missing_documents(collection_name, [dict(doc) for doc in documents])
+            except Exception:
+                self._release_schema_upgrade()
+                raise
+            
+            self._finish_schema_upgrade(SCHEMA_VERSION)
+            self.bump_content_version()
+            return True
+        return False
+    
+    def get_schema_version(self):
+        """Get the schema version recorded in the database, or 0 if there is none."""
+        raise NotImplementedError
+    
+    def _claim_schema_upgrade(self):
+        """Atomically claim the schema upgrade. Returns False if another process holds it."""
+        raise NotImplementedError
+    
+    def _finish_schema_upgrade(self, version):
+        """Record the new schema version and drop the upgrade claim."""
+        raise NotImplementedError
+    
+    def _release_schema_upgrade(self):
+        """Drop the upgrade claim without changing the version, after a failure."""
+        raise NotImplementedError
+    
+    # Content versioning and caching
+    
+    def get_content_version(self):
+        """Get the static content version; it changes whenever content is edited."""
+        return getattr(self, "_content_version", None)
+    
+    def bump_content_version(self, changed_locations=None):
+        """Mark static content as changed.
+        
+        changed_locations lists the IDs of the world documents written since
+        the last bump, if known, so world graphs can reread only those.
+        """
+        self._content_version = (self.get_content_version() or 0) + 1
+        changes = self.__dict__.setdefault("_content_changes", {})
+        changes[self._content_version] = logged_changes(changed_locations)
+        changes.pop(self._content_version - CONTENT_CHANGE_LOG_LENGTH, None)
+    
+    def get_changed_locations(self, since_version, version):
+        """Get the IDs of the locations written after since_version up to version.
+        
+        Returns None if that isn't known, e.g. the content was seeded or the
+        versions are too far apart; the caller then rereads the whole world.
+        """
+        versions = content_change_versions(since_version, version)
+        if versions is None:
+            return None
+        changes = getattr(self, "_content_changes", {})
+        return merge_content_changes(changes.get(v) for v in versions)
+    
+    def invalidate_static_cache(self):
+        """Drop any cached static content."""
+    
+    def cache_stats(self):
+        """Get cache counters, if the backend caches anything."""
+        return {}
+    
+    # Indexes
+    
+    def ensure_indexes(self):
+        """Create any indexes the backend needs. Safe to call repeatedly."""
+    
+    def index_report(self):
+        """Report missing or unused indexes, per collection."""
+        return {}
@@ -0,0 +1,211 @@
+"""
+Tracing module for the Fantasy RPG text adventure game.
+Builds a tree of timed spans for every processed command (dispatch, storage
+calls, AI calls and text rendering) and keeps per-verb latency percentiles
+in process, with hooks for showing traces in the CLI and Streamlit app.
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Trace every processed command
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Most recent command durations kept per verb for percentiles
+TRACE_SAMPLE_SIZE = int(os.getenv("TRACE_SAMPLE_SIZE", "1000"))
+
+# Span that new spans become children of, in this thread or task
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+class Span:
+    """One timed step of a command, with attributes and child spans."""
+    
+    def __init__(self, name, kind="internal", attributes=None):
+        """Start the span."""
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+    
+    def set(self, key, value):
+        """Set an attribute, such as a prompt or response size."""
+        self.attributes[key] = value
+    
+    def finish(self):
+        """Stop the span's clock."""
+        self.duration = time.perf_counter() - self.start
+    
+    def self_time(self):
+        """Time spent in this span outside its children."""
+        return max(0.0, (self.duration or 0.0) - sum(child.duration or 0.0 for child in self.children))
+    
+    def walk(self, depth=0):
+        """Yield (depth, span) for this span and every descendant."""
+        yield depth, self
+        for child in list(self.children):
+            yield from child.walk(depth + 1)
+
+class Trace:
+    """Span tree for one processed command."""
+    
+    def __init__(self, command, verb):
+        """Start a trace with a root span for the command."""
+        self.command = command
+        self.verb = verb
+        self.root = Span(f"command {verb}", "dispatch", {"command": command})
+    
+    @property
+    def duration(self):
+        """Total time taken by the command, in seconds."""
+        return self.root.duration
+    
+    def breakdown(self):
+        """Seconds spent per span kind (dispatch, db, ai, render), by self time."""
+        totals = {}
+        for _, span in self.root.walk():
+            totals[span.kind] = totals.get(span.kind, 0.0) + span.self_time()
+        return totals
+    
+    def format(self):
+        """Render the span tree and breakdown as indented text."""
+        lines = [f"Trace for '{self.command}' ({self.verb}): {self.duration * 1000:.1f} ms"]
+        for depth, span in self.root.walk():
+            if depth == 0:
+                continue
+            attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+            line = f"{'  ' * depth}{span.name}: {(span.duration or 0) * 1000:.1f} ms"
+            if attributes:
+                line += f" [{attributes}]"
+            if span.error:
+                line += f" ERROR {span.error}"
+            lines.append(line)
+        breakdown = ", ".join(f"{kind} {seconds * 1000:.1f} ms" for kind, seconds in sorted(self.breakdown().items()))
+        lines.append(f"Breakdown: {breakdown}")
+        return "\n".join(lines)
+
+class CommandStats:
+    """Recent command durations per verb, for runtime percentiles."""
+    
+    def __init__(self, sample_size=TRACE_SAMPLE_SIZE):
+        """Initialize empty samples."""
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+    
+    def record(self, verb, duration):
+        """Record one command's duration."""
+        with self._lock:
+            self._samples.setdefault(verb, deque(maxlen=self.sample_size)).append(duration)
+            self._counts[verb] = self._counts.get(verb, 0) + 1
+    
+    def summary(self):
+        """Get {verb: {count, p50, p95, p99}} in seconds over the recent samples."""
+        with self._lock:
+            samples = {verb: sorted(values) for verb, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            verb: {
+                "count": counts[verb],
+                "p50": _percentile(values, 0.50),
+                "p95": _percentile(values, 0.95),
+                "p99": _percentile(values, 0.99),
+            }
+            for verb, values in samples.items()
+        }
+    
+    def reset(self):
+        """Drop every sample."""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of a sorted list."""
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+# Process-wide per-verb statistics and hooks called with every finished trace
+COMMAND_STATS = CommandStats()
+_hooks = []
+
+def add_hook(hook):
+    """Call hook(trace) after every traced command in the process."""
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    """Stop calling a hook added with add_hook."""
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def verb_stats():
+    """Get p50/p95/p99 command latency per verb, in seconds."""
+    return COMMAND_STATS.summary()
+
+@contextlib.contextmanager
+def trace_command(command, verb, hooks=()):
+    """Trace one command. Yields the Trace, or None when tracing is off.
+    
+    When the block exits, the command's duration is added to the per-verb
+    statistics and the trace is passed to the process-wide hooks and to
+    any extra hooks given.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    
+    trace = Trace(command, verb)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(token)
+        trace.root.finish()
+        COMMAND_STATS.record(verb, trace.duration)
+        for hook in list(_hooks) + list(hooks):
+            try:
+                hook(trace)
+            except Exception as e:
+                print(f"Error in trace hook: {e}")
+
+@contextlib.contextmanager
+def span(name, kind="internal", **attributes):
+    """Time a block as a child of the current span. Yields the Span, or None outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    
+    child = Span(name, kind, attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+def traced(name, kind="internal"):
+    """Decorator that runs every call of a function inside a span."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,266 @@
+"""
+World graph module for the Fantasy RPG text adventure game.
+Keeps the world collection in memory as an adjacency list with a name index.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import deque
+
+from game.database import LRUCache
+
+# Number of routes (lists of location IDs between two places) kept for route queries
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "1024"))
+
+def normalize_name(name):
+    """Normalize a location name or alias for lookups."""
+    name = re.sub(r"[_\-]+", " ", name.lower())
+    name = " ".join(name.split())
+    if name.startswith("the "):
+        name = name[4:]
+    return name
+
+class _GraphTables:
+    """One consistent version of the graph's lookup tables."""
+    
+    def __init__(self):
+        """Initialize empty tables."""
+        self.locations = {}    # location ID -> location document
+        self.adjacency = {}    # location ID -> tuple of connected location IDs
+        self.name_index = {}   # normalized name -> tuple of location IDs
+        self.keys_by_id = {}   # location ID -> normalized names it is indexed under
+        self.word_index = {}   # word of a normalized name -> set of location IDs
+        self.owned_words = set()  # words whose set was created for these tables, safe to edit in place
+    
+    def copy(self):
+        """Copy the tables, sharing the word sets until one is edited."""
+        tables = _GraphTables()
+        tables.locations = dict(self.locations)
+        tables.adjacency = dict(self.adjacency)
+        tables.name_index = dict(self.name_index)
+        tables.keys_by_id = dict(self.keys_by_id)
+        tables.word_index = dict(self.word_index)
+        return tables
+    
+    def word_ids(self, word):
+        """Get the set of location IDs for a word to edit, copying it first if another version shares it."""
+        if word not in self.owned_words:
+            self.word_index[word] = set(self.word_index.get(word, ()))
+            self.owned_words.add(word)
+        return self.word_index[word]
+
+class WorldGraph:
+    """In-memory view of the world collection.
+    
+    Location IDs are interned, connections are kept as adjacency lists and
+    every location's name, ID and optional "aliases" are indexed by their
+    normalized form, so resolving a name or listing neighbours never touches
+    the database. The graph is rebuilt incrementally whenever the content
+    version reported by the database changes: only the locations the
+    database logged as changed are reread, or the whole world when it
+    doesn't know which changed.
+    
+    A rebuild edits a copy of the tables and swaps it in with one reference
+    assignment, so reads never lock: each query takes the current tables
+    once and sees either the old world or the new one, never a mix.
+    
+    Routes are found by a breadth-first search from the start that stops at
+    the first destination it reaches, so a route costs only the locations
+    nearer than the destination. Finished routes are kept in an LRU cache,
+    so repeat trips cost one dictionary lookup.
+    """
+    
+    def __init__(self, db):
+        """Initialize the graph and load the world from the database."""
+        self.db = db
+        self.version = None
+        self.rebuilds = 0
+        self._built = False
+        self._lock = threading.RLock()
+        self._tables = _GraphTables()
+        # (start ID, destination IDs) -> (graph tables searched, route or None)
+        self._routes = LRUCache(ROUTE_CACHE_SIZE)
+        
+        self.refresh()
+    
+    def refresh(self):
+        """Reload changed locations if the content version has moved on."""
+        version = self.db.get_content_version()
+        if self._built and version == self.version:
+            return False
+        
+        with self._lock:
+            if self._built and version == self.version:
+                return False
+            self._rebuild(version)
+            return True
+    
+    def _rebuild(self, version):
+        """Apply the differences between the world collection and the graph to a copy, then swap it in."""
+        tables = self._tables.copy()
+        changed = self.db.get_changed_locations(self.version, version) if self._built else None
+        if changed is None:
+            locations = self.db.iter_locations()
+        else:
+            locations = self.db.get_documents("world", changed).values()
+        
+        seen = set()
+        for location in locations:
+            location_id = sys.intern(str(location["_id"]))
+            seen.add(location_id)
+            if tables.locations.get(location_id) != location:
+                self._set_location(tables, location_id, location)
+        
+        # Locations missing from the reread part of the world were deleted
+        candidates = tables.locations.keys() if changed is None else {str(i) for i in changed}
+        for location_id in candidates - seen:
+            if location_id in tables.locations:
+                self._remove_location(tables, location_id)
+        
+        self._tables = tables
+        # Any change to the graph can change shortest paths
+        self._routes.clear()
+        self.version = version
+        self._built = True
+        self.rebuilds += 1
+    
+    def _set_location(self, tables, location_id, location):
+        """Add or replace one location and its index entries."""
+        self._unindex(tables, location_id)
+        tables.locations[location_id] = location
+        tables.adjacency[location_id] = tuple(
+            sys.intern(str(conn_id)) for conn_id in location.get("connections", [])
+        )
+        
+        keys = {normalize_name(location_id)}
+        if location.get("name"):
+            keys.add(normalize_name(location["name"]))
+        for alias in location.get("aliases", []):
+            keys.add(normalize_name(alias))
+        
+        tables.keys_by_id[location_id] = keys
+        for key in keys:
+            tables.name_index[key] = tables.name_index.get(key, ()) + (location_id,)
+        for word in {word for key in keys for word in key.split()}:
+            tables.word_ids(word).add(location_id)
+    
+    def _remove_location(self, tables, location_id):
+        """Drop one location and its index entries."""
+        self._unindex(tables, location_id)
+        tables.locations.pop(location_id, None)
+        tables.adjacency.pop(location_id, None)
+    
+    def _unindex(self, tables, location_id):
+        """Remove a location from the name and word indexes."""
+        keys = tables.keys_by_id.pop(location_id, ())
+        for key in keys:
+            remaining = tuple(i for i in tables.name_index.get(key, ()) if i != location_id)
+            if remaining:
+                tables.name_index[key] = remaining
+            else:
+                tables.name_index.pop(key, None)
+        for word in {word for key in keys for word in key.split()}:
+            if word in tables.word_index:
+                ids = tables.word_ids(word)
+                ids.discard(location_id)
+                if not ids:
+                    del tables.word_index[word]
+                    tables.owned_words.discard(word)
+    
+    def get_location(self, location_id):
+        """Get a location document by ID, or None."""
+        return self._tables.locations.get(location_id)
+    
+    def neighbours(self, location_id):
+        """Get the IDs of existing locations connected to a location."""
+        tables = self._tables
+        return [
+            conn_id for conn_id in tables.adjacency.get(location_id, ())
+            if conn_id in tables.locations
+        ]
+    
+    def neighbour_names(self, location_id):
+        """Get the names of the locations connected to a location."""
+        tables = self._tables
+        return [
+            tables.locations[conn_id]["name"] for conn_id in tables.adjacency.get(location_id, ())
+            if conn_id in tables.locations
+        ]
+    
+    def resolve(self, name):
+        """Get the IDs of every location matching a name or alias."""
+        return self._tables.name_index.get(normalize_name(name), ())
+    
+    def search(self, name):
+        """Get the IDs of every location with a name or alias containing all the words of a name."""
+        words = normalize_name(name).split()
+        if not words:
+            return set()
+        word_index = self._tables.word_index
+        matches = set(word_index.get(words[0], ()))
+        for word in words[1:]:
+            matches &= word_index.get(word, set())
+        return matches
+    
+    def resolve_neighbour(self, location_id, name):
+        """Get the ID of the connected location matching a name, or None."""
+        tables = self._tables
+        connections = tables.adjacency.get(location_id, ())
+        for candidate in tables.name_index.get(normalize_name(name), ()):
+            if candidate in connections:
+                return candidate
+        return None
+    
+    def find_route(self, start_id, destination_id):
+        """Get the shortest list of location IDs from start to destination.
+        
+        The list includes both ends. Returns None if the destination can't be
+        reached.
+        """
+        return self.find_nearest_route(start_id, (destination_id,))
+    
+    def find_nearest_route(self, start_id, destination_ids):
+        """Get the shortest route from start to whichever of several destinations is nearest, or None."""
+        tables = self._tables
+        key = (start_id, tuple(destination_ids))
+        found, entry = self._routes.get(key)
+        # Entries built from tables a refresh has since replaced are misses
+        if found and entry[0] is tables:
+            return list(entry[1]) if entry[1] else None
+        
+        route = self._search(tables, start_id, set(key[1]))
+        if tables is self._tables:
+            self._routes.put(key, (tables, tuple(route) if route else None))
+        return route
+    
+    def _search(self, tables, start_id, destinations):
+        """Breadth-first search from start, stopping at the first destination reached."""
+        destinations &= tables.locations.keys()
+        if start_id not in tables.locations or not destinations:
+            return None
+        
+        previous = {start_id: None}
+        queue = deque([start_id])
+        while queue:
+            location_id = queue.popleft()
+            if location_id in destinations:
+                route = []
+                while location_id is not None:
+                    route.append(location_id)
+                    location_id = previous[location_id]
+                return route[::-1]
+            for conn_id in tables.adjacency.get(location_id, ()):
+                if conn_id not in previous and conn_id in tables.locations:
+                    previous[conn_id] = location_id
+                    queue.append(conn_id)
+        return None
+    
+    def route_cache_stats(self):
+        """Get hit/miss counters for the route cache."""
+        return self._routes.stats()
+    
+    def __len__(self):
+        """Number of locations in the graph."""
+        return len(self._tables.locations)
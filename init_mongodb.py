@@ -1,12 +1,22 @@
 """
 MongoDB Initialization Script for Fantasy RPG Text Adventure Game.
-This script initializes the MongoDB database with initial game data.
+This script loads game content into MongoDB: the built-in starter content,
+or a content pack directory of world/items/quests/enemies/npcs files in
+NDJSON (.ndjson, .jsonl) or JSON format. Loading upserts on _id, so it is
+safe to run again after editing content.
+
+Usage:
+    python init_mongodb.py [--pack DIR] [--batch-size 1000] [--dry-run]
 """
 
+import argparse
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
 
+from game.content_loader import DEFAULT_BATCH_SIZE, ContentLoader
+from game.database import Database, MONGODB_DB_NAME
+from game.services import get_mongo_client
+from game.data import seed
 from game.data.enemies import ENEMIES
 from game.data.npcs import NPCS
 
@@ -16,253 +26,62 @@ load_dotenv()
 # Get MongoDB connection string from environment variables
 MONGODB_URI = os.getenv("MONGODB_URI")
 
-def initialize_database():
-    """Initialize the MongoDB database with initial game data."""
+def starter_content():
+    """Get the built-in items, locations, quests, enemies and NPCs."""
+    return {
+        "world": [dict(location) for location in seed.LOCATIONS],
+        "items": [dict(item) for item in seed.ITEMS],
+        "quests": [dict(quest) for quest in seed.QUESTS],
+        "enemies": [{"_id": enemy_id, **enemy_data} for enemy_id, enemy_data in ENEMIES.items()],
+        "npcs": [{"_id": npc_id, **npc_data} for npc_id, npc_data in NPCS.items()],
+    }
+
+def initialize_database(pack=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Load game content into MongoDB and prepare indexes."""
     # Connect to MongoDB
-    client = MongoClient(MONGODB_URI)
-    db = client["fantasy_rpg"]
-    
-    # Create collections
-    players_collection = db["players"]
-    items_collection = db["items"]
-    quests_collection = db["quests"]
-    world_collection = db["world"]
-    enemies_collection = db["enemies"]
-    npcs_collection = db["npcs"]
+    game_db = Database(get_mongo_client(), MONGODB_DB_NAME)
+    loader = ContentLoader(game_db, batch_size=batch_size, dry_run=dry_run)
     
-    # Initialize items
-    if items_collection.count_documents({}) == 0:
-        items = [
-            {
-                "_id": "potion_health",
-                "name": "Health Potion",
-                "type": "consumable",
-                "description": "Restores 25 health points when consumed.",
-                "value": 10,
-                "effects": {"health": 25}
-            },
-            {
-                "_id": "potion_mana",
-                "name": "Mana Potion",
-                "type": "consumable",
-                "description": "Restores 25 mana points when consumed.",
-                "value": 15,
-                "effects": {"mana": 25}
-            },
-            {
-                "_id": "sword_rusty",
-                "name": "Rusty Sword",
-                "type": "weapon",
-                "description": "An old rusty sword. Better than nothing.",
-                "value": 5,
-                "damage": 3
-            },
-            {
-                "_id": "sword_iron",
-                "name": "Iron Sword",
-                "type": "weapon",
-                "description": "A standard iron sword. Reliable and sharp.",
-                "value": 50,
-                "damage": 5
-            },
-            {
-                "_id": "shield_wooden",
-                "name": "Wooden Shield",
-                "type": "armor",
-                "description": "A simple wooden shield that offers minimal protection.",
-                "value": 5,
-                "defense": 2
-            },
-            {
-                "_id": "shield_iron",
-                "name": "Iron Shield",
-                "type": "armor",
-                "description": "A sturdy iron shield that provides good protection.",
-                "value": 40,
-                "defense": 4
-            },
-            {
-                "_id": "armor_leather",
-                "name": "Leather Armor",
-                "type": "armor",
-                "description": "Basic leather armor that provides some protection.",
-                "value": 35,
-                "defense": 3
-            },
-            {
-                "_id": "torch",
-                "name": "Torch",
-                "type": "tool",
-                "description": "A simple torch that provides light in dark places.",
-                "value": 5
-            },
-            {
-                "_id": "rope",
-                "name": "Rope",
-                "type": "tool",
-                "description": "A sturdy rope, useful for climbing or tying things.",
-                "value": 10
-            },
-            {
-                "_id": "map_forest",
-                "name": "Forest Map",
-                "type": "tool",
-                "description": "A map of the forest area, revealing paths and landmarks.",
-                "value": 25
-            }
-        ]
-        items_collection.insert_many(items)
-        print(f"Initialized {len(items)} items")
-    
-    # Initialize world locations
-    if world_collection.count_documents({}) == 0:
-        locations = [
-            {
-                "_id": "village_start",
-                "name": "Starting Village",
-                "description": "A small peaceful village surrounded by farmland.",
-                "connections": ["forest_path", "village_market"],
-                "npcs": ["elder", "blacksmith"],
-                "danger_level": 0
-            },
-            {
-                "_id": "village_market",
-                "name": "Village Market",
-                "description": "A bustling marketplace where villagers trade goods.",
-                "connections": ["village_start"],
-                "npcs": ["merchant"],
-                "danger_level": 0
-            },
-            {
-                "_id": "forest_path",
-                "name": "Forest Path",
-                "description": "A winding path through the dense forest.",
-                "connections": ["village_start", "forest_clearing"],
-                "enemies": ["wolf", "bandit"],
-                "danger_level": 1
-            },
-            {
-                "_id": "forest_clearing",
-                "name": "Forest Clearing",
-                "description": "A peaceful clearing in the middle of the forest.",
-                "connections": ["forest_path", "cave_entrance"],
-                "enemies": ["wolf", "bear"],
-                "danger_level": 2
-            },
-            {
-                "_id": "cave_entrance",
-                "name": "Cave Entrance",
-                "description": "A dark, foreboding cave entrance carved into the mountainside.",
-                "connections": ["forest_clearing", "cave_interior"],
-                "enemies": ["goblin"],
-                "danger_level": 3
-            },
-            {
-                "_id": "cave_interior",
-                "name": "Cave Interior",
-                "description": "The dark interior of the cave, lit only by glowing fungi.",
-                "connections": ["cave_entrance", "cave_depths"],
-                "enemies": ["goblin", "bat"],
-                "danger_level": 4
-            },
-            {
-                "_id": "cave_depths",
-                "name": "Cave Depths",
-                "description": "The deepest part of the cave, where few have ventured.",
-                "connections": ["cave_interior"],
-                "enemies": ["troll"],
-                "danger_level": 5
-            }
-        ]
-        world_collection.insert_many(locations)
-        print(f"Initialized {len(locations)} world locations")
+    # Upsert content; the loader bumps the content version so running
+    # game processes drop their cached copies of static content
+    if pack:
+        print(f"Loading content pack from {pack}")
+        loader.load_pack(pack)
+    else:
+        print("Loading starter content")
+        loader.load_collections(starter_content())
     
-    # Initialize quests
-    if quests_collection.count_documents({}) == 0:
-        quests = [
-            {
-                "_id": "quest_village_rats",
-                "name": "Rat Problem",
-                "description": "The village elder needs help clearing rats from the cellar.",
-                "location": "village_start",
-                "giver": "elder",
-                "min_level": 1,
-                "rewards": {
-                    "xp": 50,
-                    "gold": 10,
-                    "items": {"potion_health": 1}
-                },
-                "steps": [
-                    "Talk to the village elder",
-                    "Clear the rats from the cellar",
-                    "Return to the elder for your reward"
-                ]
-            },
-            {
-                "_id": "quest_lost_sword",
-                "name": "The Blacksmith's Lost Sword",
-                "description": "The blacksmith has lost a valuable sword in the forest.",
-                "location": "village_start",
-                "giver": "blacksmith",
-                "min_level": 2,
-                "rewards": {
-                    "xp": 100,
-                    "gold": 25,
-                    "items": {"sword_rusty": 1}
-                },
-                "steps": [
-                    "Speak with the blacksmith",
-                    "Search the forest path for the lost sword",
-                    "Return the sword to the blacksmith"
-                ]
-            },
-            {
-                "_id": "quest_herb_gathering",
-                "name": "Medicinal Herbs",
-                "description": "The village healer needs specific herbs from the forest clearing.",
-                "location": "village_market",
-                "giver": "merchant",
-                "min_level": 2,
-                "rewards": {
-                    "xp": 75,
-                    "gold": 15,
-                    "items": {"potion_health": 2}
-                },
-                "steps": [
-                    "Talk to the merchant about the healer's request",
-                    "Gather herbs from the forest clearing",
-                    "Return the herbs to the merchant"
-                ]
-            }
-        ]
-        quests_collection.insert_many(quests)
-        print(f"Initialized {len(quests)} quests")
+    if dry_run:
+        print("Dry run complete; nothing was written.")
+        return
     
-    # Initialize enemies
-    if enemies_collection.count_documents({}) == 0:
-        enemies_list = []
-        for enemy_id, enemy_data in ENEMIES.items():
-            enemy_data["_id"] = enemy_id
-            enemies_list.append(enemy_data)
-        
-        enemies_collection.insert_many(enemies_list)
-        print(f"Initialized {len(enemies_list)} enemies")
+    # Create indexes declared by the game database layer
+    game_db.ensure_indexes()
+    print("Ensured database indexes")
     
-    # Initialize NPCs
-    if npcs_collection.count_documents({}) == 0:
-        npcs_list = []
-        for npc_id, npc_data in NPCS.items():
-            npc_data["_id"] = npc_id
-            npcs_list.append(npc_data)
-        
-        npcs_collection.insert_many(npcs_list)
-        print(f"Initialized {len(npcs_list)} NPCs")
+    # Move any choice history still embedded in player documents
+    migrated = game_db.migrate_legacy_choices()
+    if migrated:
+        print(f"Moved {migrated} player choices into the player_choices collection")
     
     print("Database initialization complete!")
 
-if __name__ == "__main__":
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Load game content into MongoDB.")
+    parser.add_argument("--pack", help="Content pack directory (defaults to the built-in starter content)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Documents per bulk write")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report new and changed documents without writing anything")
+    args = parser.parse_args()
+    
     if not MONGODB_URI:
         print("Error: MongoDB connection string not found in .env file.")
         print("Please set MONGODB_URI in the .env file.")
-    else:
-        initialize_database()
\ No newline at end of file
+        return
+    
+    initialize_database(args.pack, args.batch_size, args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,16 @@ A text-based adventure game that uses MongoDB for data storage
 and Google Gemini for generating responses.
 """
 
+import argparse
+import logging
 import os
 import sys
 from datetime import datetime
 from dotenv import load_dotenv
 
+from game import intent, tracing
 from game.game_engine import GameEngine
+from game.services import STORAGE_BACKEND
 
 # Load environment variables
 load_dotenv()
@@ -104,29 +108,39 @@ def delete_game(game_engine):
     print(f"\n{message}")
 
 def list_all_characters(game_engine):
-    """List all characters in the database."""
+    """List the characters in the database one page at a time."""
     print("\nALL CHARACTERS")
     print("-------------")
     
-    success, result = game_engine.list_all_characters()
+    sort = "name" if input("Sort by (1) last played or (2) name [1]: ").strip() == "2" else "last_played"
+    name_prefix = input("Only names starting with (leave blank for all): ").strip()
     
-    if not success:
-        print(result)
-        return
-    
-    if not result:
-        print("No characters found in the database.")
-        return
-    
-    print(f"{'Name':<15} {'Class':<10} {'Level':<8} {'Last Played':<20}")
-    print("-" * 60)
-    
-    for player in result:
-        last_played = player.get("last_played", "Never")
-        if isinstance(last_played, datetime):
-            last_played = last_played.strftime("%Y-%m-%d %H:%M")
+    page_token = None
+    page = 1
+    while True:
+        players, page_token = game_engine.list_characters(sort, page_token=page_token, name_prefix=name_prefix)
+        
+        if not players and page == 1:
+            print("No characters found in the database.")
+            break
+        
+        print(f"\nPage {page}")
+        print(f"{'Name':<15} {'Class':<10} {'Level':<8} {'Last Played':<20}")
+        print("-" * 60)
+        
+        for player in players:
+            last_played = player.get("last_played", "Never")
+            if isinstance(last_played, datetime):
+                last_played = last_played.strftime("%Y-%m-%d %H:%M")
+            
+            print(f"{player['name']:<15} {player.get('class', 'Unknown'):<10} {player.get('level', 1):<8} {last_played:<20}")
         
-        print(f"{player['name']:<15} {player.get('class', 'Unknown'):<10} {player.get('level', 1):<8} {last_played:<20}")
+        if not page_token:
+            break
+        
+        if input("\nPress Enter for the next page or type 'q' to stop: ").strip().lower() == "q":
+            return
+        page += 1
     
     input("\nPress Enter to return to the main menu...")
 
@@ -141,6 +155,31 @@ def about():
     print("database systems with AI-generated content.")
     input("\nPress Enter to return to the main menu...")
 
+def print_trace(trace):
+    """Print the timing breakdown of a processed command."""
+    print("\n" + trace.format())
+
+def print_trace_stats():
+    """Print command latency percentiles per verb."""
+    stats = tracing.verb_stats()
+    if not stats:
+        return
+    print("\nCOMMAND LATENCY")
+    print(f"{'Verb':<12} {'Count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for verb, summary in sorted(stats.items()):
+        print(f"{verb:<12} {summary['count']:>6} {summary['p50'] * 1000:>9.1f} "
+              f"{summary['p95'] * 1000:>9.1f} {summary['p99'] * 1000:>9.1f}")
+    
+    rate = intent.avoidance_rate()
+    if rate is not None:
+        print(f"\nCommands answered without the AI narrator: {rate:.0%}")
+
+def print_stream(chunks):
+    """Print response chunks as they arrive."""
+    for chunk in chunks:
+        print(chunk, end="", flush=True)
+    print()
+
 def start_game(game_engine):
     """Start the main game loop."""
     print("\n" + "=" * 60)
@@ -148,7 +187,7 @@ def start_game(game_engine):
     print("=" * 60 + "\n")
     
     # Show initial location description
-    print(game_engine.get_location_description())
+    print_stream(game_engine.get_location_description_stream())
     
     # Main game loop
     while True:
@@ -158,18 +197,32 @@ def start_game(game_engine):
         if command.lower() in ["quit", "exit", "menu"]:
             confirm = input("Return to main menu? (y/n): ")
             if confirm.lower() == "y":
+                game_engine.close()
+                if game_engine.trace_hooks:
+                    print_trace_stats()
                 break
             else:
                 continue
         
-        # Process the command
-        response = game_engine.process_command(command)
-        print("\n" + response)
+        # Process the command, printing the response as it arrives
+        print()
+        print_stream(game_engine.process_command_stream(command))
 
 def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="Fantasy RPG text adventure")
+    parser.add_argument("--trace", action="store_true",
+                        help="print a timing breakdown after every command")
+    parser.add_argument("--log-tokens", action="store_true",
+                        help="log estimated Gemini input and output tokens for every call")
+    args = parser.parse_args()
+    
+    if args.log_tokens:
+        logging.basicConfig(format="%(name)s: %(message)s")
+        logging.getLogger("game.prompts").setLevel(logging.INFO)
+    
     # Check if MongoDB connection string is set
-    if not os.getenv("MONGODB_URI"):
+    if STORAGE_BACKEND == "mongo" and not os.getenv("MONGODB_URI"):
         print("Error: MongoDB connection string not found in .env file.")
         print("Please set MONGODB_URI in the .env file.")
         return
@@ -183,6 +236,8 @@ def main():
     
     # Initialize game engine
     game_engine = GameEngine()
+    if args.trace:
+        game_engine.trace_hooks.append(print_trace)
     
     # Show welcome message
     print_welcome()
@@ -202,6 +257,7 @@ def main():
         elif choice == "5":
             about()
         elif choice == "6":
+            game_engine.close()
             print("\nThank you for playing! Goodbye.")
             sys.exit(0)
         else:
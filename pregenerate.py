@@ -0,0 +1,58 @@
+"""
+Pre-generation Script for Fantasy RPG Text Adventure Game.
+This script fills the narrative cache with several Gemini-written variants
+of every location description and quest giver's dialogue in the database,
+so the game serves them from storage instead of calling the model during
+play. Finished entries are recorded in a checkpoint file, so it is safe to
+stop the script and run it again to resume.
+
+Usage:
+    python pregenerate.py [--variants 3] [--workers 4] [--checkpoint FILE] [--force]
+"""
+
+import argparse
+import os
+from dotenv import load_dotenv
+
+from game.ai_cache import AI_CACHE_ENABLED
+from game.pregen import PREGEN_CHECKPOINT, PREGEN_VARIANTS, PREGEN_WORKERS, Pregenerator
+from game.services import get_ai_generator, get_database
+
+# Load environment variables
+load_dotenv()
+
+# Get Gemini API key from environment variables
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Pre-generate location descriptions and quest dialogue.")
+    parser.add_argument("--variants", type=int, default=PREGEN_VARIANTS,
+                        help="Variants to generate per description or dialogue")
+    parser.add_argument("--workers", type=int, default=PREGEN_WORKERS,
+                        help="Model calls to run in parallel")
+    parser.add_argument("--checkpoint", default=PREGEN_CHECKPOINT,
+                        help="File recording finished entries, for resuming")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate everything, ignoring the checkpoint and stored entries")
+    args = parser.parse_args()
+    
+    if not GEMINI_API_KEY:
+        print("Error: Gemini API key not found in .env file.")
+        print("Please set GEMINI_API_KEY in the .env file.")
+        return
+    if not AI_CACHE_ENABLED:
+        print("Error: pre-generated text is stored in the narrative cache, but AI_CACHE_ENABLED is off.")
+        return
+    
+    pregenerator = Pregenerator(
+        get_database(), get_ai_generator(), args.variants, args.workers, args.checkpoint, args.force
+    )
+    counts = pregenerator.run()
+    if counts["failed"]:
+        print(f"{counts['failed']:,} entries failed; run the script again to retry them.")
+    else:
+        print("Pre-generation complete!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Shared fixtures for the test suite: a fresh instance of each storage
+backend, with MongoDB served by mongomock.
+"""
+
+import os
+import sys
+
+import mongomock
+import pytest
+
+# Tests import the game package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.database import Database
+from game.memory_storage import MemoryStorage
+from game.sqlite_storage import SQLiteStorage
+
+@pytest.fixture
+def memory_db():
+    """An empty in-memory backend."""
+    return MemoryStorage()
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """An empty SQLite backend in a temporary file."""
+    return SQLiteStorage(str(tmp_path / "game.db"))
+
+@pytest.fixture
+def mongo_db():
+    """An empty MongoDB backend on mongomock."""
+    db = Database(mongomock.MongoClient(), "fantasy_rpg_test")
+    yield db
+    if db.write_buffer:
+        db.write_buffer.close()
+
+@pytest.fixture(params=["memory", "sqlite", "mongo"])
+def db(request):
+    """Each storage backend in turn, seeded with the starter content."""
+    backend = request.getfixturevalue(f"{request.param}_db")
+    backend.initialize_game_data()
+    return backend
@@ -0,0 +1,124 @@
+"""
+Tests for the AI generator's cache and shared-call handling, on a scripted model.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from game import tracing
+from game.ai_cache import NarrativeCache
+from game.ai_generator import AIGenerator
+from game.memory_storage import MemoryStorage
+
+class BlockingModel:
+    """Stands in for a Gemini model; calls wait until released."""
+    
+    def __init__(self):
+        """Initialize a model whose calls block."""
+        self.calls = 0
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+    
+    def generate_content(self, prompt, request_options=None):
+        """Count the call, then wait for the test to release it."""
+        self.calls += 1
+        call = self.calls
+        self.started.release()
+        assert self.release.wait(2)
+        return SimpleNamespace(text=f"Description {call}")
+
+LOCATION = {
+    "_id": "forest_path",
+    "name": "Forest Path",
+    "description": "A winding path through the dense forest.",
+    "connections": ["village_start"],
+    "danger_level": 1
+}
+
+@pytest.fixture
+def ai():
+    """A generator with a storage-backed cache that needs one variant per key."""
+    return AIGenerator(BlockingModel(), NarrativeCache(MemoryStorage(), variants=1))
+
+def start(func, *args):
+    """Run func in a thread, returning the thread and a list that receives its result."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    return thread, result
+
+def test_cached_descriptions_skip_the_model(ai):
+    ai.model.release.set()
+    first = ai.generate_location_description(LOCATION)
+    assert ai.generate_location_description(LOCATION) == first
+    assert ai.prefetch_location_description(LOCATION) is False
+    assert ai.model.calls == 1
+
+def test_prefetch_skips_a_description_already_being_generated(ai):
+    thread, result = start(ai.generate_location_description, LOCATION)
+    assert ai.model.started.acquire(timeout=2)
+    
+    assert ai.prefetch_location_description(LOCATION) is False
+    ai.model.release.set()
+    thread.join(2)
+    assert result == ["Description 1"]
+    assert ai.model.calls == 1
+
+def test_interactive_calls_dont_wait_behind_a_prefetch(ai):
+    prefetch, prefetched = start(ai.prefetch_location_description, LOCATION)
+    assert ai.model.started.acquire(timeout=2)
+    assert not ai.inflight.in_flight(ai._location_cache_key(LOCATION, None))
+    
+    # The player's own call leads, rather than joining the prefetch
+    look, described = start(ai.generate_location_description, LOCATION)
+    assert ai.model.started.acquire(timeout=2)
+    ai.model.release.set()
+    prefetch.join(2)
+    look.join(2)
+    assert prefetched == [True]
+    assert described == ["Description 2"]
+
+class AsyncModel:
+    """Stands in for a Gemini model's async API."""
+    
+    async def generate_content_async(self, prompt, request_options=None):
+        """Answer at once."""
+        return SimpleNamespace(text="Async description")
+
+class RecordingCache(NarrativeCache):
+    """Narrative cache that records the thread and trace span each call runs in."""
+    
+    def __init__(self):
+        """Initialize an in-process cache."""
+        super().__init__(variants=1)
+        self.calls = []
+    
+    def get(self, kind, key):
+        """Record, then look the key up."""
+        self.calls.append(("get", threading.current_thread().name, tracing._current_span.get()))
+        return super().get(kind, key)
+    
+    def put(self, kind, key, text):
+        """Record, then store the text."""
+        self.calls.append(("put", threading.current_thread().name, tracing._current_span.get()))
+        super().put(kind, key, text)
+
+def test_async_cache_calls_run_on_the_storage_executor():
+    cache = RecordingCache()
+    ai = AIGenerator(AsyncModel(), cache)
+    
+    async def describe_twice():
+        with tracing.trace_command("look", "look") as trace:
+            first = await ai.generate_location_description_async(LOCATION)
+            second = await ai.generate_location_description_async(LOCATION)
+        return trace, first, second
+    
+    trace, first, second = asyncio.run(describe_twice())
+    assert first == second == "Async description"
+    assert [call[0] for call in cache.calls] == ["get", "put", "get"]
+    assert all(thread.startswith("storage") for _, thread, _ in cache.calls)
+    # The trace's context is carried over to the executor thread
+    assert all(span is not None for _, _, span in cache.calls)
@@ -0,0 +1,41 @@
+"""
+Tests for loading content packs into storage.
+"""
+
+import json
+
+from game.content_loader import ContentLoader
+from game.memory_storage import MemoryStorage
+
+def test_load_pack_upserts_documents_and_logs_changed_locations(tmp_path):
+    (tmp_path / "world.ndjson").write_text("\n".join([
+        json.dumps({"_id": "harbor", "name": "Harbor", "connections": ["village_start"]}),
+        json.dumps({"_id": "village_start", "name": "Starting Village", "connections": ["harbor"]}),
+        json.dumps({"name": "No ID"}),
+    ]))
+    (tmp_path / "items.json").write_text(json.dumps({"gem": {"name": "Gem", "type": "treasure"}}))
+    db = MemoryStorage()
+    db.initialize_game_data()
+    version = db.get_content_version()
+    
+    results = ContentLoader(db, batch_size=1, output=lambda line: None).load_pack(str(tmp_path))
+    
+    assert results["world"]["written"] == 2 and results["world"]["skipped"] == 1
+    assert results["items"]["written"] == 1
+    assert db.get_location("harbor")["connections"] == ["village_start"]
+    assert db.get_item("gem")["name"] == "Gem"
+    assert db.get_changed_locations(version, db.get_content_version()) == {"harbor", "village_start"}
+
+def test_dry_run_writes_nothing(tmp_path):
+    (tmp_path / "world.json").write_text(json.dumps([{"_id": "village_start", "name": "Renamed"}]))
+    db = MemoryStorage()
+    db.initialize_game_data()
+    version = db.get_content_version()
+    lines = []
+    
+    results = ContentLoader(db, dry_run=True, output=lines.append).load_pack(str(tmp_path))
+    
+    assert results["world"]["changed"] == 1
+    assert db.get_location("village_start")["name"] == "Starting Village"
+    assert db.get_content_version() == version
+    assert any("village_start" in line for line in lines)
@@ -0,0 +1,138 @@
+"""
+Tests for the MongoDB backend's player write buffer, on mongomock.
+"""
+
+import threading
+import time
+
+import mongomock
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from game.database import PlayerWriteBuffer
+
+def make_buffer():
+    """A buffer over fresh players and player_choices collections, without the timer thread."""
+    db = mongomock.MongoClient()["write_buffer_test"]
+    return PlayerWriteBuffer(db["players"], db["player_choices"]), db
+
+def test_compatible_operations_merge_into_one_update():
+    buffer, db = make_buffer()
+    player_id = db.players.insert_one({"gold": 0, "xp": 0, "log": [], "location": "a"}).inserted_id
+    
+    buffer.add(player_id, "$set", {"location": "b"})
+    buffer.add(player_id, "$set", {"location": "c"})
+    buffer.add(player_id, "$inc", {"gold": 5})
+    buffer.add(player_id, "$inc", {"gold": 2})
+    buffer.add(player_id, "$push", {"log": "x"})
+    buffer.add(player_id, "$push", {"log": "y"})
+    assert len(buffer._pending[player_id]) == 1
+    
+    buffer.flush()
+    player = db.players.find_one({"_id": player_id})
+    assert (player["location"], player["gold"], player["log"]) == ("c", 7, ["x", "y"])
+    assert buffer.updates_written == 1
+    assert not buffer.has_pending()
+
+def test_conflicting_operations_keep_their_order():
+    buffer, db = make_buffer()
+    player_id = db.players.insert_one({"stats": {"health": 10}}).inserted_id
+    
+    buffer.add(player_id, "$set", {"stats": {"health": 20}})
+    buffer.add(player_id, "$inc", {"stats.health": 5})
+    assert len(buffer._pending[player_id]) == 2
+    
+    buffer.flush()
+    assert db.players.find_one({"_id": player_id})["stats"]["health"] == 25
+
+def test_flush_for_one_player_leaves_the_others_buffered():
+    buffer, db = make_buffer()
+    first = db.players.insert_one({"gold": 0}).inserted_id
+    second = db.players.insert_one({"gold": 0}).inserted_id
+    buffer.add(first, "$inc", {"gold": 1})
+    buffer.add(second, "$inc", {"gold": 1})
+    
+    buffer.flush(first)
+    assert db.players.find_one({"_id": first})["gold"] == 1
+    assert db.players.find_one({"_id": second})["gold"] == 0
+    assert buffer.has_pending_updates(second)
+
+def test_failed_update_is_dropped_and_later_ones_are_requeued():
+    buffer, db = make_buffer()
+    player_id = db.players.insert_one({"gold": 0}).inserted_id
+    # Overlapping paths, so three separate updates
+    buffer.add(player_id, "$set", {"gold": 1})
+    buffer.add(player_id, "$inc", {"gold.bonus": 1})
+    buffer.add(player_id, "$set", {"gold": 3})
+    assert len(buffer._pending[player_id]) == 3
+    
+    bulk_write = buffer.collection.bulk_write
+    def failing_bulk_write(requests, ordered):
+        # Write the first update, then fail on the second like an ordered bulk write
+        bulk_write(requests[:1], ordered=ordered)
+        raise BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "cannot increment"}], "nInserted": 0})
+    buffer.collection.bulk_write = failing_bulk_write
+    assert buffer.flush() is None
+    assert buffer.has_pending_updates(player_id)
+    
+    buffer.collection.bulk_write = bulk_write
+    buffer.flush()
+    assert db.players.find_one({"_id": player_id})["gold"] == 3
+    assert buffer.updates_written == 1
+
+def test_updates_are_requeued_ahead_of_newer_ones_when_mongodb_is_unreachable():
+    buffer, db = make_buffer()
+    player_id = db.players.insert_one({"location": "a"}).inserted_id
+    buffer.add(player_id, "$set", {"location": "b"})
+    
+    bulk_write = buffer.collection.bulk_write
+    def unreachable(*args, **kwargs):
+        raise AutoReconnect("connection lost")
+    buffer.collection.bulk_write = unreachable
+    assert buffer.flush() is None
+    buffer.add(player_id, "$set", {"location": "c"})
+    
+    buffer.collection.bulk_write = bulk_write
+    buffer.flush()
+    assert db.players.find_one({"_id": player_id})["location"] == "c"
+
+def test_events_are_written_on_flush():
+    buffer, db = make_buffer()
+    buffer.add_event({"player_id": 1, "choice": "a"})
+    buffer.add_event({"player_id": 1, "choice": "b"})
+    buffer.flush()
+    assert [e["choice"] for e in db.player_choices.find()] == ["a", "b"]
+    assert buffer.events_written == 2
+
+def test_queueing_doesnt_wait_for_a_flush_in_progress():
+    buffer, db = make_buffer()
+    player_id = db.players.insert_one({"gold": 0}).inserted_id
+    buffer.add(player_id, "$inc", {"gold": 1})
+    
+    writing = threading.Event()
+    bulk_write = buffer.collection.bulk_write
+    def slow_bulk_write(*args, **kwargs):
+        writing.set()
+        time.sleep(0.3)
+        return bulk_write(*args, **kwargs)
+    buffer.collection.bulk_write = slow_bulk_write
+    
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    assert writing.wait(1)
+    started = time.perf_counter()
+    buffer.add(player_id, "$inc", {"gold": 1})
+    assert time.perf_counter() - started < 0.1
+    flusher.join()
+    
+    buffer.collection.bulk_write = bulk_write
+    buffer.flush()
+    assert db.players.find_one({"_id": player_id})["gold"] == 2
+
+def test_get_player_by_name_flushes_only_that_player(mongo_db):
+    first = mongo_db.create_player({"name": "first", "gold": 0})
+    second = mongo_db.create_player({"name": "second", "gold": 0})
+    mongo_db.update_player(first, {"gold": 5})
+    mongo_db.update_player(second, {"gold": 7})
+    
+    assert mongo_db.get_player_by_name("first")["gold"] == 5
+    assert mongo_db.write_buffer.has_pending_updates(second)
@@ -0,0 +1,58 @@
+"""
+Tests for the game engine's command processing, on in-memory storage and a scripted narrator.
+"""
+
+import contextvars
+
+import pytest
+
+from game import scheduler, services, tracing
+from game.game_engine import GameEngine
+from game.memory_storage import MemoryStorage
+from game.world_graph import WorldGraph
+
+class ScriptedAI:
+    """Stands in for AIGenerator, answering free text with fixed chunks."""
+    
+    def generate_response_to_action_stream(self, player, command, location, game_state):
+        """Stream a fixed reply, recording the call context each chunk is made in."""
+        self.contexts = []
+        for chunk in ["You ", "dance ", "a jig."]:
+            self.contexts.append(scheduler._call_context.get())
+            yield chunk
+
+@pytest.fixture
+def engine(monkeypatch):
+    """An engine with a new character in the starting village, without prefetching."""
+    monkeypatch.setattr(services, "get_prefetcher", lambda: None)
+    db = MemoryStorage()
+    db.initialize_game_data()
+    engine = GameEngine(db, ScriptedAI(), WorldGraph(db))
+    success, message = engine.create_new_player("hero", "warrior")
+    assert success, message
+    return engine
+
+def test_streams_free_text_through_the_narrator(engine):
+    assert "".join(engine.process_command_stream("dance a jig")) == "You dance a jig."
+    assert engine.ai.contexts == [(engine.session_id, scheduler.INTERACTIVE)] * 3
+    assert engine.last_trace is None or engine.last_trace.verb == "ai"
+
+def test_stream_context_doesnt_leak_between_chunks(engine):
+    stream = engine.process_command_stream("dance a jig")
+    assert next(stream) == "You "
+    assert scheduler._call_context.get() == (None, scheduler.INTERACTIVE)
+    assert tracing._current_span.get() is None
+    
+    # Consumed from another context, as a web server's worker threads may do
+    assert contextvars.copy_context().run(next, stream) == "dance "
+    assert engine.ai.contexts[-1] == (engine.session_id, scheduler.INTERACTIVE)
+    stream.close()
+    assert scheduler._call_context.get() == (None, scheduler.INTERACTIVE)
+
+def test_abandoned_stream_still_flushes_the_turn(engine):
+    flushed = []
+    engine.db.flush = lambda player_id=None: flushed.append(player_id)
+    stream = engine.process_command_stream("dance a jig")
+    next(stream)
+    stream.close()
+    assert flushed == [engine.current_player["_id"]]
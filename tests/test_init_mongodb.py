@@ -0,0 +1,17 @@
+"""
+Tests for the content the database initialization script loads.
+"""
+
+import init_mongodb
+from game.data import seed
+from game.storage import SEED_DATA
+
+def test_starter_content_is_the_seed_data():
+    content = init_mongodb.starter_content()
+    for collection_name, documents in SEED_DATA.items():
+        assert content[collection_name] == documents
+    assert {location["_id"] for location in content["world"]} >= {"cave_interior", "cave_depths"}
+
+def test_starter_content_copies_the_seed_documents():
+    init_mongodb.starter_content()["world"][0]["name"] = "Renamed"
+    assert seed.LOCATIONS[0]["name"] == "Starting Village"
@@ -0,0 +1,73 @@
+"""
+Tests for the intent classifier's free-text rewrites.
+"""
+
+import pytest
+
+from game.game_engine import COMMAND_VERB_GROUPS
+from game.intent import IntentClassifier, match_phrase
+from game.memory_storage import MemoryStorage
+from game.world_graph import WorldGraph
+
+@pytest.fixture(scope="module")
+def classifier():
+    """A classifier over the seeded starter world."""
+    db = MemoryStorage()
+    db.initialize_game_data()
+    return IntentClassifier(WorldGraph(db), COMMAND_VERB_GROUPS)
+
+@pytest.fixture(scope="module")
+def village(classifier):
+    """The starting village, next to the forest path and the market."""
+    return classifier.world.get_location("village_start")
+
+PLAYER = {"inventory": {"potion_health": 1}}
+
+@pytest.mark.parametrize("command, expected", [
+    ("look around", "look"),
+    ("please look around", "look"),
+    ("check my bag", "inventory"),
+    ("what am i carrying", "inventory"),
+    ("where can i go", "map"),
+    ("please show map", "map"),
+    ("how am i doing", "status"),
+    ("go to the market", "go village market"),
+    ("walk to the forest path", "go forest path"),
+    ("move to forest path", "go forest path"),
+    ("i want to walk to the market", "go village market"),
+    ("head to cave entrance", "travel to cave entrance"),
+    ("please travel to the cave entrance", "travel to cave entrance"),
+    ("i want to travel to forest path", "travel to forest path"),
+])
+def test_rewrites_free_text_into_engine_commands(classifier, village, command, expected):
+    assert classifier.rewrite(command, village, PLAYER) == expected
+
+@pytest.mark.parametrize("command", [
+    # Already engine commands
+    "look",
+    "map",
+    "travel to starting village",
+    "travel to cave entrance",
+    # Actions with no engine handler for a target are left to the AI narrator
+    "greet the elder",
+    "talk to the elder",
+    "drink the health potion",
+    "attack the rat",
+    "fight goblin",
+    # Names no location
+    "walk to the moon",
+])
+def test_leaves_other_commands_unchanged(classifier, village, command):
+    assert classifier.rewrite(command, village, PLAYER) is None
+
+def test_typed_engine_verbs_only_lose_filler_words(classifier, village):
+    # "go" stays a one-step move rather than becoming a multi-hop travel
+    assert classifier.rewrite("go cave entrance", village, PLAYER) is None
+    assert classifier.rewrite("go to the cave entrance", village, PLAYER) == "go cave entrance"
+    assert classifier.rewrite("go to the forest path", village, PLAYER) == "go forest path"
+    assert classifier.rewrite("look at the elder", village, PLAYER) == "look elder"
+
+def test_match_phrase_prefers_the_longest_phrase():
+    assert match_phrase(["look", "in", "bag"]) == ("inventory", [])
+    assert match_phrase(["look", "at", "well"]) == ("look", ["well"])
+    assert match_phrase(["dance"]) == (None, ["dance"])
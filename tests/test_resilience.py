@@ -0,0 +1,119 @@
+"""
+Tests for the Gemini circuit breaker and retry loop.
+"""
+
+import pytest
+
+from game import resilience
+from game.resilience import AIUnavailableError, CircuitBreaker, call_with_retries
+
+class FakeClock:
+    """Stands in for time.monotonic, advanced by hand."""
+    
+    def __init__(self):
+        """Start at an arbitrary time."""
+        self.now = 1000.0
+    
+    def __call__(self):
+        """The current time."""
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace time.monotonic in the resilience module with a hand-driven clock."""
+    fake = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", fake)
+    return fake
+
+def open_breaker(reset_timeout=30):
+    """A breaker opened by reaching its failure threshold."""
+    breaker = CircuitBreaker(failure_threshold=3, slow_call_seconds=5, reset_timeout=reset_timeout)
+    for _ in range(3):
+        breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, slow_call_seconds=5, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, slow_call_seconds=5, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=5, reset_timeout=30)
+    breaker.record_success(6)
+    breaker.record_success(6)
+    assert breaker.state == "open"
+
+def test_breaker_lets_one_trial_through_after_the_reset_timeout(clock):
+    breaker = open_breaker()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+def test_successful_trial_closes_the_breaker(clock):
+    breaker = open_breaker()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = open_breaker()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_retries_transient_errors_until_success(clock, monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    breaker = CircuitBreaker(failure_threshold=5, slow_call_seconds=5, reset_timeout=30)
+    attempts = []
+    
+    def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise TimeoutError("slow")
+        return "ok"
+    
+    assert call_with_retries(call, breaker, deadline=15, timeout=8, retries=2) == "ok"
+    assert attempts == [8, 8, 8]
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+
+def test_does_not_retry_other_errors(clock):
+    breaker = CircuitBreaker(failure_threshold=5, slow_call_seconds=5, reset_timeout=30)
+    attempts = []
+    
+    def call(timeout):
+        attempts.append(timeout)
+        raise ValueError("bad prompt")
+    
+    with pytest.raises(AIUnavailableError):
+        call_with_retries(call, breaker, deadline=15, timeout=8, retries=2)
+    assert len(attempts) == 1
+
+def test_open_breaker_rejects_calls_without_calling_the_model(clock):
+    breaker = open_breaker()
+    
+    def call(timeout):
+        raise AssertionError("the model should not be called")
+    
+    with pytest.raises(AIUnavailableError, match="circuit breaker"):
+        call_with_retries(call, breaker)
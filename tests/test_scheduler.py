@@ -0,0 +1,115 @@
+"""
+Tests for the model call scheduler: rate limiting, priority order and shedding.
+"""
+
+import threading
+import time
+
+import pytest
+
+from game import scheduler
+from game.scheduler import (BACKGROUND, INTERACTIVE, PREFETCH, AIOverloadedError, Scheduler, TokenBucket,
+                            call_context)
+
+class GatedBucket:
+    """Bucket that hands out no tokens until opened, then one per take."""
+    
+    def __init__(self):
+        """Initialize a closed bucket."""
+        self.open = False
+    
+    def take(self):
+        """Take a token if the bucket is open."""
+        return self.open
+    
+    def wait_time(self):
+        """Poll again shortly."""
+        return 0.01
+
+def wait_for_depth(queue, depth):
+    """Wait until a scheduler has depth calls waiting."""
+    deadline = time.monotonic() + 2
+    while queue.depth() < depth:
+        assert time.monotonic() < deadline, "calls never queued"
+        time.sleep(0.005)
+
+def test_token_bucket_limits_bursts_and_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() == pytest.approx(0.5)
+    now[0] += 0.5
+    assert bucket.take()
+    assert not bucket.take()
+    now[0] += 10
+    assert sum(bucket.take() for _ in range(5)) == 3
+
+def test_token_bucket_without_a_rate_never_limits():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.take() for _ in range(100))
+    assert bucket.wait_time() == 0
+
+def test_calls_go_in_priority_then_session_then_arrival_order():
+    queue = Scheduler(rate=1, burst=1, max_depth=32, session_share=4)
+    queue.bucket = GatedBucket()
+    order = []
+    
+    def call(name, session, priority):
+        with call_context(session, priority):
+            queue.acquire(timeout=2)
+        order.append(name)
+    
+    calls = [
+        ("background", "a", BACKGROUND),
+        ("prefetch", "a", PREFETCH),
+        ("a1", "a", INTERACTIVE),
+        ("a2", "a", INTERACTIVE),
+        ("b1", "b", INTERACTIVE),
+    ]
+    threads = []
+    for index, args in enumerate(calls):
+        threads.append(threading.Thread(target=call, args=args))
+        threads[-1].start()
+        wait_for_depth(queue, index + 1)
+    queue.bucket.open = True
+    for thread in threads:
+        thread.join(2)
+    # b1 is b's first waiting call, so it goes before a's second
+    assert order == ["a1", "b1", "a2", "prefetch", "background"]
+
+def test_session_share_sheds_calls_beyond_a_sessions_share():
+    queue = Scheduler(rate=1, burst=1, max_depth=32, session_share=2)
+    with call_context("a", PREFETCH):
+        queue._enqueue()
+        queue._enqueue()
+        with pytest.raises(AIOverloadedError, match="session_share"):
+            queue._enqueue()
+    # Less urgent waiting calls don't count against an interactive turn
+    with call_context("a", INTERACTIVE):
+        queue._enqueue()
+    with call_context("b", PREFETCH):
+        queue._enqueue()
+
+def test_full_queue_sheds_and_keeps_half_for_interactive_calls():
+    queue = Scheduler(rate=1, burst=1, max_depth=4, session_share=10)
+    with call_context(None, BACKGROUND):
+        queue._enqueue()
+        queue._enqueue()
+        with pytest.raises(AIOverloadedError, match="queue_full"):
+            queue._enqueue()
+    with call_context(None, INTERACTIVE):
+        queue._enqueue()
+        queue._enqueue()
+        with pytest.raises(AIOverloadedError, match="queue_full"):
+            queue._enqueue()
+    assert queue.depth() == 4
+
+def test_acquire_times_out_and_leaves_the_queue():
+    queue = Scheduler(rate=1, burst=1, max_depth=4, session_share=2)
+    queue.bucket = GatedBucket()
+    with call_context("a", INTERACTIVE):
+        with pytest.raises(AIOverloadedError, match="timeout"):
+            queue.acquire(timeout=0.05)
+    assert queue.depth() == 0
+    assert not queue._waiting
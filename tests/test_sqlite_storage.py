@@ -0,0 +1,23 @@
+"""
+Tests specific to the SQLite storage backend.
+"""
+
+from game import sqlite_storage
+from game.sqlite_storage import SQLiteStorage
+
+def test_content_version_is_reread_only_after_the_check_interval(tmp_path, monkeypatch):
+    path = str(tmp_path / "game.db")
+    game = SQLiteStorage(path)
+    loader = SQLiteStorage(path)
+    game.bump_content_version()
+    assert game.get_content_version() == 1
+    
+    # Another process's change shows up after the interval; this one's at once
+    loader.bump_content_version()
+    assert game.get_content_version() == 1
+    game.bump_content_version()
+    assert game.get_content_version() == 3
+    
+    loader.bump_content_version()
+    monkeypatch.setattr(sqlite_storage, "CONTENT_VERSION_CHECK_INTERVAL", 0)
+    assert game.get_content_version() == 4
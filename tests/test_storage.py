@@ -0,0 +1,190 @@
+"""
+Tests for behaviour every storage backend must share.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from game.storage import decode_page_token, encode_page_token
+
+def make_players(db, count):
+    """Create players whose last_played times share milliseconds. Returns their names."""
+    started = datetime(2024, 1, 1, 12, 0, 0)
+    names = []
+    for index in range(count):
+        name = f"player{index:03d}"
+        db.create_player({
+            "name": name,
+            "class": "warrior",
+            "level": 1,
+            # Several players per millisecond, with distinct microseconds
+            "last_played": started + timedelta(microseconds=index * 250),
+            "created_at": started
+        })
+        names.append(name)
+    db.flush()
+    return names
+
+def page_through(db, sort, page_size, **kwargs):
+    """Collect the names from every page of list_players."""
+    names = []
+    page_token = None
+    while True:
+        players, page_token = db.list_players(sort, page_size, page_token, **kwargs)
+        names.extend(player["name"] for player in players)
+        if page_token is None:
+            return names
+
+def test_page_token_round_trips_datetimes_at_millisecond_precision():
+    value = datetime(2024, 5, 6, 7, 8, 9, 123000)
+    assert decode_page_token(encode_page_token([value, "abc"])) == [value, "abc"]
+
+@pytest.mark.parametrize("sort", ["last_played", "name"])
+def test_list_players_pages_through_every_player(db, sort):
+    names = make_players(db, 50)
+    listed = page_through(db, sort, 3)
+    assert sorted(listed) == sorted(names)
+    assert len(listed) == len(set(listed))
+
+def test_list_players_orders_last_played_newest_first(db):
+    names = make_players(db, 10)
+    assert page_through(db, "last_played", 4) == list(reversed(names))
+
+def test_list_players_filters_by_name_prefix(db):
+    make_players(db, 30)
+    assert page_through(db, "name", 4, name_prefix="player01") == [f"player01{i}" for i in range(10)]
+
+def new_player(db, name="hero"):
+    """Create a player and return its ID."""
+    return db.create_player({
+        "name": name,
+        "class": "mage",
+        "level": 1,
+        "inventory": {},
+        "quests": {},
+        "last_played": datetime(2024, 1, 1),
+        "created_at": datetime(2024, 1, 1)
+    })
+
+def test_create_player_rejects_a_taken_name(db):
+    assert new_player(db) is not None
+    assert new_player(db) is None
+
+def test_player_updates_are_read_back(db):
+    player_id = new_player(db)
+    db.update_player(player_id, {"level": 3})
+    db.update_player_inventory(player_id, "potion_health", 2)
+    db.update_player_inventory(player_id, "potion_health", 1, remove=True)
+    db.update_player_progress(player_id, "quest_village_rats", "active")
+    db.flush()
+    
+    player = db.get_player_by_name("hero")
+    assert player["_id"] == db.get_player(player_id)["_id"]
+    assert player["level"] == 3
+    assert player["inventory"] == {"potion_health": 1}
+    assert player["quests"] == {"quest_village_rats": "active"}
+
+def test_delete_player_by_name_removes_the_player_and_history(db):
+    player_id = new_player(db)
+    db.add_player_choice(player_id, {"command": "look"})
+    db.delete_player_by_name("hero")
+    db.flush()
+    assert db.get_player_by_name("hero") is None
+    assert db.get_player_choices(player_id)[0] == []
+
+def test_player_choices_page_oldest_first(db):
+    player_id = new_player(db)
+    other_id = new_player(db, "other")
+    for index in range(7):
+        db.add_player_choice(player_id, {"command": f"go {index}"})
+    db.add_player_choice(other_id, {"command": "look"})
+    
+    commands = []
+    page_token = None
+    while True:
+        choices, page_token = db.get_player_choices(player_id, 3, page_token)
+        commands.extend(choice["choice"]["command"] for choice in choices)
+        if page_token is None:
+            break
+    assert commands == [f"go {index}" for index in range(7)]
+    assert [choice["choice"]["command"] for choice in db.iter_player_choices(player_id, 2)] == commands
+
+def test_seed_content_is_readable(db):
+    assert db.get_item("potion_health")["name"] == "Health Potion"
+    assert db.get_item("missing") is None
+    assert {item["_id"] for item in db.get_items_by_type("weapon")} == {"sword_rusty", "sword_iron"}
+    assert db.get_quests(["quest_lost_sword", "missing"])["missing"] is None
+    assert db.get_location("forest_path")["connections"] == ["village_start", "forest_clearing"]
+    assert len(list(db.iter_locations(2))) == 7
+
+def test_available_quests_respect_location_and_level(db):
+    assert [quest["_id"] for quest in db.get_available_quests("village_start", 1)] == ["quest_village_rats"]
+    assert len(db.get_available_quests("village_start", 2)) == 2
+    assert db.get_available_quests("forest_path", 5) == []
+
+def test_insert_missing_documents_leaves_stored_ones_alone(db):
+    db.upsert_documents("items", [{"_id": "potion_health", "name": "Edited Potion", "type": "consumable"}])
+    inserted = db.insert_missing_documents("items", [
+        {"_id": "potion_health", "name": "Health Potion", "type": "consumable"},
+        {"_id": "gem", "name": "Gem", "type": "treasure"}
+    ])
+    assert inserted == 1
+    documents = db.get_documents("items", ["potion_health", "gem"])
+    assert documents["potion_health"]["name"] == "Edited Potion"
+    assert documents["gem"]["name"] == "Gem"
+
+def test_initialize_game_data_runs_once(db):
+    version = db.get_content_version()
+    assert db.initialize_game_data() is False
+    assert db.get_content_version() == version
+
+def test_narratives_expire(db):
+    db.put_narrative("fresh", ["a", "b"])
+    db.put_narrative("stale", ["c"], expires_at=datetime.utcnow() - timedelta(seconds=1))
+    assert db.get_narrative("fresh") == ["a", "b"]
+    assert db.get_narrative("stale") is None
+    assert db.get_narrative("missing") is None
+
+def test_changed_locations_are_logged_per_content_version(db):
+    version = db.get_content_version()
+    db.bump_content_version(["forest_path"])
+    db.bump_content_version(["village_start", "forest_path"])
+    assert db.get_changed_locations(version, version + 2) == {"village_start", "forest_path"}
+    assert db.get_changed_locations(version + 2, version + 2) == set()
+    # Seeding doesn't log its locations, and a bump without IDs means unknown changes
+    assert db.get_changed_locations(version - 1, version + 2) is None
+    db.bump_content_version()
+    assert db.get_changed_locations(version, version + 3) is None
+
+# The MongoDB backend's static cache shares documents by design
+@pytest.mark.parametrize("backend", ["memory_db", "sqlite_db"])
+def test_content_reads_return_copies(request, backend):
+    db = request.getfixturevalue(backend)
+    db.initialize_game_data()
+    for read in (
+        lambda: db.get_item("potion_health"),
+        lambda: db.get_items_by_type("consumable")[0],
+        lambda: db.get_quest("quest_village_rats"),
+        lambda: db.get_available_quests("village_start", 1)[0],
+        lambda: db.get_location("village_start"),
+        lambda: next(iter(db.iter_locations())),
+    ):
+        document = read()
+        document["name"] = "Edited"
+        document.setdefault("connections", []).append("nowhere")
+        assert read()["name"] != "Edited"
+
+def test_list_players_returns_only_summary_fields(db):
+    player_id = new_player(db)
+    db.update_player_inventory(player_id, "potion_health", 3)
+    db.flush()
+    players, _ = db.list_players("name")
+    assert players == [{
+        "_id": player_id,
+        "name": "hero",
+        "class": "mage",
+        "level": 1,
+        "created_at": datetime(2024, 1, 1),
+        "last_played": datetime(2024, 1, 1)
+    }]
@@ -0,0 +1,108 @@
+"""
+Tests for the in-memory world graph: name lookups, routes and rebuilds.
+"""
+
+import pytest
+
+from game.memory_storage import MemoryStorage
+from game.world_graph import WorldGraph
+
+def location(location_id, name, connections, **fields):
+    """A world document."""
+    return {"_id": location_id, "name": name, "connections": connections, **fields}
+
+@pytest.fixture
+def db():
+    """A line of towns a - b - c - d, with a one-way lane from d to a and a second "Harbor" at e."""
+    db = MemoryStorage()
+    db.upsert_documents("world", [
+        location("a", "Aston", ["b"]),
+        location("b", "Brill", ["a", "c"], aliases=["the old mill"]),
+        location("c", "Harbor", ["b", "d"]),
+        location("d", "Dunmore", ["c", "a"]),
+        location("e", "Harbor", ["a"]),
+    ])
+    db.bump_content_version()
+    return db
+
+def test_resolves_names_and_aliases(db):
+    world = WorldGraph(db)
+    assert world.resolve("brill") == ("b",)
+    assert world.resolve("The Old Mill") == ("b",)
+    assert sorted(world.resolve("harbor")) == ["c", "e"]
+    assert world.search("mill") == {"b"}
+    assert world.resolve_neighbour("a", "Brill") == "b"
+    assert world.resolve_neighbour("a", "Harbor") is None
+
+def test_finds_shortest_routes(db):
+    world = WorldGraph(db)
+    assert world.find_route("a", "d") == ["a", "b", "c", "d"]
+    # Connections are one-way, so the way back is shorter
+    assert world.find_route("d", "a") == ["d", "a"]
+    assert world.find_route("a", "a") == ["a"]
+    # Nothing connects to e
+    assert world.find_route("a", "e") is None
+    assert world.find_route("a", "missing") is None
+
+def test_nearest_route_picks_the_closest_of_several_destinations(db):
+    world = WorldGraph(db)
+    assert world.find_nearest_route("a", world.resolve("harbor")) == ["a", "b", "c"]
+    assert world.find_nearest_route("e", ("c", "d")) == ["e", "a", "b", "c"]
+
+def test_routes_are_cached_until_the_world_changes(db):
+    world = WorldGraph(db)
+    world.find_route("a", "d")
+    world.find_route("a", "d")
+    assert world.route_cache_stats()["hits"] == 1
+    
+    db.upsert_documents("world", [location("a", "Aston", ["b", "d"])])
+    db.bump_content_version()
+    assert world.refresh()
+    assert world.find_route("a", "d") == ["a", "d"]
+
+def test_rebuild_applies_edits_and_removals(db):
+    world = WorldGraph(db)
+    db.upsert_documents("world", [location("b", "Brill Bridge", ["a"])])
+    db._collection("world").pop("e")
+    db.bump_content_version()
+    world.refresh()
+    
+    assert world.resolve("brill") == ()
+    assert world.resolve("brill bridge") == ("b",)
+    assert world.search("mill") == set()
+    assert world.resolve("harbor") == ("c",)
+    assert world.find_route("a", "d") is None
+    assert len(world) == 4
+
+def test_refresh_skips_unchanged_versions(db):
+    world = WorldGraph(db)
+    assert not world.refresh()
+    assert world.rebuilds == 1
+
+def test_rebuild_rereads_only_the_logged_locations(db, monkeypatch):
+    world = WorldGraph(db)
+    old_tables = world._tables
+    
+    def iter_locations(batch_size=1000):
+        raise AssertionError("the whole world was reread")
+    
+    monkeypatch.setattr(db, "iter_locations", iter_locations)
+    db.upsert_documents("world", [location("d", "Dunmore Keep", ["c"])])
+    db._collection("world").pop("e")
+    db.bump_content_version(["d", "e"])
+    assert world.refresh()
+    
+    assert world.resolve("dunmore keep") == ("d",)
+    assert world.resolve("harbor") == ("c",)
+    assert world.find_route("d", "a") == ["d", "c", "b", "a"]
+    # The tables in use before the refresh are untouched
+    assert old_tables.locations["d"]["name"] == "Dunmore"
+    assert sorted(old_tables.word_index["harbor"]) == ["c", "e"]
+
+def test_rebuild_rereads_the_world_when_changes_are_unknown(db):
+    world = WorldGraph(db)
+    db.upsert_documents("world", [location("e", "Eastwatch", ["a"])])
+    db.bump_content_version(["d"])
+    db.bump_content_version()
+    world.refresh()
+    assert world.resolve("eastwatch") == ("e",)